@@ -0,0 +1,10 @@
+"""
+Offline benchmarks: `python -m benchmarks --output results.json`, then
+`python -m benchmarks.compare old.json new.json` to spot regressions.
+"""
+
+import os
+import tempfile
+
+# Keep benchmark writes (play history, settings) out of the real app.db.
+os.environ.setdefault("SONOS_THING_DB", os.path.join(tempfile.gettempdir(), "sonos-thing-bench.db"))
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Importing the modules registers their benchmarks.
+from benchmarks import (
+    bench_download,
+    bench_e2e,
+    bench_gui,
+    bench_http,
+    bench_library,
+    bench_playlist,
+    bench_startup,
+    bench_storage,
+)
+from benchmarks.harness import BenchContext, BenchResult, registered, run_metadata
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Sonos Thing benchmarks (offline)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast smoke run")
+    parser.add_argument("--only", action="append", metavar="GROUP", help=f"run only these groups: {', '.join(registered())}")
+    parser.add_argument("--time-budget", type=float, default=1.0, help="seconds spent per measurement (default 1.0)")
+    parser.add_argument("--output", metavar="PATH", help="write JSON results here (default: stdout)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    groups = registered()
+    selected = args.only or list(groups)
+    unknown = [g for g in selected if g not in groups]
+    if unknown:
+        print(f"Unknown benchmark group(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    ctx = BenchContext(quick=args.quick, time_budget=args.time_budget)
+    results = []
+    try:
+        for group in selected:
+            print(f"[{group}] running...", file=sys.stderr)
+            started = time.perf_counter()
+            try:
+                # The app prints as it plays; keep stdout for the JSON report.
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    group_results = groups[group](ctx)
+            except Exception as exc:
+                group_results = [BenchResult(group, {}, skipped=f"failed: {exc!r}")]
+            for result in group_results:
+                summary = result.skipped or f"median {result.median * 1000:.3f} ms over {result.repeats}"
+                print(f"  {result.key}: {summary}", file=sys.stderr)
+            print(f"[{group}] done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            results.extend(r.to_dict() for r in group_results)
+    finally:
+        ctx.close()
+
+    report = json.dumps({"meta": run_metadata(args.quick), "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
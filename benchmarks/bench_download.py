@@ -0,0 +1,281 @@
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark
+from src.misc.pathing import ROOT_DIR
+
+_BYTE_RATE = 44_100 * 2 * 2
+_CHUNK = 64 * 1024
+_TIMEOUT = 300.0
+_STAGES = ("fetch", "ffmpeg", "callback", "job")
+
+# Link profiles: latency before each response, and bytes/s per connection (None = unshaped).
+PROFILES: Dict[str, Dict[str, Optional[float]]] = {
+    "local": {"latency": 0.0, "rate": None},
+    "broadband": {"latency": 0.05, "rate": 4_000_000},
+}
+
+
+def _noise_wav(seconds: float, seed: int) -> bytes:
+    """
+    16-bit stereo WAV of random noise; every seed gives different audio, so
+    the library's duplicate check keeps all fixtures.
+    """
+    data = random.Random(seed).randbytes(int(_BYTE_RATE * seconds) & ~3)
+    header = (
+        b"RIFF"
+        + struct.pack("<I", 36 + len(data))
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, 2, 44_100, _BYTE_RATE, 4, 16)
+        + b"data"
+        + struct.pack("<I", len(data))
+    )
+    return header + data
+
+
+class FixtureServer:
+    """
+    Localhost HTTP server for in-memory audio fixtures, shaped like a remote
+    host: each response waits `latency` seconds and each connection is paced
+    to `rate` bytes/s. Plain audio/wav responses with Range support, which
+    yt-dlp's generic extractor treats as a direct media link.
+    """
+
+    def __init__(self, fixtures: Dict[str, bytes], latency: float = 0.0, rate: Optional[float] = None) -> None:
+        self.fixtures = fixtures
+        self.latency = latency
+        self.rate = rate
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.port}/{name}"
+
+    def start(self) -> None:
+        Thread(target=self._httpd.serve_forever, name="fixture-server", daemon=True).start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self) -> None:
+                self._respond(send_body=False)
+
+            def do_GET(self) -> None:
+                self._respond(send_body=True)
+
+            def _respond(self, send_body: bool) -> None:
+                body = server.fixtures.get(self.path.lstrip("/").split("?", 1)[0])
+                if server.latency:
+                    time.sleep(server.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                start, end = 0, len(body) - 1
+                ranged = self.headers.get("Range", "")
+                if ranged.startswith("bytes="):
+                    first, _, last = ranged[6:].split(",", 1)[0].partition("-")
+                    start = int(first or 0)
+                    end = min(int(last), end) if last else end
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "audio/wav")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+                if send_body:
+                    self._send_paced(memoryview(body)[start : end + 1])
+
+            def _send_paced(self, payload: memoryview) -> None:
+                started = time.perf_counter()
+                sent = 0
+                try:
+                    while sent < len(payload):
+                        self.wfile.write(payload[sent : sent + _CHUNK])
+                        sent += min(_CHUNK, len(payload) - sent)
+                        if server.rate:
+                            ahead = sent / server.rate - (time.perf_counter() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+
+def _drive(config: dict) -> dict:
+    """
+    Child process: download every URL through AudioDownloadManager and time
+    each job's stages from its progress updates.
+    """
+    from src.audio.downloader import AudioDownloadManager
+
+    manager = AudioDownloadManager(
+        workers=config["workers"], codec=config["codec"], output_dir=Path(config["output_dir"])
+    )
+    urls: List[str] = config["urls"]
+    lock = Lock()
+    all_done = Event()
+    marks: Dict[str, Dict[str, float]] = {url: {} for url in urls}
+    failed: List[str] = []
+
+    def on_progress(progress) -> None:
+        now = time.perf_counter()
+        with lock:
+            mark = marks.setdefault(progress.url, {})
+            if progress.status == "downloading":
+                mark.setdefault("downloading", now)
+                if progress.total_bytes and progress.downloaded_bytes >= progress.total_bytes:
+                    mark.setdefault("fetched", now)
+            elif progress.status in ("processing", "done"):
+                mark.setdefault(progress.status, now)
+
+    def on_complete(url: str, path: Optional[Path], error: Optional[Exception]) -> None:
+        with lock:
+            marks[url]["completed"] = time.perf_counter()
+            if error is not None:
+                failed.append(f"{url}: {error}")
+            if all("completed" in m for m in marks.values()):
+                all_done.set()
+
+    manager.subscribe(on_progress)
+    started = time.perf_counter()
+    for url in urls:
+        manager.enqueue(url, on_complete=on_complete)
+    finished = all_done.wait(_TIMEOUT)
+    wall = time.perf_counter() - started
+
+    stages: Dict[str, List[float]] = {stage: [] for stage in _STAGES}
+    for mark in marks.values():
+        if "downloading" not in mark or "completed" not in mark:
+            continue
+        fetched = mark.get("fetched") or mark.get("processing") or mark.get("done")
+        if fetched:
+            stages["fetch"].append(fetched - mark["downloading"])
+        if config["codec"] and "processing" in mark and "done" in mark:
+            # Postprocessing: FFmpegExtractAudio, then the file is moved into place.
+            stages["ffmpeg"].append(mark["done"] - mark["processing"])
+        if "done" in mark:
+            # Library bookkeeping after the file is in place, then on_complete.
+            stages["callback"].append(mark["completed"] - mark["done"])
+        stages["job"].append(mark["completed"] - mark["downloading"])
+    return {"finished": finished, "wall": wall, "failed": failed, "stages": stages}
+
+
+def _run_config(ctx: BenchContext, name: str, config: dict) -> dict:
+    """
+    Run one configuration in a fresh process with its own database, so
+    singletons, the metadata cache and the library start empty each time.
+    """
+    report = ctx.scratch / f"{name}.json"
+    config = dict(config, output_dir=str(ctx.scratch / name / "downloads"), report=str(report))
+    env = dict(os.environ, SONOS_THING_DB=str(ctx.scratch / name / "app.db"))
+    (ctx.scratch / name).mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_download", json.dumps(config)],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=_TIMEOUT + 30,
+        check=True,
+    )
+    return json.loads(report.read_text(encoding="utf-8"))
+
+
+@benchmark("download")
+def bench_download(ctx: BenchContext) -> List[BenchResult]:
+    """
+    AudioDownloadManager against a local fixture server with link shaping:
+    per-job fetch, ffmpeg and callback time, and jobs per minute, across
+    worker counts and codecs (None keeps the fetched WAV, no ffmpeg).
+    """
+    jobs = 6 if ctx.quick else 16
+    seconds = 5 if ctx.quick else 30
+    fixtures = {f"fixture-{i:03d}.wav": _noise_wav(seconds, seed=i) for i in range(jobs)}
+    worker_counts = [1, 4] if ctx.quick else [1, 2, 4]
+    codecs = [None, "mp3"] if ctx.quick else [None, "wav", "mp3"]
+    profiles = ["broadband"] if ctx.quick else list(PROFILES)
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+
+    results: List[BenchResult] = []
+    for profile in profiles:
+        server = FixtureServer(fixtures, **PROFILES[profile])
+        server.start()
+        try:
+            urls = [server.url(name) for name in fixtures]
+            for codec in codecs:
+                for workers in worker_counts:
+                    params = {"profile": profile, "codec": codec or "none", "workers": workers}
+                    if codec and not has_ffmpeg:
+                        results.append(BenchResult("download.job", params, skipped="ffmpeg not found"))
+                        continue
+                    name = f"download-{profile}-{codec or 'none'}-{workers}"
+                    try:
+                        run = _run_config(ctx, name, {"urls": urls, "workers": workers, "codec": codec})
+                    except (subprocess.SubprocessError, OSError, ValueError) as exc:
+                        results.append(BenchResult("download.job", params, skipped=f"failed: {exc!r}"))
+                        continue
+                    results.extend(_results(params, run, jobs))
+        finally:
+            server.stop()
+    return results
+
+
+def _results(params: dict, run: dict, jobs: int) -> List[BenchResult]:
+    if not run["stages"]["job"]:
+        reason = "; ".join(run["failed"][:1]) or "no job finished"
+        return [BenchResult("download.job", params, skipped=f"failed: {reason}")]
+    results = []
+    for stage in _STAGES:
+        samples = run["stages"][stage]
+        if not samples:
+            continue
+        extra = {}
+        if stage == "job":
+            extra = {
+                "jobs_per_minute": (jobs - len(run["failed"])) / run["wall"] * 60 if run["finished"] else None,
+                "failed": len(run["failed"]),
+                "timed_out": not run["finished"],
+            }
+        results.append(BenchResult.from_samples(f"download.{stage}", params, samples, **extra))
+    return results
+
+
+if __name__ == "__main__":
+    _config = json.loads(sys.argv[1])
+    _report = _drive(_config)
+    Path(_config["report"]).write_text(json.dumps(_report), encoding="utf-8")
+    # Skip waiting for background analysis of the fixtures; the report is written.
+    os._exit(0)
@@ -0,0 +1,80 @@
+import io
+import struct
+import time
+from contextlib import redirect_stderr
+from typing import List
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark
+from src.misc.http_server import DownloadHTTPServer
+from src.sonos import SonosDeviceHandle
+from src.sonos_simulator import DEFAULT_BYTE_RATE, SimulatorConfig, simulated_speakers
+
+_TRACK_SECONDS = 10
+# Play faster than real time so a run takes seconds, not minutes.
+_SPEED = 8.0
+
+
+def _silent_wav(seconds: int) -> bytes:
+    data_size = DEFAULT_BYTE_RATE * seconds
+    header = (
+        b"RIFF"
+        + struct.pack("<I", 36 + data_size)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, 2, 44_100, DEFAULT_BYTE_RATE, 4, 16)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+    return header + bytes(data_size)
+
+
+@benchmark("e2e")
+def bench_e2e(ctx: BenchContext) -> List[BenchResult]:
+    """
+    play_uri on simulated speakers that stream from the real HTTP server at
+    (scaled) playback rate.
+    """
+    serve_dir = ctx.scratch / "e2e"
+    serve_dir.mkdir(exist_ok=True)
+    (serve_dir / "track.wav").write_bytes(_silent_wav(_TRACK_SECONDS))
+
+    server = DownloadHTTPServer(str(serve_dir), host="127.0.0.1", port=0)
+    results: List[BenchResult] = []
+    with redirect_stderr(io.StringIO()):
+        server.start()
+        try:
+            uri = f"http://127.0.0.1:{server.client_port}/track.wav"
+            for speakers in ([1, 4] if ctx.quick else [1, 4, 16]):
+                config = SimulatorConfig(speed=_SPEED, seed=speakers)
+                handles = [SonosDeviceHandle.from_device(s) for s in simulated_speakers(speakers, config)]
+                control: List[float] = []
+                for handle in handles:
+                    start = time.perf_counter()
+                    handle.play_uri(uri)
+                    control.append(time.perf_counter() - start)
+
+                deadline = time.perf_counter() + _TRACK_SECONDS / _SPEED * 3
+                while time.perf_counter() < deadline and any(
+                    not h.sonos.fetches or h.sonos.fetches[-1].finished_at is None for h in handles
+                ):
+                    time.sleep(0.05)
+                for handle in handles:
+                    handle.stop()
+
+                fetches = [h.sonos.fetches[-1] for h in handles if h.sonos.fetches]
+                ttfb = [f.time_to_first_byte for f in fetches if f.time_to_first_byte is not None]
+                rates = [f.throughput for f in fetches if f.throughput]
+                params = {"speakers": speakers, "speed": _SPEED}
+                results.append(BenchResult.from_samples("e2e.play_uri_call", params, control))
+                if ttfb:
+                    results.append(
+                        BenchResult.from_samples(
+                            "e2e.time_to_first_byte",
+                            params,
+                            ttfb,
+                            min_rate_ratio=min(rates) / (DEFAULT_BYTE_RATE * _SPEED) if rates else None,
+                            errors=sum(1 for f in fetches if f.error),
+                        )
+                    )
+        finally:
+            server.stop()
+    return results
@@ -0,0 +1,46 @@
+from typing import List
+
+from benchmarks.harness import BenchContext, BenchResult, FakeSonosDevice, NullPrefetcher, benchmark, measure
+
+
+@benchmark("gui")
+def bench_gui(ctx: BenchContext) -> List[BenchResult]:
+    try:
+        import customtkinter as ctk
+
+        root = ctk.CTk()
+    except Exception as exc:
+        # No display (or no Tk) — typical on CI; report instead of failing the run.
+        return [BenchResult("gui.render_playlist", {}, skipped=f"no display: {exc}")]
+
+    from src.audio.library import LibraryIndex
+    from src.audio.music_player_manager import MusicPlayerManager
+    from src.gui.playlist_manager import PlaylistManagerFrame
+
+    results: List[BenchResult] = []
+    try:
+        root.withdraw()
+        library_dir = ctx.wav_tree(1)
+        pm = MusicPlayerManager()
+        pm.prefetcher = NullPrefetcher()
+        pm.set_device(FakeSonosDevice())
+        frame = PlaylistManagerFrame(root, library_dir, pm, library=LibraryIndex(library_dir))
+        frame.pack()
+        for size in ([100, 500] if ctx.quick else [100, 500, 1_000]):
+            playlist = ctx.wav_paths(size)
+
+            def _render() -> None:
+                frame._render_playlist(playlist)
+                root.update_idletasks()
+
+            results.append(
+                BenchResult.from_samples(
+                    "gui.render_playlist",
+                    {"tracks": size},
+                    measure(_render, time_budget=ctx.time_budget, max_repeats=10),
+                )
+            )
+        frame.destroy()
+    finally:
+        root.destroy()
+    return results
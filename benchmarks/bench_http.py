@@ -0,0 +1,99 @@
+import http.client
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr
+from typing import List, Tuple
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark
+from src.misc.http_server import DownloadHTTPServer
+
+_FILE_SIZE = 8 * 1024 * 1024
+_RANGE_SIZE = 256 * 1024
+
+
+def _client(port: int, requests: int, seed: int) -> List[Tuple[float, float, int, int]]:
+    """
+    Issue `requests` random Range GETs; returns (ttfb, total, status, bytes) per request.
+    """
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    samples = []
+    try:
+        for _ in range(requests):
+            offset = rng.randrange(0, _FILE_SIZE - _RANGE_SIZE)
+            start = time.perf_counter()
+            conn.request("GET", "/bench.wav", headers={"Range": f"bytes={offset}-{offset + _RANGE_SIZE - 1}"})
+            response = conn.getresponse()
+            ttfb = time.perf_counter() - start
+            body = response.read()
+            samples.append((ttfb, time.perf_counter() - start, response.status, len(body)))
+    finally:
+        conn.close()
+    return samples
+
+
+def _revalidate(port: int, requests: int) -> Tuple[List[float], int]:
+    """
+    Conditional GETs for a file the client already has; returns latencies and the count of 304s.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("HEAD", "/bench.wav")
+        response = conn.getresponse()
+        response.read()
+        etag = response.getheader("ETag") or ""
+        samples, not_modified = [], 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            conn.request("GET", "/bench.wav", headers={"If-None-Match": etag})
+            response = conn.getresponse()
+            response.read()
+            samples.append(time.perf_counter() - start)
+            not_modified += response.status == 304
+    finally:
+        conn.close()
+    return samples, not_modified
+
+
+@benchmark("http")
+def bench_http(ctx: BenchContext) -> List[BenchResult]:
+    serve_dir = ctx.scratch / "serve"
+    serve_dir.mkdir(exist_ok=True)
+    (serve_dir / "bench.wav").write_bytes(random.Random(0).randbytes(_FILE_SIZE))
+
+    server = DownloadHTTPServer(str(serve_dir), host="127.0.0.1", port=0)
+    results: List[BenchResult] = []
+    requests_per_client = 20 if ctx.quick else 50
+    # The handler logs every request to stderr; keep the report readable.
+    with redirect_stderr(io.StringIO()):
+        server.start()
+        try:
+            for clients in (1, 4, 16):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=clients) as pool:
+                    futures = [
+                        pool.submit(_client, server.client_port, requests_per_client, seed) for seed in range(clients)
+                    ]
+                    samples = [s for f in futures for s in f.result()]
+                wall = time.perf_counter() - started
+                total_bytes = sum(s[3] for s in samples)
+                params = {"clients": clients, "range_bytes": _RANGE_SIZE}
+                extra = {
+                    "throughput_mb_s": total_bytes / wall / 1e6,
+                    "requests_per_s": len(samples) / wall,
+                    "partial_responses": sum(1 for s in samples if s[2] == 206) / len(samples),
+                    "bytes_per_request": total_bytes / len(samples),
+                }
+                results.append(BenchResult.from_samples("http.range_ttfb", params, [s[0] for s in samples]))
+                results.append(BenchResult.from_samples("http.range_total", params, [s[1] for s in samples], **extra))
+            samples, not_modified = _revalidate(server.client_port, requests_per_client * 5)
+            results.append(
+                BenchResult.from_samples(
+                    "http.revalidate", {"clients": 1}, samples, not_modified=not_modified / len(samples)
+                )
+            )
+        finally:
+            server.stop()
+    return results
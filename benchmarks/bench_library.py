@@ -0,0 +1,30 @@
+from typing import List
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark, measure
+
+
+@benchmark("library")
+def bench_library(ctx: BenchContext) -> List[BenchResult]:
+    from src.audio.library import LibraryIndex
+
+    try:
+        from src.gui.downloads_list import list_wav_files
+    except ImportError as exc:
+        return [BenchResult("library.list_wav_files", {}, skipped=f"GUI toolkit unavailable: {exc}")]
+
+    size = ctx.library_size
+    root = ctx.wav_tree(size)
+    params = {"files": size}
+    names = list_wav_files(root)
+    results = [
+        BenchResult.from_samples(
+            "library.list_wav_files",
+            params,
+            measure(lambda: list_wav_files(root), time_budget=ctx.time_budget),
+            listed=len(names),
+        )
+    ]
+
+    index = LibraryIndex(root)
+    results.append(BenchResult.from_samples("library.rescan", params, measure(index.rescan, time_budget=ctx.time_budget)))
+    return results
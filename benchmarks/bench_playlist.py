@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import List
+
+from benchmarks.harness import BenchContext, BenchResult, FakeSonosDevice, NullPrefetcher, benchmark, measure
+from src.audio.music_player_manager import MusicPlayerManager
+
+
+def _player(tracks: List[Path]) -> MusicPlayerManager:
+    pm = MusicPlayerManager()
+    pm.prefetcher = NullPrefetcher()
+    pm.set_device(FakeSonosDevice())
+    pm.set_stream_base_url("http://127.0.0.1:9")
+    for track in tracks:
+        pm.add_song(track)
+    return pm
+
+
+@benchmark("playlist")
+def bench_playlist(ctx: BenchContext) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    for size in ctx.playlist_sizes:
+        paths = ctx.wav_paths(size + 1)
+        tracks, extra = paths[:size], paths[size]
+        params = {"tracks": size}
+
+        # Building the queue is timed once; it is the sum of `size` appends.
+        pm = MusicPlayerManager()
+        pm.prefetcher = NullPrefetcher()
+        samples = measure(lambda: [pm.add_song(t) for t in tracks], max_repeats=1, min_repeats=1)
+        results.append(BenchResult.from_samples("playlist.build", params, samples, per_track=samples[0] / size))
+
+        pm = _player(tracks)
+        results.append(
+            BenchResult.from_samples(
+                "playlist.add_song",
+                params,
+                measure(lambda: pm.add_song(extra), setup=lambda: pm.remove_song(extra), time_budget=ctx.time_budget),
+            )
+        )
+        pm.remove_song(extra)
+
+        # Removing the last entry is the worst case for a linear scan.
+        last = tracks[-1]
+        results.append(
+            BenchResult.from_samples(
+                "playlist.remove_song",
+                params,
+                measure(lambda: pm.remove_song(last), setup=lambda: pm.add_song(last), time_budget=ctx.time_budget),
+            )
+        )
+        pm.add_song(last)
+
+        middle = tracks[size // 2]
+        results.append(
+            BenchResult.from_samples(
+                "playlist.play_track", params, measure(lambda: pm.play_track(middle), time_budget=ctx.time_budget)
+            )
+        )
+        results.append(BenchResult.from_samples("playlist.next", params, measure(pm.next, time_budget=ctx.time_budget)))
+
+        pm.toggle_shuffle()
+        results.append(
+            BenchResult.from_samples("playlist.next_shuffle", params, measure(pm.next, time_budget=ctx.time_budget))
+        )
+    return results
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark
+from src.misc.pathing import ROOT_DIR
+
+_TIMEOUT = 30.0
+_MILESTONES = ("imports", "init", "window", "ready")
+
+
+def _launch(ctx: BenchContext, report: Path, extra: List[str]) -> Dict[str, float]:
+    """
+    Start main.py, wait for its start-up report and stop it again.
+    """
+    report.unlink(missing_ok=True)
+    env = dict(os.environ, SONOS_THING_DB=str(ctx.scratch / "startup.db"))
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT_DIR / "main.py"), "--startup-report", str(report), *extra],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + _TIMEOUT
+        while not report.exists():
+            if proc.poll() is not None:
+                raise RuntimeError(f"main.py exited with {proc.returncode} before it was ready")
+            if time.monotonic() > deadline:
+                raise RuntimeError("main.py did not report ready in time")
+            time.sleep(0.02)
+        # Written in one call, but give a partial write a moment to finish.
+        for _ in range(10):
+            try:
+                return json.loads(report.read_text(encoding="utf-8"))
+            except ValueError:
+                time.sleep(0.02)
+        raise RuntimeError("unreadable start-up report")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _collect(ctx: BenchContext, mode: str, extra: List[str], runs: int) -> List[BenchResult]:
+    samples: Dict[str, List[float]] = {}
+    for run in range(runs):
+        milestones = _launch(ctx, ctx.scratch / f"startup-{mode}-{run}.json", extra)
+        for name in _MILESTONES:
+            if name in milestones:
+                samples.setdefault(name, []).append(milestones[name])
+    return [BenchResult.from_samples(f"startup.{name}", {"mode": mode}, samples[name]) for name in _MILESTONES if name in samples]
+
+
+@benchmark("startup")
+def bench_startup(ctx: BenchContext) -> List[BenchResult]:
+    """
+    Cold start of main.py in fresh processes: time to imports done, to the
+    window being drawn (GUI) and to ready, i.e. background start-up finished.
+    Uses simulated speakers so discovery does not wait on the network.
+    """
+    runs = 2 if ctx.quick else 5
+    common = ["--simulate", "2", "--host", "127.0.0.1"]
+    results = _collect(ctx, "headless", ["--headless", *common], runs)
+    try:
+        import tkinter
+
+        tkinter.Tk().destroy()
+    except Exception as exc:
+        return results + [BenchResult("startup.window", {"mode": "gui"}, skipped=f"no display: {exc}")]
+    return results + _collect(ctx, "gui", common, runs)
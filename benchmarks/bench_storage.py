@@ -0,0 +1,56 @@
+from typing import List
+
+from benchmarks.harness import BenchContext, BenchResult, benchmark, measure
+from src.sqlite_connection import SqliteConnection
+
+
+@benchmark("storage")
+def bench_storage(ctx: BenchContext) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    sizes = [1_000, 10_000] if ctx.quick else [1_000, 10_000, 50_000]
+    for size in sizes:
+        db_path = ctx.scratch / f"bench-{size}.db"
+        paths = ctx.wav_paths(size)
+        params = {"songs": size}
+
+        def _reset() -> None:
+            db_path.unlink(missing_ok=True)
+
+        def _bulk_insert() -> None:
+            with SqliteConnection(db_path) as db:
+                db.add_playlist_with_songs("bench", paths)
+
+        results.append(
+            BenchResult.from_samples(
+                "sqlite.add_playlist_with_songs",
+                params,
+                measure(_bulk_insert, setup=_reset, time_budget=ctx.time_budget, max_repeats=20),
+            )
+        )
+
+        # Half of the rows point at files that do not exist.
+        missing = [ctx.scratch / "missing" / f"gone-{idx:06d}.wav" for idx in range(size // 2)]
+        present = paths[: size - len(missing)]
+
+        def _populate() -> None:
+            _reset()
+            with SqliteConnection(db_path) as db:
+                for song in present + missing:
+                    db.add_song(song)
+
+        removed: List[int] = []
+
+        def _remove_missing() -> None:
+            with SqliteConnection(db_path) as db:
+                removed.append(db.remove_missing_song_entries())
+
+        results.append(
+            BenchResult.from_samples(
+                "sqlite.remove_missing_song_entries",
+                params,
+                measure(_remove_missing, setup=_populate, time_budget=ctx.time_budget, max_repeats=20),
+                removed=removed[-1],
+            )
+        )
+        _reset()
+    return results
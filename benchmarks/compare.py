@@ -0,0 +1,48 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+
+def _index(report: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    indexed = {}
+    for result in report.get("results", []):
+        params = ",".join(f"{k}={v}" for k, v in sorted(result.get("params", {}).items()))
+        indexed[f"{result['name']}[{params}]" if params else result["name"]] = result
+    return indexed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare", description="Compare two benchmark reports by median time."
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown treated as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = _index(json.load(fh))
+    with open(args.current, encoding="utf-8") as fh:
+        current = _index(json.load(fh))
+
+    regressions = 0
+    print(f"{'benchmark':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(key, {}), current.get(key, {})
+        old_median, new_median = old.get("median"), new.get("median")
+        if old_median is None or new_median is None:
+            note = new.get("skipped") or old.get("skipped") or ("new" if key not in baseline else "removed")
+            print(f"{key:<60} {'-':>12} {'-':>12} {note}")
+            continue
+        change = (new_median - old_median) / old_median if old_median else 0.0
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{key:<60} {old_median * 1000:>10.3f}ms {new_median * 1000:>10.3f}ms {change:>+7.1%}{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import gc
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BenchFn = Callable[["BenchContext"], List["BenchResult"]]
+
+_BENCHMARKS: Dict[str, BenchFn] = {}
+
+
+@dataclass
+class BenchResult:
+    name: str
+    params: Dict[str, Any]
+    unit: str = "s"
+    repeats: int = 0
+    min: Optional[float] = None
+    median: Optional[float] = None
+    mean: Optional[float] = None
+    p95: Optional[float] = None
+    stdev: Optional[float] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+    skipped: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in sorted(self.params.items()))
+        return f"{self.name}[{params}]" if params else self.name
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if v is not None and v != {}}
+
+    @classmethod
+    def from_samples(cls, name: str, params: Dict[str, Any], samples: List[float], **extra: Any) -> "BenchResult":
+        ordered = sorted(samples)
+        return cls(
+            name=name,
+            params=params,
+            repeats=len(samples),
+            min=ordered[0],
+            median=statistics.median(ordered),
+            mean=statistics.fmean(ordered),
+            p95=ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+            stdev=statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+            extra=extra,
+        )
+
+
+class BenchContext:
+    """
+    Shared state for one run: size presets, a scratch directory and cached
+    fixture trees so expensive setup (e.g. 100k files) happens once.
+    """
+
+    def __init__(self, quick: bool, time_budget: float) -> None:
+        self.quick = quick
+        self.time_budget = time_budget
+        self._tmp = tempfile.TemporaryDirectory(prefix="sonos-thing-bench-")
+        self.scratch = Path(self._tmp.name)
+        self._trees: Dict[int, Path] = {}
+
+    @property
+    def playlist_sizes(self) -> List[int]:
+        return [1_000, 10_000] if self.quick else [1_000, 10_000, 100_000]
+
+    @property
+    def library_size(self) -> int:
+        return 10_000 if self.quick else 50_000
+
+    def wav_tree(self, count: int) -> Path:
+        """
+        Directory with `count` empty .wav files named track-000000.wav onwards.
+        Larger trees reuse the files of smaller ones.
+        """
+        root = self.scratch / "tracks"
+        root.mkdir(exist_ok=True)
+        existing = max(self._trees, default=0)
+        for idx in range(existing, count):
+            (root / f"track-{idx:06d}.wav").touch()
+        if count > existing:
+            self._trees[count] = root
+        return root
+
+    def wav_paths(self, count: int) -> List[Path]:
+        root = self.wav_tree(count)
+        return [root / f"track-{idx:06d}.wav" for idx in range(count)]
+
+    def close(self) -> None:
+        self._tmp.cleanup()
+
+
+def measure(
+    fn: Callable[[], Any],
+    setup: Optional[Callable[[], Any]] = None,
+    time_budget: float = 1.0,
+    min_repeats: int = 3,
+    max_repeats: int = 1000,
+) -> List[float]:
+    """
+    Time `fn` repeatedly until the budget is spent (within the repeat bounds).
+    `setup` runs before each call and is not timed. GC is paused while timing.
+    """
+    samples: List[float] = []
+    deadline = time.perf_counter() + time_budget
+    gc_was_enabled = gc.isenabled()
+    try:
+        while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() < deadline):
+            if setup:
+                setup()
+            gc.disable()
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+            if gc_was_enabled:
+                gc.enable()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def benchmark(name: str) -> Callable[[BenchFn], BenchFn]:
+    def decorator(fn: BenchFn) -> BenchFn:
+        _BENCHMARKS[name] = fn
+        return fn
+
+    return decorator
+
+
+def registered() -> Dict[str, BenchFn]:
+    return dict(_BENCHMARKS)
+
+
+class FakeSonosDevice:
+    """
+    Stand-in for SonosDeviceHandle that answers instantly, so player
+    benchmarks measure queue bookkeeping rather than the network.
+    """
+
+    player_name = "Benchmark Speaker"
+
+    def __init__(self) -> None:
+        self.played: List[str] = []
+        self._state = "STOPPED"
+
+    def play_uri(self, uri: str) -> None:
+        self.played.append(uri)
+        self._state = "PLAYING"
+
+    def stop(self) -> None:
+        self._state = "STOPPED"
+
+    def pause(self) -> None:
+        self._state = "PAUSED_PLAYBACK"
+
+    def get_transport_info(self) -> Dict[str, str]:
+        return {"current_transport_state": self._state}
+
+    def get_volume(self) -> int:
+        return 20
+
+    def set_volume(self, volume: int) -> int:
+        return volume
+
+    def change_volume(self, delta: int) -> int:
+        return 20 + delta
+
+    def ungroup(self) -> None:
+        return None
+
+
+class NullPrefetcher:
+    """
+    Prefetcher that does nothing. Warming runs on a background thread in the
+    app, so leaving it out keeps player timings about the calling thread only.
+    """
+
+    def register_variant_builder(self, builder) -> None:
+        return None
+
+    def warm(self, track, uri_builder) -> None:
+        return None
+
+    def take_uri(self, track) -> None:
+        return None
+
+    def clear(self) -> None:
+        return None
+
+
+def run_metadata(quick: bool) -> Dict[str, Any]:
+    def _git(*args: str) -> Optional[str]:
+        try:
+            out = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10, check=True)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return out.stdout.strip()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": quick,
+    }
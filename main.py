@@ -1,8 +1,32 @@
+import argparse
+import os
+
+# First, so its clock covers the other imports.
+from src.misc.startup import STARTUP
+
 from src.audio import MusicPlayerManager, ensure_downloads_dir
-from src.gui.gui import run_application
+from src.audio.crossfade_renderer import renderer_from_settings
 from src.misc.http_server import start_download_server
+from src.misc.tracing import configure_from_options
 from src.sonos import SonosDeviceHandle
 
+STARTUP.mark("imports")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sonos Thing")
+    parser.add_argument("--headless", action="store_true", help="run without the GUI, controlled over HTTP")
+    parser.add_argument("--host", default="0.0.0.0", help="address for the stream/control server")
+    parser.add_argument("--port", type=int, default=0, help="port for the stream/control server (0 = any)")
+    parser.add_argument("--simulate", type=int, metavar="N", help="use N simulated speakers instead of the network")
+    parser.add_argument("--trace", metavar="PATH", help="record tracing spans to a Chrome/Perfetto trace JSON file")
+    parser.add_argument("--profile", type=float, metavar="SECONDS", help="sample all thread stacks for SECONDS")
+    parser.add_argument("--profile-delay", type=float, default=0.0, metavar="SECONDS", help="wait before sampling")
+    parser.add_argument("--profile-out", metavar="PATH", help="collapsed-stack output for --profile")
+    parser.add_argument(
+        "--startup-report", metavar="PATH", help="write start-up milestones (seconds) as JSON once ready"
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
@@ -15,10 +39,31 @@ def main() -> None:
     #coordinator.play_uri("https://music.youtube.com/watch?v=2WPCLda_erI")
 
     #sonos_one.sonos.play_uri("https://music.youtube.com/watch?v=2WPCLda_erI")
+    args = _parse_args()
+    if args.simulate:
+        os.environ["SONOS_THING_SIMULATOR"] = str(args.simulate)
+    configure_from_options(
+        trace=args.trace, profile=args.profile, profile_delay=args.profile_delay, profile_out=args.profile_out
+    )
+    if args.startup_report:
+        STARTUP.set_report_path(args.startup_report)
+    if args.headless:
+        # Imported here so the headless path never loads customtkinter.
+        from src.headless import run_headless
+
+        run_headless(host=args.host, port=args.port)
+        return
+
+    from src.gui.gui import run_application
+
     ensure_downloads_dir()
-    server = start_download_server(str(ensure_downloads_dir()))
+    renderer = renderer_from_settings()
+    server = start_download_server(str(ensure_downloads_dir()), host=args.host, port=args.port, renderer=renderer)
     if server.base_url:
         MusicPlayerManager.instance().set_stream_base_url(server.base_url)
+        MusicPlayerManager.instance().set_stream_url_resolver(server.base_url_for)
+    if renderer:
+        MusicPlayerManager.instance().set_stream_renderer(renderer)
 
     run_application()
 
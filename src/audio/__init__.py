@@ -1,13 +1,80 @@
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from src.misc.pathing import DOWNLOADS_DIR, ensure_downloads_dir
 
-from src.audio.downloader import AudioDownloadManager, download_audio, is_valid_url
-from src.audio.music_player_manager import MusicPlayerManager
+if TYPE_CHECKING:
+    from src.audio.analysis import AudioAnalysisManager, TrackAnalysis
+    from src.audio.content_hash import ContentHasher
+    from src.audio.downloader import (
+        PRIORITY_BULK,
+        PRIORITY_HIGH,
+        PRIORITY_NORMAL,
+        AudioDownloadManager,
+        DownloadCancelled,
+        DownloadProgress,
+        download_audio,
+        is_valid_url,
+    )
+    from src.audio.library import LibraryIndex
+    from src.audio.library_quota import LibraryQuota
+    from src.audio.metadata import MetadataCache, PreflightResult
+    from src.audio.music_player_manager import MusicPlayerManager
+    from src.audio.stream_format import StreamFormatSelector
+    from src.audio.track_catalog import TrackCatalog
+
+# Submodules are imported on first attribute access, so start-up only pays
+# for what it uses (yt-dlp alone takes a few hundred milliseconds).
+_LAZY = {
+    "AudioAnalysisManager": "src.audio.analysis",
+    "TrackAnalysis": "src.audio.analysis",
+    "ContentHasher": "src.audio.content_hash",
+    "PRIORITY_BULK": "src.audio.downloader",
+    "PRIORITY_HIGH": "src.audio.downloader",
+    "PRIORITY_NORMAL": "src.audio.downloader",
+    "AudioDownloadManager": "src.audio.downloader",
+    "DownloadCancelled": "src.audio.downloader",
+    "DownloadProgress": "src.audio.downloader",
+    "download_audio": "src.audio.downloader",
+    "is_valid_url": "src.audio.downloader",
+    "LibraryIndex": "src.audio.library",
+    "LibraryQuota": "src.audio.library_quota",
+    "MetadataCache": "src.audio.metadata",
+    "PreflightResult": "src.audio.metadata",
+    "MusicPlayerManager": "src.audio.music_player_manager",
+    "StreamFormatSelector": "src.audio.stream_format",
+    "TrackCatalog": "src.audio.track_catalog",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
+    "AudioAnalysisManager",
     "AudioDownloadManager",
+    "ContentHasher",
     "DOWNLOADS_DIR",
+    "DownloadCancelled",
+    "DownloadProgress",
     "download_audio",
     "is_valid_url",
     "ensure_downloads_dir",
+    "LibraryIndex",
+    "LibraryQuota",
+    "MetadataCache",
     "MusicPlayerManager",
+    "PRIORITY_BULK",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PreflightResult",
+    "StreamFormatSelector",
+    "TrackAnalysis",
+    "TrackCatalog",
 ]
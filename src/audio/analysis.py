@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set
+
+from src.audio.track_catalog import TrackCatalog
+from src.audio.wav import map_pcm, read_wav_layout, to_float
+from src.misc.dependency_validation import numpy_available
+from src.sqlite_connection import SqliteConnection
+
+WAVEFORM_POINTS = 800
+SILENCE_THRESHOLD_DBFS = -60.0
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+
+_SUB_BLOCK_SECONDS = 0.1  # 400 ms gating blocks = 4 sub-blocks at 75% overlap
+_PEAK_WINDOW_SECONDS = 0.01
+_CHUNK_SUB_BLOCKS = 100
+
+
+@dataclass
+class TrackAnalysis:
+    path: str
+    size: int
+    mtime_ns: int
+    duration: float
+    sample_rate: int
+    channels: int
+    loudness_lufs: Optional[float]
+    replaygain_db: Optional[float]
+    peak: float
+    leading_silence: float
+    trailing_silence: float
+    waveform: List[float] = field(default_factory=list)
+    analyzed_at: float = 0.0
+
+    @property
+    def peak_dbfs(self) -> float:
+        return 20 * math.log10(self.peak) if self.peak > 0 else float("-inf")
+
+    @property
+    def audible_duration(self) -> float:
+        return max(0.0, self.duration - self.leading_silence - self.trailing_silence)
+
+    def to_row(self) -> Dict[str, Any]:
+        row = asdict(self)
+        row["waveform"] = bytes(min(255, int(round(v * 255))) for v in self.waveform)
+        return row
+
+    @staticmethod
+    def from_row(row: Dict[str, Any]) -> "TrackAnalysis":
+        data = dict(row)
+        data["waveform"] = [b / 255 for b in (data.get("waveform") or b"")]
+        return TrackAnalysis(**data)
+
+
+def _biquad_power_response(b: List[float], a: List[float], freqs: Any, sample_rate: int) -> Any:
+    import numpy as np
+
+    z = np.exp(-2j * np.pi * freqs / sample_rate)
+    h = (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(h) ** 2
+
+
+def _k_weighting(freqs: Any, sample_rate: int) -> Any:
+    """
+    Power response of the BS.1770 K-weighting pre-filter (high shelf + high pass)
+    designed for `sample_rate`, evaluated at `freqs`.
+    """
+    gain_db, shelf_q, shelf_fc = 4.0, 1 / math.sqrt(2), 1500.0
+    amp = 10 ** (gain_db / 40)
+    w0 = 2 * math.pi * shelf_fc / sample_rate
+    alpha = math.sin(w0) / (2 * shelf_q)
+    cos_w0 = math.cos(w0)
+    shelf_b = [
+        amp * ((amp + 1) + (amp - 1) * cos_w0 + 2 * math.sqrt(amp) * alpha),
+        -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+        amp * ((amp + 1) + (amp - 1) * cos_w0 - 2 * math.sqrt(amp) * alpha),
+    ]
+    shelf_a = [
+        (amp + 1) - (amp - 1) * cos_w0 + 2 * math.sqrt(amp) * alpha,
+        2 * ((amp - 1) - (amp + 1) * cos_w0),
+        (amp + 1) - (amp - 1) * cos_w0 - 2 * math.sqrt(amp) * alpha,
+    ]
+
+    hp_q, hp_fc = 0.5, 38.0
+    w0 = 2 * math.pi * hp_fc / sample_rate
+    alpha = math.sin(w0) / (2 * hp_q)
+    cos_w0 = math.cos(w0)
+    hp_b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    hp_a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+
+    return _biquad_power_response(shelf_b, shelf_a, freqs, sample_rate) * _biquad_power_response(
+        hp_b, hp_a, freqs, sample_rate
+    )
+
+
+def _integrated_loudness(sub_block_power: Any) -> Optional[float]:
+    """
+    Gated integrated loudness (LUFS) from K-weighted 100 ms mean-square powers
+    summed over channels.
+    """
+    import numpy as np
+
+    if sub_block_power.size == 0:
+        return None
+    if sub_block_power.size >= 4:
+        blocks = np.convolve(sub_block_power, np.full(4, 0.25), mode="valid")
+    else:
+        blocks = np.array([sub_block_power.mean()])
+
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(blocks)
+    above_absolute = block_lufs > -70.0
+    if not above_absolute.any():
+        return None
+    relative_gate = -0.691 + 10 * math.log10(blocks[above_absolute].mean()) - 10.0
+    gated = blocks[above_absolute & (block_lufs > relative_gate)]
+    if gated.size == 0:
+        return None
+    return float(-0.691 + 10 * math.log10(gated.mean()))
+
+
+def analyze_track(path: str) -> Dict[str, Any]:
+    """
+    Analyse a WAV file in one pass over a memory map. Runs in worker processes,
+    so it takes and returns plain picklable values.
+    """
+    import numpy as np
+
+    track = Path(path)
+    stat = track.stat()
+    layout = read_wav_layout(track)
+    pcm = map_pcm(track, layout)
+    rate = layout.sample_rate
+
+    sub_block = max(1, int(rate * _SUB_BLOCK_SECONDS))
+    peak_window = max(1, int(rate * _PEAK_WINDOW_SECONDS))
+    weights = _k_weighting(np.fft.rfftfreq(sub_block, 1 / rate), rate)
+    # Parseval scaling for a one-sided spectrum: interior bins count twice.
+    weights[1 : (sub_block + 1) // 2] *= 2
+    weights /= float(sub_block) ** 2
+
+    powers: List[Any] = []
+    window_peaks: List[Any] = []
+    chunk_frames = sub_block * _CHUNK_SUB_BLOCKS
+    for start in range(0, layout.frames, chunk_frames):
+        chunk = to_float(pcm[start : start + chunk_frames], layout)
+        whole = (len(chunk) // sub_block) * sub_block
+        if whole:
+            blocks = chunk[:whole].reshape(-1, sub_block, layout.channels)
+            spectrum = np.abs(np.fft.rfft(blocks, axis=1)) ** 2
+            powers.append((spectrum * weights[None, :, None]).sum(axis=(1, 2)))
+
+        usable = (len(chunk) // peak_window) * peak_window
+        if usable:
+            peaks = np.abs(chunk[:usable]).reshape(-1, peak_window * layout.channels).max(axis=1)
+            window_peaks.append(peaks)
+        if usable < len(chunk):
+            window_peaks.append(np.abs(chunk[usable:]).max(keepdims=True).reshape(1))
+    del pcm
+
+    sub_block_power = np.concatenate(powers) if powers else np.zeros(0)
+    peaks = np.concatenate(window_peaks) if window_peaks else np.zeros(0)
+    loudness = _integrated_loudness(sub_block_power)
+
+    threshold = 10 ** (SILENCE_THRESHOLD_DBFS / 20)
+    audible = np.flatnonzero(peaks > threshold)
+    window_seconds = peak_window / rate
+    duration = layout.duration
+    if audible.size:
+        leading = float(audible[0] * window_seconds)
+        trailing = float(max(0.0, duration - (audible[-1] + 1) * window_seconds))
+    else:
+        leading, trailing = duration, 0.0
+
+    waveform: List[float] = []
+    if peaks.size:
+        points = min(WAVEFORM_POINTS, peaks.size)
+        edges = np.linspace(0, peaks.size, points + 1).astype(np.int64)[:-1]
+        waveform = np.clip(np.maximum.reduceat(peaks, edges), 0.0, 1.0).round(4).tolist()
+
+    return TrackAnalysis(
+        path=str(track.resolve()),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        duration=duration,
+        sample_rate=rate,
+        channels=layout.channels,
+        loudness_lufs=loudness,
+        replaygain_db=(REPLAYGAIN_REFERENCE_LUFS - loudness) if loudness is not None else None,
+        peak=float(peaks.max()) if peaks.size else 0.0,
+        leading_silence=leading,
+        trailing_silence=trailing,
+        waveform=waveform,
+        analyzed_at=time.time(),
+    ).to_row()
+
+
+class AudioAnalysisManager:
+    """
+    Singleton that analyses tracks once in a process pool and persists the
+    results, so playback can read duration/loudness/silence without decoding.
+    """
+
+    _instance: Optional["AudioAnalysisManager"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, max_workers: int = 2) -> None:
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+        self._cache: Dict[str, TrackAnalysis] = {}
+        self._in_flight: Set[str] = set()
+        self.available, _ = numpy_available()
+
+    @classmethod
+    def instance(cls) -> "AudioAnalysisManager":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def submit(self, path: Path) -> Optional[Future]:
+        """
+        Queue a file for analysis unless NumPy is missing, it is already being
+        analysed, or stored results match its current size and mtime.
+        """
+        if not self.available:
+            return None
+        record = TrackCatalog.instance().intern(path)
+        track, key = record.path, record.key
+        try:
+            stat = track.stat()
+        except OSError:
+            return None
+
+        existing = self.get(track)
+        if existing and (existing.size, existing.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return None
+
+        with self._lock:
+            if key in self._in_flight:
+                return None
+            self._in_flight.add(key)
+            if self._executor is None:
+                # spawn: forking a process that runs Tk and worker threads is unsafe.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._executor.submit(analyze_track, key)
+        future.add_done_callback(lambda f, k=key: self._on_done(k, f))
+        return future
+
+    def get(self, path: Path) -> Optional[TrackAnalysis]:
+        key = TrackCatalog.instance().key(path)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached:
+            return cached
+        try:
+            with SqliteConnection() as db:
+                row = db.get_track_analysis(key)
+        except Exception:
+            return None
+        if not row:
+            return None
+        analysis = TrackAnalysis.from_row(row)
+        with self._lock:
+            self._cache[key] = analysis
+        return analysis
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _on_done(self, key: str, future: Future) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            print(f"Analysis failed for {Path(key).name}: {error}")
+            return
+        row = future.result()
+        try:
+            with SqliteConnection() as db:
+                db.save_track_analysis(row)
+        except Exception as exc:
+            print(f"Could not store analysis for {Path(key).name}: {exc}")
+        with self._lock:
+            self._cache[key] = TrackAnalysis.from_row(row)
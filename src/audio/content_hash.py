@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import mmap
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from hashlib import blake2b
+from pathlib import Path
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from src.audio.library import is_library_file, scan_wav_files
+from src.audio.track_catalog import TrackCatalog
+from src.audio.wav import read_wav_layout
+from src.misc.fs_watcher import CREATED, RENAMED, WatchEvent
+from src.misc.metrics import REGISTRY
+from src.misc.pathing import DOWNLOADS_DIR
+from src.sqlite_connection import SqliteConnection
+
+if TYPE_CHECKING:
+    from src.audio.library import LibraryIndex
+
+DEDUPE_SETTING = "library_dedupe"
+HASH_WORKERS = 4
+# hashlib releases the GIL for large updates, so workers hash in parallel.
+HASH_CHUNK = 4 * 1024 * 1024
+
+_HASHED_BYTES = REGISTRY.counter("sonos_thing_content_hash_bytes_total", "Bytes read to compute content hashes.")
+_DUPLICATES = REGISTRY.counter(
+    "sonos_thing_library_duplicates_total", "Duplicate library files found, by action.", ["action"]
+)
+
+
+@dataclass(frozen=True)
+class ContentHash:
+    path: str
+    size: int
+    mtime_ns: int
+    # Digest of the audio payload only, so copies whose headers differ
+    # (e.g. metadata tags) still match.
+    audio_hash: str
+    # Identifies the exact file: a composite digest of the bytes before the
+    # audio, audio_hash and the bytes after it, computed in the same pass.
+    # It is not a hash of the raw file, so only compare it with hash_file()
+    # results (e.g. as the stream server's ETag), never with external hashes.
+    file_hash: str
+    hashed_at: float = 0.0
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.file_hash}"'
+
+    def matches(self, size: int, mtime_ns: int) -> bool:
+        return (self.size, self.mtime_ns) == (size, mtime_ns)
+
+
+def hash_file(path: Path) -> Tuple[str, str]:
+    """
+    (audio hash, file hash) of a file, read through a memory map in chunks.
+    For WAVs the audio hash covers the sample format and the data chunk;
+    for anything else it covers the whole file. The file hash is
+    blake2b(header bytes + audio digest + trailer bytes), which changes
+    whenever any byte does without hashing the audio twice.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    try:
+        layout = read_wav_layout(path)
+        start, end = layout.data_offset, layout.data_offset + layout.data_size
+        audio = blake2b(digest_size=16)
+        audio.update(f"{layout.sample_rate}/{layout.channels}/{layout.sample_width}/{layout.is_float}".encode())
+    except ValueError:
+        start, end = 0, size
+        audio = blake2b(digest_size=16)
+    whole = blake2b(digest_size=16)
+    if size:
+        with path.open("rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapped)
+            try:
+                for offset in range(start, end, HASH_CHUNK):
+                    audio.update(view[offset : min(end, offset + HASH_CHUNK)])
+                whole.update(view[:start])
+                whole.update(audio.digest())
+                whole.update(view[end:])
+            finally:
+                view.release()
+        _HASHED_BYTES.inc(size)
+    else:
+        whole.update(audio.digest())
+    return audio.hexdigest(), whole.hexdigest()
+
+
+class ContentHasher:
+    """
+    Singleton that hashes library files on a thread pool and keeps the
+    results in SQLite, invalidated by size and mtime. Files with the same
+    audio hash are duplicates: playlists and the live queue are pointed at
+    one canonical copy (the oldest), and the other copies are deleted when
+    the `library_dedupe` setting is "delete". A new download that duplicates
+    an existing file is always dropped in favour of that file.
+    """
+
+    _instance: Optional["ContentHasher"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, workers: int = HASH_WORKERS, downloads_dir: Path = DOWNLOADS_DIR) -> None:
+        self.workers = workers
+        self.downloads_dir = Path(downloads_dir)
+        self._lock = Lock()
+        self._merge_lock = Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cache: Dict[str, ContentHash] = {}
+        self._pending: Dict[str, Future] = {}
+        self._unsubscribe = None
+
+    @classmethod
+    def instance(cls) -> "ContentHasher":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def start(self, library: LibraryIndex) -> None:
+        """
+        Hash files as they appear in the library, and check the whole
+        library for duplicates in the background.
+        """
+        if self._unsubscribe is None:
+            self._unsubscribe = library.subscribe(self._on_library_event)
+        Thread(target=self.scan, name="content-hash-scan", daemon=True).start()
+
+    # --- hashes ---
+    def lookup(self, path: Path, stat=None) -> Optional[ContentHash]:
+        """
+        Stored hash of `path` if it still matches the file on disk. Never hashes.
+        """
+        key = TrackCatalog.instance().key(path)
+        try:
+            stat = stat or Path(key).stat()
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            try:
+                with SqliteConnection() as db:
+                    row = db.get_content_hash(key)
+            except Exception:
+                return None
+            if row is None:
+                return None
+            entry = ContentHash(**row)
+            with self._lock:
+                self._cache[key] = entry
+        return entry if entry.matches(stat.st_size, stat.st_mtime_ns) else None
+
+    def submit(self, path: Path) -> Future:
+        """
+        Hash `path` on the pool unless a valid hash is stored; concurrent
+        requests for one file share the work.
+        """
+        key = TrackCatalog.instance().key(path)
+        entry = self.lookup(Path(key))
+        if entry is not None:
+            done: Future = Future()
+            done.set_result(entry)
+            return done
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="content-hash")
+                future = self._executor.submit(self._hash, key)
+                self._pending[key] = future
+                future.add_done_callback(lambda _f: self._forget(key))
+        return future
+
+    def hash(self, path: Path) -> ContentHash:
+        return self.submit(path).result()
+
+    def _hash(self, key: str) -> ContentHash:
+        path = Path(key)
+        before = path.stat()
+        audio_hash, file_hash = hash_file(path)
+        after = path.stat()
+        if (before.st_size, before.st_mtime_ns) != (after.st_size, after.st_mtime_ns):
+            raise RuntimeError(f"{path.name} changed while it was hashed")
+        entry = ContentHash(key, after.st_size, after.st_mtime_ns, audio_hash, file_hash, time.time())
+        try:
+            with SqliteConnection() as db:
+                db.save_content_hash(asdict(entry))
+        except Exception as exc:
+            print(f"Could not store content hash for {path.name}: {exc}")
+        with self._lock:
+            self._cache[key] = entry
+        return entry
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    # --- duplicates ---
+    def duplicates(self) -> List[List[Path]]:
+        """
+        Groups of existing files with the same audio, canonical copy first.
+        Only files hashed since their last change are considered.
+        """
+        with SqliteConnection() as db:
+            rows = db.get_duplicate_content_hashes()
+        groups: Dict[str, List[Tuple[int, str]]] = {}
+        for row in rows:
+            entry = self.lookup(Path(row["path"]))
+            if entry is not None and entry.audio_hash == row["audio_hash"]:
+                groups.setdefault(entry.audio_hash, []).append((entry.mtime_ns, entry.path))
+        return [[Path(p) for _m, p in sorted(group)] for group in groups.values() if len(group) > 1]
+
+    def scan(self, paths: Optional[Iterable[Path]] = None) -> List[List[Path]]:
+        """
+        Hash `paths` (default: the whole library), then merge every duplicate
+        into its canonical copy. Returns the duplicate groups found.
+        """
+        futures = [self.submit(p) for p in (scan_wav_files(self.downloads_dir) if paths is None else paths)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                print(f"Could not hash library file: {exc}")
+        groups = self.duplicates()
+        delete = self._delete_duplicates()
+        for canonical, *copies in groups:
+            for copy in copies:
+                self.merge(copy, canonical, delete=delete)
+        if groups:
+            print(f"Found {sum(len(g) - 1 for g in groups)} duplicate library file(s) in {len(groups)} group(s).")
+        return groups
+
+    def dedupe_new(self, path: Path) -> Path:
+        """
+        If a freshly written file has the same audio as one already in the
+        library, delete it and return the existing file; else return `path`.
+        """
+        entry = self.hash(path)
+        with SqliteConnection() as db:
+            rows = db.get_content_hashes_by_audio(entry.audio_hash)
+        others = []
+        for row in rows:
+            if row["path"] == entry.path:
+                continue
+            other = self.lookup(Path(row["path"]))
+            if other is not None and other.audio_hash == entry.audio_hash:
+                others.append((other.mtime_ns, other.path))
+        if not others:
+            return Path(entry.path)
+        canonical = Path(min(others)[1])
+        print(f"{Path(entry.path).name} duplicates {canonical.name}; keeping the existing file.")
+        self.merge(Path(entry.path), canonical, delete=True)
+        return canonical
+
+    def merge(self, duplicate: Path, canonical: Path, delete: bool) -> None:
+        """
+        Point saved playlists and the live queue at `canonical` instead of
+        `duplicate`, and delete `duplicate` if asked.
+        """
+        # Imported here: the player imports this module's neighbours.
+        from src.audio.music_player_manager import MusicPlayerManager
+
+        catalog = TrackCatalog.instance()
+        duplicate, canonical = catalog.intern(duplicate).path, catalog.intern(canonical).path
+        with self._merge_lock:
+            with SqliteConnection() as db:
+                db.repoint_song(duplicate, canonical)
+                if delete:
+                    db.delete_song(duplicate)
+                    db.delete_content_hash(duplicate)
+            MusicPlayerManager.instance().rename_song(duplicate, canonical)
+            if delete:
+                try:
+                    duplicate.unlink()
+                except FileNotFoundError:
+                    pass
+                with self._lock:
+                    self._cache.pop(str(duplicate), None)
+        _DUPLICATES.labels("deleted" if delete else "merged").inc()
+
+    @staticmethod
+    def _delete_duplicates() -> bool:
+        try:
+            with SqliteConnection() as db:
+                return (db.get_setting(DEDUPE_SETTING) or "").lower() == "delete"
+        except Exception:
+            return False
+
+    def _on_library_event(self, event: WatchEvent) -> None:
+        if event.kind == RENAMED and event.old_path is not None:
+            # A rename keeps size and mtime, so the stored hash still applies.
+            old = self.lookup(event.old_path, stat=_stat_or_none(event.path))
+            if old is not None:
+                self._carry_over(old, event.path)
+                return
+        if event.kind in (CREATED, RENAMED) and is_library_file(event.path):
+            self.submit(event.path)
+
+    def _carry_over(self, entry: ContentHash, new_path: Path) -> None:
+        key = TrackCatalog.instance().key(new_path)
+        moved = ContentHash(key, entry.size, entry.mtime_ns, entry.audio_hash, entry.file_hash, entry.hashed_at)
+        try:
+            with SqliteConnection() as db:
+                db.delete_content_hash(entry.path)
+                db.save_content_hash(asdict(moved))
+        except Exception as exc:
+            print(f"Could not move content hash to {Path(key).name}: {exc}")
+        with self._lock:
+            self._cache.pop(entry.path, None)
+            self._cache[key] = moved
+
+
+def _stat_or_none(path: Path):
+    try:
+        return Path(path).stat()
+    except OSError:
+        return None
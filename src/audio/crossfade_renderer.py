@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import uuid
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from src.audio.analysis import SILENCE_THRESHOLD_DBFS, AudioAnalysisManager
+from src.audio.wav import WavLayout, from_float, map_pcm, read_wav_layout, to_float, wav_header
+from src.misc.dependency_validation import numpy_available
+from src.sqlite_connection import SqliteConnection
+
+STREAM_PATH_PREFIX = "/stream/"
+
+# User-initiated track changes fade faster than natural transitions.
+_SWITCH_FADE_SECONDS = 1.0
+_SILENCE_SCAN_SECONDS = 1.0
+
+
+class _TrackSource:
+    """
+    Read cursor over one track's memory-mapped PCM, limited to its audible span.
+    """
+
+    def __init__(self, path: Path, layout: WavLayout, trim_silence: bool) -> None:
+        self.path = path
+        self.layout = layout
+        self.pcm = map_pcm(path, layout)
+        self.start, self.end = _audible_bounds(path, self.pcm, layout) if trim_silence else (0, layout.frames)
+        self.pos = self.start
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.end - self.pos)
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    def read(self, frames: int) -> Any:
+        import numpy as np
+
+        stop = min(self.end, self.pos + frames)
+        block = to_float(self.pcm[self.pos : stop], self.layout)
+        self.pos = stop
+        if len(block) < frames:
+            block = np.concatenate([block, np.zeros((frames - len(block), self.layout.channels), dtype=np.float32)])
+        return block
+
+
+def _audible_bounds(path: Path, pcm: Any, layout: WavLayout) -> tuple[int, int]:
+    """
+    Frame range between leading and trailing silence. Uses stored analysis when
+    it is current, otherwise scans inwards from both ends of the memory map.
+    """
+    import numpy as np
+
+    analysis = AudioAnalysisManager.instance().get(path)
+    if analysis:
+        try:
+            stat = path.stat()
+            if (analysis.size, analysis.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                start = int(analysis.leading_silence * layout.sample_rate)
+                end = layout.frames - int(analysis.trailing_silence * layout.sample_rate)
+                return (start, end) if end > start else (0, layout.frames)
+        except OSError:
+            pass
+
+    threshold = 10 ** (SILENCE_THRESHOLD_DBFS / 20)
+    step = max(1, int(layout.sample_rate * _SILENCE_SCAN_SECONDS))
+    start = None
+    for offset in range(0, layout.frames, step):
+        loud = np.flatnonzero(np.abs(to_float(pcm[offset : offset + step], layout)).max(axis=1) > threshold)
+        if loud.size:
+            start = offset + int(loud[0])
+            break
+    if start is None:
+        return 0, layout.frames
+
+    end = layout.frames
+    for offset in range(layout.frames, start, -step):
+        lo = max(start, offset - step)
+        loud = np.flatnonzero(np.abs(to_float(pcm[lo:offset], layout)).max(axis=1) > threshold)
+        if loud.size:
+            end = lo + int(loud[-1]) + 1
+            break
+    return start, end
+
+
+class CrossfadeSession:
+    """
+    One continuous WAV stream for a speaker. As the current track nears its
+    end, the session asks `peek_next` for the upcoming track and mixes it in
+    with an equal-power crossfade, then reports it to `on_advance`. A track
+    it cannot mix (different sample format, unreadable) ends the stream
+    without being reported, so the player can play it on its own. Rendering
+    works chunk by chunk straight from the memory maps, so memory use does
+    not depend on track length.
+    """
+
+    def __init__(
+        self,
+        first_track: Path,
+        peek_next: Callable[[], Optional[Path]],
+        on_advance: Optional[Callable[[Path], None]] = None,
+        crossfade_seconds: float = 4.0,
+        trim_silence: bool = True,
+        chunk_frames: int = 4096,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.layout = read_wav_layout(first_track)
+        self.peek_next = peek_next
+        self.on_advance = on_advance
+        self.crossfade_seconds = max(0.0, crossfade_seconds)
+        self.trim_silence = trim_silence
+        self.chunk_frames = chunk_frames
+        self.closed = False
+        self._lock = Lock()
+        self._pending: Optional[Path] = Path(first_track)
+        self._current: Optional[_TrackSource] = None
+        self._incoming: Optional[_TrackSource] = None
+        self._fade_pos = 0
+        self._fade_len = 0
+        self._exhausted = False
+        self._reader = 0
+        # Upcoming track the stream ended before, because it could not be mixed.
+        self.handoff: Optional[Path] = None
+
+    @property
+    def path(self) -> str:
+        return f"{STREAM_PATH_PREFIX}{self.id}.wav"
+
+    @property
+    def current_track(self) -> Optional[Path]:
+        with self._lock:
+            source = self._incoming or self._current
+            return source.path if source else None
+
+    def accepts(self, track: Path) -> bool:
+        """
+        Whether `track` can be mixed into this stream (same sample format).
+        """
+        try:
+            return read_wav_layout(track).same_format(self.layout)
+        except (OSError, ValueError):
+            return False
+
+    def switch_to(self, track: Path) -> None:
+        """
+        Fade over to `track` at the next chunk boundary. Check accepts() first.
+        """
+        with self._lock:
+            self._pending = Path(track)
+            self._exhausted = False
+            self.handoff = None
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._current = self._incoming = None
+
+    def stream(self) -> Iterator[bytes]:
+        """
+        Yield the WAV header followed by PCM until the queue runs out. A new
+        reader (e.g. the speaker reconnecting) takes over from the previous one.
+        """
+        with self._lock:
+            self._reader += 1
+            reader = self._reader
+        yield wav_header(self.layout, 0xFFFFFFFF)
+        while True:
+            with self._lock:
+                if self.closed or reader != self._reader:
+                    return
+                request = self._next_request()
+            if request is not None:
+                # Opening a track reads analysis from SQLite and may scan for
+                # silence; neither happens under the lock.
+                self._load(*request)
+            with self._lock:
+                if self.closed or reader != self._reader:
+                    return
+                chunk = self._render_chunk()
+            if chunk is None:
+                return
+            yield chunk
+
+    # --- loading tracks (without the lock) ---
+    def _next_request(self) -> Optional[Tuple[str, Optional[Path]]]:
+        # Lock held. ("switch", track) for a pending switch_to, ("next", None)
+        # when the upcoming track is due, else None.
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            return "switch", pending
+        if self._current is None or self._incoming is not None or self._exhausted:
+            return None
+        if self._current.remaining <= int(self.crossfade_seconds * self.layout.sample_rate):
+            return "next", None
+        return None
+
+    def _load(self, kind: str, track: Optional[Path]) -> None:
+        if kind == "next":
+            track = self.peek_next()
+        source, reason = self._open(track) if track is not None else (None, "end of queue")
+        with self._lock:
+            if self.closed:
+                return
+            if kind == "next" and self._pending is not None:
+                # A switch_to arrived meanwhile; it wins.
+                return
+            if source is None:
+                if kind == "switch":
+                    print(f"Stream cannot switch to {Path(track).name}: {reason}")
+                    return
+                if track is not None:
+                    print(f"Stream ends before {Path(track).name}: {reason}")
+                self._exhausted = True
+                self.handoff = track
+                return
+            if kind == "switch":
+                self._begin_fade(source, min(self.crossfade_seconds, _SWITCH_FADE_SECONDS))
+                return
+            self._begin_fade(source, self.crossfade_seconds)
+        if self.on_advance:
+            self.on_advance(source.path)
+
+    def _open(self, track: Path) -> Tuple[Optional[_TrackSource], Optional[str]]:
+        try:
+            layout = read_wav_layout(track)
+            if not layout.same_format(self.layout):
+                return None, "its sample format differs from the stream"
+            return _TrackSource(Path(track), layout, self.trim_silence), None
+        except (OSError, ValueError) as exc:
+            return None, str(exc)
+
+    # --- rendering (called with the lock held) ---
+    def _fade_frames(self, seconds: float, *sources: _TrackSource) -> int:
+        frames = int(seconds * self.layout.sample_rate)
+        return max(0, min([frames] + [s.remaining for s in sources]))
+
+    def _begin_fade(self, source: _TrackSource, seconds: float) -> None:
+        if self._current is None:
+            self._current = source
+            return
+        if self._incoming is not None:
+            self._current = self._incoming
+        self._incoming = source
+        self._fade_pos = 0
+        self._fade_len = self._fade_frames(seconds, self._current, source)
+        if self._fade_len == 0:
+            self._current, self._incoming = source, None
+
+    def _render_chunk(self) -> Optional[bytes]:
+        import numpy as np
+
+        if self._current is None:
+            return None
+
+        frames = self.chunk_frames
+        if self._incoming is not None:
+            frames = min(frames, self._fade_len - self._fade_pos)
+            outgoing = self._current.read(frames)
+            incoming = self._incoming.read(frames)
+            ramp = (self._fade_pos + np.arange(frames, dtype=np.float32)) / self._fade_len * (np.pi / 2)
+            mixed = outgoing * np.cos(ramp)[:, None] + incoming * np.sin(ramp)[:, None]
+            self._fade_pos += frames
+            if self._fade_pos >= self._fade_len:
+                self._current, self._incoming = self._incoming, None
+            return from_float(mixed, self.layout)
+
+        frames = min(frames, self._current.remaining)
+        if frames == 0:
+            # End of queue; a gapless hand-over was loaded before this chunk.
+            self._current = None
+            return None
+        return from_float(self._current.read(frames), self.layout)
+
+
+class StreamRenderer:
+    """
+    Registry of CrossfadeSessions served by DownloadHTTPServer under /stream/.
+    """
+
+    def __init__(self, crossfade_seconds: float = 4.0, trim_silence: bool = True) -> None:
+        self.crossfade_seconds = crossfade_seconds
+        self.trim_silence = trim_silence
+        self._sessions: Dict[str, CrossfadeSession] = {}
+        self._lock = Lock()
+
+    def create_session(
+        self,
+        first_track: Path,
+        peek_next: Callable[[], Optional[Path]],
+        on_advance: Optional[Callable[[Path], None]] = None,
+    ) -> CrossfadeSession:
+        session = CrossfadeSession(
+            first_track,
+            peek_next,
+            on_advance,
+            crossfade_seconds=self.crossfade_seconds,
+            trim_silence=self.trim_silence,
+        )
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get_session(self, session_id: str) -> Optional[CrossfadeSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close_session(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session:
+            session.close()
+
+    def session_for_path(self, url_path: str) -> Optional[CrossfadeSession]:
+        if not url_path.startswith(STREAM_PATH_PREFIX) or not url_path.endswith(".wav"):
+            return None
+        return self.get_session(url_path[len(STREAM_PATH_PREFIX) : -len(".wav")])
+
+
+def renderer_from_settings() -> Optional[StreamRenderer]:
+    """
+    Crossfade rendering is opt-in via the `crossfade_seconds` setting and needs NumPy.
+    """
+    try:
+        with SqliteConnection() as db:
+            crossfade = float(db.get_setting("crossfade_seconds", "0") or 0)
+    except Exception:
+        return None
+    if crossfade <= 0 or not numpy_available()[0]:
+        return None
+    return StreamRenderer(crossfade_seconds=crossfade)
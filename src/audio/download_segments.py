@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from src.misc.metrics import REGISTRY
+from src.sqlite_connection import SqliteConnection
+
+# "auto" (default) tunes per host; an integer fixes the count everywhere.
+SEGMENTS_SETTING = "download_segments"
+# Tuned counts per host, kept across restarts.
+_TUNED_SETTING = "download_segments_tuned"
+DEFAULT_SEGMENTS = 4
+MAX_SEGMENTS = 16
+# Re-probe a neighbouring count after this many downloads from one host,
+# in case the link changed since it was last measured.
+PROBE_EVERY = 8
+# Weight of a new throughput sample in the per-count average.
+_RATE_WEIGHT = 0.5
+
+_SEGMENTS = REGISTRY.gauge("sonos_thing_download_segments", "Segment count the next download from a host uses.", ["host"])
+
+
+@dataclass
+class _HostTuning:
+    segments: int = DEFAULT_SEGMENTS
+    # Segment count -> smoothed throughput in bytes/s.
+    rates: Dict[int, float] = field(default_factory=dict)
+    direction: int = 1
+    downloads: int = 0
+
+
+def _host(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _clamp(segments: int) -> int:
+    return max(1, min(MAX_SEGMENTS, segments))
+
+
+class SegmentTuner:
+    """
+    Singleton that picks how many segments (concurrent fragments or byte
+    ranges) a download uses, per host. It hill-climbs on measured throughput:
+    keep doubling (or halving) while that is faster, settle on the best count
+    seen, and probe a neighbour now and then.
+    """
+
+    _instance: Optional["SegmentTuner"] = None
+    _instance_lock = Lock()
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._hosts: Optional[Dict[str, _HostTuning]] = None
+
+    @classmethod
+    def instance(cls) -> "SegmentTuner":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def segments_for(self, url: str) -> int:
+        fixed = self._fixed_segments()
+        if fixed:
+            return fixed
+        host = _host(url)
+        with self._lock:
+            return self._tuning_locked(host).segments
+
+    def record(self, url: str, segments: int, size: int, seconds: float) -> None:
+        """
+        Feed back how long a download of `size` bytes with `segments` took.
+        """
+        if size <= 0 or seconds <= 0 or self._fixed_segments():
+            return
+        host = _host(url)
+        rate = size / seconds
+        with self._lock:
+            tuning = self._tuning_locked(host)
+            previous = tuning.rates.get(segments)
+            tuning.rates[segments] = rate if previous is None else previous + _RATE_WEIGHT * (rate - previous)
+            tuning.downloads += 1
+            tuning.segments = self._next_locked(tuning, segments)
+            saved = {h: t.segments for h, t in self._hosts.items()}
+        _SEGMENTS.labels(host).set(tuning.segments)
+        try:
+            with SqliteConnection() as db:
+                db.set_setting(_TUNED_SETTING, json.dumps(saved))
+        except Exception as exc:
+            print(f"Could not save download segment tuning: {exc}")
+
+    @staticmethod
+    def _next_locked(tuning: _HostTuning, used: int) -> int:
+        best = max(tuning.rates, key=tuning.rates.get)
+        if best != used:
+            # Going further was slower: head back towards the best count.
+            tuning.direction = 1 if best > used else -1
+            return best
+        # After a step back the direction points the other way, so periodic
+        # probes alternate between the two neighbours.
+        probe = _clamp(used * 2 if tuning.direction > 0 else used // 2)
+        if probe not in tuning.rates or tuning.downloads % PROBE_EVERY == 0:
+            return probe
+        return used
+
+    def _tuning_locked(self, host: str) -> _HostTuning:
+        if self._hosts is None:
+            self._hosts = {}
+            try:
+                with SqliteConnection() as db:
+                    saved = json.loads(db.get_setting(_TUNED_SETTING) or "{}")
+                for name, segments in saved.items():
+                    self._hosts[name] = _HostTuning(segments=_clamp(int(segments)))
+            except Exception:
+                pass
+        return self._hosts.setdefault(host, _HostTuning())
+
+    @staticmethod
+    def _fixed_segments() -> Optional[int]:
+        try:
+            with SqliteConnection() as db:
+                value = db.get_setting(SEGMENTS_SETTING)
+            return _clamp(int(value)) if value else None
+        except Exception:
+            return None
@@ -1,14 +1,77 @@
 from __future__ import annotations
 
-from collections import deque
+import heapq
+import itertools
+import random
+import shutil
+import time
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from threading import Lock, Thread
-from typing import Callable, Deque, Optional, Tuple
+from threading import Event, Lock, Thread, Timer
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
-from yt_dlp import YoutubeDL
+from src.audio.analysis import AudioAnalysisManager
+from src.audio.content_hash import ContentHasher
+from src.audio.download_segments import SegmentTuner
+from src.audio.library_quota import LibraryQuota
+from src.audio.metadata import FORMATS_TTL_SECONDS, MetadataCache, PreflightResult, load_yt_dlp
+from src.misc.bandwidth import BandwidthScheduler
+from src.misc.metrics import DURATION_BUCKETS, REGISTRY
+from src.misc.pathing import ensure_downloads_dir
+from src.misc.tracing import traced
+from src.sqlite_connection import SqliteConnection
 
-from src.misc.pathing import DOWNLOADS_DIR, ensure_downloads_dir
+_QUEUE_DEPTH = REGISTRY.gauge("sonos_thing_download_queue_depth", "Downloads waiting or in progress.")
+_STAGE_SECONDS = REGISTRY.histogram(
+    "sonos_thing_download_stage_seconds",
+    "Time spent per download stage (download, transcode, total).",
+    ["stage"],
+    buckets=DURATION_BUCKETS,
+)
+_DOWNLOADS = REGISTRY.counter("sonos_thing_downloads_total", "Finished downloads by outcome.", ["outcome"])
+
+
+CompletionCallback = Callable[[str, Optional[Path], Optional[Exception]], None]
+ProgressHook = Callable[[dict], None]
+
+# Lower runs first.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BULK = 20
+PRIORITY_NAMES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "bulk": PRIORITY_BULK}
+
+# Progress updates per job are passed on at most this often.
+_PROGRESS_INTERVAL = 0.25
+
+# Concurrent downloads; one by default so a single job gets the full link.
+DOWNLOAD_WORKERS = 1
+# Codec FFmpegExtractAudio converts to; the library only picks up WAVs.
+DEFAULT_CODEC = "wav"
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 600.0
+
+# Errors that another attempt will not fix.
+_PERMANENT_ERRORS = (
+    "Unsupported URL",
+    "Video unavailable",
+    "Private video",
+    "This video is not available",
+    "HTTP Error 404",
+    "HTTP Error 410",
+    "is not a valid URL",
+)
+
+
+class DownloadCancelled(Exception):
+    """
+    Raised from a progress hook to abort a running download.
+    """
+
+    def __init__(self, message: str = "Download cancelled") -> None:
+        super().__init__(message)
 
 
 def is_valid_url(candidate: str) -> bool:
@@ -16,49 +79,238 @@ def is_valid_url(candidate: str) -> bool:
     return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
 
 
-def download_audio(url: str) -> Path:
+def _retry_sleep(attempt: int) -> float:
+    return min(30.0, 2.0**attempt)
+
+
+def is_retriable(error: Exception) -> bool:
+    message = str(error)
+    return not any(marker in message for marker in _PERMANENT_ERRORS)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff with jitter for the journal's job-level retries.
+    """
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+@traced("download_audio")
+def download_audio(
+    url: str,
+    progress_hook: Optional[ProgressHook] = None,
+    codec: Optional[str] = DEFAULT_CODEC,
+    output_dir: Optional[Path] = None,
+) -> Path:
     """
     Download audio as WAV into the downloads directory using yt-dlp's
-    equivalent of `-x --audio-format=wav`.
+    equivalent of `-x --audio-format=wav`. `progress_hook` receives yt-dlp's
+    progress and postprocessor status dicts and may raise DownloadCancelled.
+    `codec` picks another target format, or None to keep the fetched file
+    as is (no ffmpeg); `output_dir` replaces the downloads directory.
     """
-    ensure_downloads_dir()
+    # Deferred: importing yt-dlp costs a few hundred milliseconds at start-up.
+    YoutubeDL = load_yt_dlp()
+
+    if output_dir is None:
+        output_dir = ensure_downloads_dir()
+    else:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    scheduler = BandwidthScheduler.instance()
+    stages = _StageTimer(scheduler.current_limit)
+    # Yields to active speaker streams; unlimited when nothing is streaming.
+    throttle = scheduler.download_hook()
+    tuner = SegmentTuner.instance()
+    segments = tuner.segments_for(url)
+    # aria2c fetches byte ranges in parallel but cannot be throttled through
+    # the progress hook, so it is only used while no speaker is streaming.
+    aria2c = shutil.which("aria2c") if segments > 1 and scheduler.current_limit() is None else None
     ydl_opts = {
         "format": "bestaudio/best",
-        "outtmpl": str(DOWNLOADS_DIR / "%(title)s.%(ext)s"),
+        "outtmpl": str(output_dir / "%(title)s.%(ext)s"),
         "quiet": True,
         "noplaylist": True,
+        # Keep .part files and resume them with a byte range, both on yt-dlp's
+        # own retries and when the journal retries the job later.
+        "continuedl": True,
+        "retries": 10,
+        "fragment_retries": 10,
+        "retry_sleep_functions": {"http": _retry_sleep, "fragment": _retry_sleep},
+        # DASH/HLS formats: fetch this many fragments at once.
+        "concurrent_fragment_downloads": segments,
+        "progress_hooks": [stages.on_progress, throttle] + ([progress_hook] if progress_hook else []),
+        "postprocessor_hooks": [stages.on_postprocess] + ([progress_hook] if progress_hook else []),
         "postprocessors": [
             {
                 "key": "FFmpegExtractAudio",
-                "preferredcodec": "wav",
+                "preferredcodec": codec,
                 "preferredquality": "0",
             }
-        ],
+        ]
+        if codec
+        else [],
     }
+    if aria2c:
+        # Plain HTTP formats: split the file into byte ranges.
+        ydl_opts["external_downloader"] = {"http": aria2c}
+        ydl_opts["external_downloader_args"] = {"aria2c": ["-x", str(segments), "-s", str(segments), "-k", "1M"]}
+    cache = MetadataCache.instance()
+    cached = cache.get(url, max_age=FORMATS_TTL_SECONDS)
     with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
+        info = None
+        if cached:
+            # A recent preflight already ran the extractor; download from its result.
+            try:
+                info = ydl.process_ie_result(cached, download=True)
+            except DownloadCancelled:
+                raise
+            except Exception as exc:
+                print(f"Cached metadata for {url} is stale, extracting again: {exc}")
+        if info is None:
+            info = ydl.extract_info(url, download=True)
+            cache.store(url, info)
         # yt-dlp writes a WAV via FFmpegExtractAudio; prefer explicit path.
         if info.get("requested_downloads"):
             output_path = Path(info["requested_downloads"][0]["filepath"])
         else:
-            output_path = DOWNLOADS_DIR / f"{info.get('title', 'output')}.wav"
+            output_path = output_dir / f"{info.get('title', 'output')}.{codec or info.get('ext', 'wav')}"
+    stages.finish()
+    # A single-stream HTTP fetch says nothing about the segment count, and a
+    # throttled one measures the speaker streams rather than the link.
+    if (stages.fragmented or aria2c) and not stages.throttled and scheduler.current_limit() is None:
+        tuner.record(url, segments, stages.download_bytes, stages.download_seconds)
     return output_path.resolve()
 
 
+class _StageTimer:
+    """
+    Turns yt-dlp progress/postprocessor hook callbacks into stage durations.
+    """
+
+    def __init__(self, current_limit: Optional[Callable[[], Optional[float]]] = None) -> None:
+        self.started = time.perf_counter()
+        self._current_limit = current_limit
+        self._download_started: Optional[float] = None
+        # downloaded_bytes at the first callback; a resumed file starts above zero.
+        self._download_baseline = 0
+        self._transcode_started: Optional[float] = None
+        # Totals for the download stage, fed back to the segment tuner.
+        self.download_bytes = 0
+        self.download_seconds = 0.0
+        self.fragmented = False
+        # Whether a bandwidth limit was seen while downloading.
+        self.throttled = False
+
+    def on_progress(self, status: dict) -> None:
+        now = time.perf_counter()
+        if status.get("fragment_count"):
+            self.fragmented = True
+        if self._current_limit is not None and not self.throttled and self._current_limit() is not None:
+            self.throttled = True
+        downloaded = int(status.get("downloaded_bytes") or 0)
+        if status.get("status") == "downloading" and self._download_started is None:
+            self._download_started = now
+            self._download_baseline = downloaded
+        elif status.get("status") == "finished" and self._download_started is not None:
+            elapsed = now - self._download_started
+            _STAGE_SECONDS.labels("download").observe(elapsed)
+            self._download_started = None
+            self.download_seconds += elapsed
+            total = downloaded or int(status.get("total_bytes") or 0)
+            self.download_bytes += max(0, total - self._download_baseline)
+
+    def on_postprocess(self, status: dict) -> None:
+        if status.get("postprocessor") != "ExtractAudio":
+            return
+        now = time.perf_counter()
+        if status.get("status") == "started":
+            self._transcode_started = now
+        elif status.get("status") == "finished" and self._transcode_started is not None:
+            _STAGE_SECONDS.labels("transcode").observe(now - self._transcode_started)
+            self._transcode_started = None
+
+    def finish(self) -> None:
+        _STAGE_SECONDS.labels("total").observe(time.perf_counter() - self.started)
+
+
+@dataclass
+class DownloadProgress:
+    """
+    Snapshot of one job, pushed to progress subscribers.
+    """
+
+    job_id: int
+    url: str
+    status: str
+    priority: int = PRIORITY_NORMAL
+    title: Optional[str] = None
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None
+    eta: Optional[float] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(1.0, self.downloaded_bytes / self.total_bytes)
+
+
+ProgressListener = Callable[[DownloadProgress], None]
+
+
+@dataclass
+class DownloadJob:
+    url: str
+    on_complete: Optional[CompletionCallback] = None
+    id: int = 0
+    attempts: int = 0
+    priority: int = PRIORITY_NORMAL
+    # Sequence number of the job's current heap entry; older entries are stale.
+    queue_seq: int = -1
+    cancel_event: Event = field(default_factory=Event)
+    progress: Optional[DownloadProgress] = None
+    tmp_path: Optional[Path] = None
+    last_notified: float = 0.0
+
+
 class AudioDownloadManager:
     """
-    Singleton manager that queues URLs and processes them one at a time.
+    Singleton manager that queues URLs by priority and processes them
+    `workers` at a time (one by default). Jobs are journaled in SQLite:
+    failures are retried with backoff (resuming partial files) and
+    unfinished jobs are picked up again after a restart. Jobs can be
+    cancelled, and subscribers get live progress.
     """
 
     _instance: Optional["AudioDownloadManager"] = None
     _instance_lock = Lock()
 
-    def __init__(self) -> None:
-        self._queue: Deque[Tuple[str, Optional[Callable[[str, Optional[Path], Optional[Exception]], None]]]] = deque()
+    def __init__(
+        self,
+        workers: int = DOWNLOAD_WORKERS,
+        codec: Optional[str] = DEFAULT_CODEC,
+        output_dir: Optional[Path] = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.codec = codec
+        self.output_dir = output_dir
+        self._queue: List[Tuple[int, int, DownloadJob]] = []
+        self._seq = itertools.count()
+        self._local_ids = itertools.count(-1, -1)
         self._queue_lock = Lock()
-        self._downloading = False
-        self._worker: Optional[Thread] = None
+        self._active_workers = 0
+        self._jobs: Dict[int, DownloadJob] = {}
+        # IDs of the jobs being downloaded right now.
+        self._running: Set[int] = set()
+        self._retry_timers: Dict[int, Timer] = {}
+        self._listeners: List[ProgressListener] = []
         ensure_downloads_dir()
+        _QUEUE_DEPTH.set_function(lambda: self.queue_depth)
 
     @classmethod
     def instance(cls) -> "AudioDownloadManager":
@@ -67,46 +319,347 @@ class AudioDownloadManager:
                 cls._instance = cls()
         return cls._instance
 
+    @property
+    def queue_depth(self) -> int:
+        """
+        Jobs waiting, waiting to retry or in progress.
+        """
+        with self._queue_lock:
+            return len(self._jobs)
+
+    def jobs(self) -> List[DownloadProgress]:
+        """
+        Progress of unfinished jobs: running ones first, then in queue order.
+        """
+        with self._queue_lock:
+            jobs = sorted(
+                self._jobs.values(),
+                key=lambda j: (j.id not in self._running, j.id in self._retry_timers, j.priority, abs(j.id)),
+            )
+            return [replace(j.progress) for j in jobs if j.progress]
+
+    def subscribe(self, listener: ProgressListener) -> Callable[[], None]:
+        with self._queue_lock:
+            self._listeners.append(listener)
+
+        def _unsubscribe() -> None:
+            with self._queue_lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return _unsubscribe
+
     def enqueue(
         self,
         url: str,
-        on_complete: Optional[Callable[[str, Optional[Path], Optional[Exception]], None]] = None,
-    ) -> None:
+        on_complete: Optional[CompletionCallback] = None,
+        priority: int = PRIORITY_NORMAL,
+    ) -> int:
         """
         Add a URL to the queue and kick off a download worker if idle.
+        Returns the job id, for cancel() and reprioritize().
         """
+        job = DownloadJob(url=url, on_complete=on_complete, priority=priority)
+        job.id = self._journal_create(url, priority) or next(self._local_ids)
+        with self._queue_lock:
+            busy = self._active_workers >= self.workers
+        self._push(job)
+        if busy:
+            # Resolve the title while it waits; the download then reuses the extraction.
+            MetadataCache.instance().preflight_async(url, on_result=lambda result: self._on_preflight(job, result))
+        return job.id
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a queued, retrying or running job. A running download stops at
+        its next progress update. Returns False for unknown or finished jobs.
+        """
+        with self._queue_lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancel_event.set()
+            timer = self._retry_timers.pop(job_id, None)
+            running = job_id in self._running
+            if not running:
+                # Queued entries are skipped lazily when popped.
+                self._jobs.pop(job_id, None)
+        if timer:
+            timer.cancel()
+        if not running:
+            self._finish_cancelled(job)
+        return True
+
+    def reprioritize(self, job_id: int, priority: int) -> bool:
         with self._queue_lock:
-            self._queue.append((url, on_complete))
-            should_start = not self._downloading
+            job = self._jobs.get(job_id)
+            if job is None or job_id in self._running:
+                return False
+            job.priority = priority
+            if job_id not in self._retry_timers:
+                # Re-push; the old heap entry no longer matches job.queue_seq and is skipped.
+                self._push_locked(job)
+        self._journal_update(job, priority=priority)
+        self._update_progress(job, force=True)
+        return True
+
+    def resume_journal(self, on_complete: Optional[CompletionCallback] = None) -> int:
+        """
+        Re-queue jobs left unfinished by a previous run. Returns how many.
+        """
+        try:
+            with SqliteConnection() as db:
+                rows = db.get_unfinished_download_jobs()
+        except Exception as exc:
+            print(f"Could not read the download journal: {exc}")
+            return 0
+        now = time.time()
+        for row in rows:
+            job = DownloadJob(
+                url=row["url"],
+                on_complete=on_complete,
+                id=row["id"],
+                attempts=row["attempts"],
+                priority=row["priority"] if row["priority"] is not None else PRIORITY_NORMAL,
+            )
+            wait = (row["next_attempt_at"] or 0) - now
+            if row["status"] == "retrying" and wait > 0:
+                with self._queue_lock:
+                    self._jobs[job.id] = job
+                self._set_status(job, "retrying")
+                self._schedule_retry(job, wait)
+            else:
+                self._journal_update(job, status="queued")
+                self._push(job)
+        if rows:
+            print(f"Resumed {len(rows)} unfinished download(s).")
+        return len(rows)
+
+    def _push(self, job: DownloadJob) -> None:
+        with self._queue_lock:
+            self._jobs[job.id] = job
+            self._push_locked(job)
+            should_start = self._active_workers < self.workers
             if should_start:
-                self._downloading = True
+                self._active_workers += 1
+        self._set_status(job, "queued")
 
         if should_start:
             self._start_worker()
 
+    def _push_locked(self, job: DownloadJob) -> None:
+        job.queue_seq = next(self._seq)
+        heapq.heappush(self._queue, (job.priority, job.queue_seq, job))
+
+    def _pop(self) -> Optional[DownloadJob]:
+        """
+        Next live job by priority (lock held). Skips cancelled and stale
+        entries, and jobs that are retrying or already running.
+        """
+        while self._queue:
+            _priority, seq, job = heapq.heappop(self._queue)
+            if job.cancel_event.is_set() or seq != job.queue_seq or self._jobs.get(job.id) is not job:
+                continue
+            if job.id in self._retry_timers or job.id in self._running:
+                continue
+            return job
+        return None
+
+    def _schedule_retry(self, job: DownloadJob, delay: float) -> None:
+        timer = Timer(delay, self._retry_due, args=(job,))
+        timer.daemon = True
+        with self._queue_lock:
+            self._retry_timers[job.id] = timer
+        timer.start()
+
+    def _retry_due(self, job: DownloadJob) -> None:
+        with self._queue_lock:
+            if self._retry_timers.pop(job.id, None) is None:
+                return
+        self._journal_update(job, status="queued")
+        self._push(job)
+
     def _start_worker(self) -> None:
-        self._worker = Thread(target=self._worker_loop, daemon=True)
-        self._worker.start()
+        Thread(target=self._worker_loop, daemon=True).start()
 
     def _worker_loop(self) -> None:
         while True:
             with self._queue_lock:
-                if not self._queue:
-                    self._downloading = False
+                job = self._pop()
+                if job is None:
+                    self._active_workers -= 1
                     break
-                url, callback = self._queue.popleft()
+                self._running.add(job.id)
 
+            job.attempts += 1
+            self._journal_update(job, status="running", attempts=job.attempts)
+            self._set_status(job, "downloading")
             error: Optional[Exception] = None
             result_path: Optional[Path] = None
             try:
-                result_path = download_audio(url)
+                result_path = download_audio(
+                    job.url,
+                    progress_hook=lambda d, j=job: self._on_ytdlp_status(j, d),
+                    codec=self.codec,
+                    output_dir=self.output_dir,
+                )
             except Exception as exc:
                 error = exc
 
-            # Invoke callback outside the lock to avoid deadlocks.
-            if callback:
+            with self._queue_lock:
+                self._running.discard(job.id)
+                cancelled = job.cancel_event.is_set()
+                retry = (
+                    not cancelled and error is not None and is_retriable(error) and job.attempts < MAX_ATTEMPTS
+                )
+                if not retry:
+                    self._jobs.pop(job.id, None)
+
+            if cancelled:
+                self._finish_cancelled(job)
+                continue
+
+            if retry:
+                delay = retry_delay(job.attempts)
+                print(f"Download failed (attempt {job.attempts}/{MAX_ATTEMPTS}), retrying in {delay:.0f}s: {error}")
+                _DOWNLOADS.labels("retry").inc()
+                self._journal_update(
+                    job, status="retrying", last_error=str(error), next_attempt_at=time.time() + delay
+                )
+                self._set_status(job, "retrying", error=str(error))
+                self._schedule_retry(job, delay)
+                continue
+
+            if result_path:
+                # A re-download of audio already in the library keeps the existing file.
+                try:
+                    result_path = ContentHasher.instance().dedupe_new(result_path)
+                except Exception as exc:
+                    print(f"Could not check {result_path.name} for duplicates: {exc}")
+
+            _DOWNLOADS.labels("error" if error else "ok").inc()
+            if error is not None:
+                self._journal_update(job, status="failed", last_error=str(error))
+                self._set_status(job, "failed", error=str(error))
+            else:
+                self._journal_update(job, status="done", result_path=str(result_path), last_error=None)
+                self._set_status(job, "done")
+
+            if result_path:
+                # Remember where the file came from so quota eviction can re-fetch it.
+                try:
+                    with SqliteConnection() as db:
+                        db.record_song_download(result_path, job.url, result_path.stat().st_size)
+                except Exception as exc:
+                    print(f"Could not record download of {result_path.name}: {exc}")
+                LibraryQuota.instance().enforce_async()
+
+                # Analysis runs in its own process pool; don't hold up the queue.
+                try:
+                    AudioAnalysisManager.instance().submit(result_path)
+                except Exception as exc:
+                    print(f"Could not schedule analysis for {result_path.name}: {exc}")
+
+            self._complete(job, result_path, error)
+
+    def _finish_cancelled(self, job: DownloadJob) -> None:
+        _DOWNLOADS.labels("cancelled").inc()
+        if job.tmp_path:
+            # A cancelled job will not be resumed; drop its partial file.
+            for leftover in (job.tmp_path, job.tmp_path.with_name(job.tmp_path.name + ".part")):
                 try:
-                    callback(url, result_path, error)
-                except Exception:
-                    # Swallow callback errors to keep worker alive.
+                    leftover.unlink()
+                except OSError:
                     pass
+        self._journal_update(job, status="cancelled")
+        self._set_status(job, "cancelled")
+        self._complete(job, None, DownloadCancelled())
+
+    @staticmethod
+    def _complete(job: DownloadJob, result_path: Optional[Path], error: Optional[Exception]) -> None:
+        # Invoke callback outside the lock to avoid deadlocks.
+        if job.on_complete:
+            try:
+                job.on_complete(job.url, result_path, error)
+            except Exception:
+                # Swallow callback errors to keep worker alive.
+                pass
+
+    # --- progress ---
+    def _on_ytdlp_status(self, job: DownloadJob, status: dict) -> None:
+        """
+        yt-dlp progress/postprocessor hook for the running job.
+        """
+        if job.cancel_event.is_set():
+            raise DownloadCancelled()
+        progress = job.progress
+        if progress is None:
+            return
+        if status.get("postprocessor"):
+            if progress.status != "processing":
+                progress.status = "processing"
+                self._update_progress(job, force=True)
+            return
+        if status.get("tmpfilename"):
+            job.tmp_path = Path(status["tmpfilename"])
+        info = status.get("info_dict") or {}
+        progress.title = info.get("title") or progress.title
+        progress.downloaded_bytes = int(status.get("downloaded_bytes") or 0)
+        total = status.get("total_bytes") or status.get("total_bytes_estimate")
+        progress.total_bytes = int(total) if total else None
+        progress.speed = status.get("speed")
+        progress.eta = status.get("eta")
+        self._update_progress(job, force=status.get("status") != "downloading")
+
+    def _on_preflight(self, job: DownloadJob, result: PreflightResult) -> None:
+        if not result.ok or job.progress is None or job.progress.title:
+            return
+        job.progress.title = result.title
+        self._update_progress(job, force=True)
+
+    def _set_status(self, job: DownloadJob, status: str, error: Optional[str] = None) -> None:
+        if job.progress is None:
+            job.progress = DownloadProgress(job_id=job.id, url=job.url, status=status)
+        job.progress.status = status
+        job.progress.priority = job.priority
+        job.progress.attempts = job.attempts
+        job.progress.error = error
+        if status in ("queued", "retrying"):
+            job.progress.speed = job.progress.eta = None
+        self._update_progress(job, force=True)
+
+    def _update_progress(self, job: DownloadJob, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - job.last_notified < _PROGRESS_INTERVAL:
+            return
+        job.last_notified = now
+        if job.progress is None:
+            return
+        snapshot = replace(job.progress, priority=job.priority)
+        with self._queue_lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
+
+    # --- journal (best effort: a database problem must not stop downloads) ---
+    @staticmethod
+    def _journal_create(url: str, priority: int) -> Optional[int]:
+        try:
+            with SqliteConnection() as db:
+                return db.create_download_job(url, priority)
+        except Exception as exc:
+            print(f"Could not journal download of {url}: {exc}")
+            return None
+
+    @staticmethod
+    def _journal_update(job: DownloadJob, **fields) -> None:
+        if job.id <= 0:
+            return
+        try:
+            with SqliteConnection() as db:
+                db.update_download_job(job.id, **fields)
+        except Exception as exc:
+            print(f"Could not update download journal: {exc}")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from src.audio.track_catalog import TrackCatalog
+from src.misc.fs_watcher import CREATED, REMOVED, RENAMED, DirectoryWatcher, WatchEvent
+from src.misc.metrics import REGISTRY
+from src.misc.pathing import DOWNLOADS_DIR, ensure_downloads_dir
+
+LibraryListener = Callable[[WatchEvent], None]
+
+_EVENTS = REGISTRY.counter("sonos_thing_events_total", "Internal events by kind.", ["kind"])
+
+
+def is_library_file(path: Path) -> bool:
+    return path.suffix.lower() == ".wav"
+
+
+def scan_wav_files(downloads_dir: Path) -> List[Path]:
+    """
+    Return WAV files in the downloads directory, sorted by stem.
+    """
+    if not downloads_dir.exists():
+        return []
+    return sorted(
+        (p for p in downloads_dir.iterdir() if p.is_file() and is_library_file(p)),
+        key=lambda p: p.stem,
+    )
+
+
+class LibraryIndex:
+    """
+    Singleton in-memory index of the WAV files in the downloads directory.
+    A DirectoryWatcher keeps it current; listeners receive the same
+    created/removed/renamed events, filtered to library files. Paths and
+    stems are the TrackCatalog's shared objects.
+    """
+
+    _instance: Optional["LibraryIndex"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, downloads_dir: Path = DOWNLOADS_DIR) -> None:
+        self.downloads_dir = Path(downloads_dir)
+        self._tracks: Dict[str, Path] = {}
+        self._stems: List[str] = []
+        self._lock = Lock()
+        self._listeners: List[LibraryListener] = []
+        self._watcher: Optional[DirectoryWatcher] = None
+
+    @classmethod
+    def instance(cls) -> "LibraryIndex":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def start(self) -> None:
+        if self._watcher:
+            return
+        ensure_downloads_dir()
+        # Start watching before the initial scan so nothing slips between them.
+        self._watcher = DirectoryWatcher(self.downloads_dir, self._on_watch_event)
+        self._watcher.start()
+        self.rescan()
+
+    def stop(self) -> None:
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+
+    def subscribe(self, listener: LibraryListener) -> Callable[[], None]:
+        with self._lock:
+            self._listeners.append(listener)
+
+        def _unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return _unsubscribe
+
+    def stems(self) -> List[str]:
+        with self._lock:
+            return list(self._stems)
+
+    def paths(self) -> List[Path]:
+        with self._lock:
+            return [self._tracks[stem] for stem in self._stems]
+
+    def path_for(self, stem: str) -> Optional[Path]:
+        with self._lock:
+            return self._tracks.get(stem)
+
+    def rescan(self) -> List[str]:
+        """
+        Full directory scan; differences from the current index are published
+        as events so listeners stay incremental.
+        """
+        found = {p.stem: p for p in scan_wav_files(self.downloads_dir)}
+        with self._lock:
+            known = dict(self._tracks)
+        for stem in known.keys() - found.keys():
+            self._apply(WatchEvent(REMOVED, known[stem]))
+        for stem in found.keys() - known.keys():
+            self._apply(WatchEvent(CREATED, found[stem]))
+        return self.stems()
+
+    def notify_created(self, path: Path) -> None:
+        """
+        Register a file we know was just written (e.g. a finished download)
+        without waiting for the watcher. Duplicate notifications are ignored.
+        """
+        path = Path(path)
+        if path.parent.resolve() == self.downloads_dir.resolve() and is_library_file(path) and path.exists():
+            self._apply(WatchEvent(CREATED, self.downloads_dir / path.name))
+
+    def _on_watch_event(self, event: WatchEvent) -> None:
+        if event.kind == RENAMED:
+            old_is_track = event.old_path is not None and is_library_file(event.old_path)
+            new_is_track = is_library_file(event.path)
+            if old_is_track and new_is_track:
+                self._apply(event)
+            elif old_is_track:
+                self._apply(WatchEvent(REMOVED, event.old_path))
+            elif new_is_track:
+                self._apply(WatchEvent(CREATED, event.path))
+        elif is_library_file(event.path):
+            self._apply(event)
+
+    def _apply(self, event: WatchEvent) -> None:
+        with self._lock:
+            changed = False
+            if event.kind == CREATED:
+                changed = self._insert(event.path)
+            elif event.kind == REMOVED:
+                changed = self._remove(event.path.stem)
+                TrackCatalog.instance().forget(event.path)
+            elif event.kind == RENAMED and event.old_path is not None:
+                TrackCatalog.instance().forget(event.old_path)
+                removed = self._remove(event.old_path.stem)
+                added = self._insert(event.path)
+                changed = removed or added
+                if not removed:
+                    event = WatchEvent(CREATED, event.path)
+            listeners = list(self._listeners) if changed else []
+
+        if changed:
+            _EVENTS.labels(f"library_{event.kind}").inc()
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                pass
+
+    def _insert(self, path: Path) -> bool:
+        if path.stem in self._tracks:
+            return False
+        record = TrackCatalog.instance().intern(path)
+        self._tracks[record.stem] = record.path
+        insort(self._stems, record.stem)
+        return True
+
+    def _remove(self, stem: str) -> bool:
+        if self._tracks.pop(stem, None) is None:
+            return False
+        idx = bisect_left(self._stems, stem)
+        if idx < len(self._stems) and self._stems[idx] == stem:
+            self._stems.pop(idx)
+        return True
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import os
+import re
+import weakref
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from src.audio.library import is_library_file, scan_wav_files
+from src.audio.stream_format import variants_of
+from src.audio.track_catalog import TrackCatalog
+from src.misc.metrics import REGISTRY
+from src.misc.pathing import DOWNLOADS_DIR
+from src.sqlite_connection import SqliteConnection
+
+QUOTA_SETTING = "library_quota_bytes"
+
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+_EVICTIONS = REGISTRY.counter("sonos_thing_library_evictions_total", "Tracks evicted to stay under the quota.")
+_EVICTED_BYTES = REGISTRY.counter("sonos_thing_library_evicted_bytes_total", "Bytes freed by quota eviction.")
+_LIBRARY_BYTES = REGISTRY.gauge("sonos_thing_library_bytes", "Size of the downloads directory after the last quota check.")
+
+# Called with (track path, error or None) once a re-fetch has finished.
+RestoreCallback = Callable[[Path, Optional[Exception]], None]
+
+
+def parse_size(value: Optional[str]) -> int:
+    """
+    Parse "500000", "512M", "20G" or "1.5TB" into bytes. Empty or 0 means unlimited.
+    """
+    if not value:
+        return 0
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)(?:I?B)?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+@dataclass
+class _Candidate:
+    path: Path
+    size: int
+    last_used: float
+    source_url: Optional[str]
+
+
+@dataclass
+class _Restore:
+    job_id: Optional[int] = None
+    waiters: List[RestoreCallback] = field(default_factory=list)
+
+
+class LibraryQuota:
+    """
+    Singleton that keeps the downloads directory under a byte quota (setting
+    `library_quota_bytes`) by deleting the least recently played/added WAVs.
+    A track's transcoded variants count towards its size and go with it.
+    Tracks in a saved playlist or the live queue are never evicted, and only
+    tracks with a known source URL are, so they can be fetched again on demand.
+    """
+
+    _instance: Optional["LibraryQuota"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, downloads_dir: Path = DOWNLOADS_DIR) -> None:
+        self.downloads_dir = Path(downloads_dir)
+        self._lock = Lock()
+        self._restore_lock = Lock()
+        # Track path -> re-fetch in progress, shared by everyone waiting on it.
+        self._restoring: Dict[str, _Restore] = {}
+        self._sources_lock = Lock()
+        self._protected_sources: List[Callable[[], Optional[Callable[[], Iterable[Path]]]]] = []
+
+    @classmethod
+    def instance(cls) -> "LibraryQuota":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def add_protected_source(self, source: Callable[[], Iterable[Path]]) -> None:
+        """
+        Register a callable returning paths that must not be evicted (e.g. the
+        live queue). Bound methods are held weakly.
+        """
+        ref = weakref.WeakMethod(source) if hasattr(source, "__self__") else (lambda: source)
+        with self._sources_lock:
+            self._protected_sources.append(ref)
+
+    def quota_bytes(self) -> int:
+        try:
+            with SqliteConnection() as db:
+                return parse_size(db.get_setting(QUOTA_SETTING))
+        except ValueError as exc:
+            print(f"Ignoring quota setting: {exc}")
+            return 0
+
+    def enforce_async(self) -> None:
+        Thread(target=self.enforce, daemon=True).start()
+
+    def enforce(self) -> List[Path]:
+        """
+        Evict until the library fits the quota. Returns the evicted paths.
+        """
+        with self._lock:
+            quota = self.quota_bytes()
+            files = scan_wav_files(self.downloads_dir)
+            catalog = TrackCatalog.instance()
+            sizes: Dict[Path, int] = {}
+            for path in files:
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                for variant in variants_of(path, self.downloads_dir):
+                    try:
+                        size += variant.stat().st_size
+                    except OSError:
+                        pass
+                sizes[catalog.intern(path).path] = size
+            total = sum(sizes.values())
+            _LIBRARY_BYTES.set(total)
+            if not quota or total <= quota:
+                return []
+
+            evicted: List[Path] = []
+            for candidate in self._candidates(sizes):
+                if total <= quota:
+                    break
+                try:
+                    candidate.path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as exc:
+                    print(f"Could not evict {candidate.path.name}: {exc}")
+                    continue
+                for variant in variants_of(candidate.path, self.downloads_dir):
+                    try:
+                        variant.unlink()
+                    except OSError:
+                        pass
+                with SqliteConnection() as db:
+                    db.mark_song_evicted(candidate.path)
+                total -= candidate.size
+                evicted.append(candidate.path)
+                _EVICTIONS.inc()
+                _EVICTED_BYTES.inc(candidate.size)
+            _LIBRARY_BYTES.set(total)
+            if total > quota:
+                print(f"Library is {total} bytes, over the {quota} byte quota; nothing else can be evicted.")
+            return evicted
+
+    def _candidates(self, sizes: Dict[Path, int]) -> List[_Candidate]:
+        protected = {str(p) for p in self._protected_paths()}
+        with SqliteConnection() as db:
+            protected |= db.get_playlist_song_paths()
+            records = {r["path"]: r for r in db.get_song_records()}
+
+        candidates: List[_Candidate] = []
+        for path, size in sizes.items():
+            record = records.get(str(path))
+            if str(path) in protected or not record or not record.get("source_url"):
+                continue
+            last_used = max(record.get("last_played") or 0.0, record.get("added_at") or 0.0)
+            if not last_used:
+                try:
+                    last_used = path.stat().st_mtime
+                except OSError:
+                    continue
+            candidates.append(_Candidate(path, size, last_used, record["source_url"]))
+        candidates.sort(key=lambda c: c.last_used)
+        return candidates
+
+    def _protected_paths(self) -> Set[Path]:
+        with self._sources_lock:
+            self._protected_sources = [ref for ref in self._protected_sources if ref() is not None]
+            sources = [ref() for ref in self._protected_sources]
+        catalog = TrackCatalog.instance()
+        paths: Set[Path] = set()
+        for source in sources:
+            if source is None:
+                continue
+            try:
+                paths.update(catalog.intern(p).path for p in source())
+            except Exception:
+                pass
+        return paths
+
+    # --- re-fetch ---
+    def is_restorable(self, path: Path) -> bool:
+        with SqliteConnection() as db:
+            record = db.get_song_record(path)
+        return bool(record and record.get("evicted_at") and record.get("source_url"))
+
+    def restore_async(self, path: Path, on_done: Optional[RestoreCallback] = None) -> Optional[int]:
+        """
+        Queue a high-priority download of an evicted track from its source
+        URL, moved back to its old path. Goes through AudioDownloadManager,
+        so it is journaled, retried and cancellable like any download.
+        `on_done` runs on the download worker. Returns the download job ID
+        (shared by concurrent requests for the same track), or None if the
+        file is already there, in which case `on_done` is not called.
+        """
+        from src.audio.downloader import PRIORITY_HIGH, AudioDownloadManager
+
+        target = TrackCatalog.instance().intern(path).path
+        with self._restore_lock:
+            if target.exists():
+                return None
+            pending = self._restoring.get(str(target))
+            if pending is None:
+                with SqliteConnection() as db:
+                    record = db.get_song_record(target)
+                if not record or not record.get("source_url"):
+                    raise FileNotFoundError(f"Track not found and no source URL recorded: {target}")
+                print(f"Re-fetching evicted track {target.name} from {record['source_url']}")
+                pending = self._restoring[str(target)] = _Restore()
+                pending.job_id = AudioDownloadManager.instance().enqueue(
+                    record["source_url"],
+                    on_complete=lambda _url, fetched, error: self._restored(target, fetched, error),
+                    priority=PRIORITY_HIGH,
+                )
+            if on_done is not None:
+                pending.waiters.append(on_done)
+            return pending.job_id
+
+    def _restored(self, target: Path, fetched: Optional[Path], error: Optional[Exception]) -> None:
+        if error is None and fetched is None:
+            error = FileNotFoundError(f"Re-fetch of {target.name} produced no file")
+        if error is None:
+            try:
+                if fetched != target and is_library_file(fetched):
+                    os.replace(fetched, target)
+                    with SqliteConnection() as db:
+                        db.delete_song(fetched)
+                with SqliteConnection() as db:
+                    db.mark_song_restored(target, target.stat().st_size)
+            except Exception as exc:
+                error = exc
+        with self._restore_lock:
+            pending = self._restoring.pop(str(target), None)
+        if error is not None:
+            print(f"Could not re-fetch {target.name}: {error}")
+        for waiter in pending.waiters if pending else []:
+            try:
+                waiter(target, error)
+            except Exception as exc:
+                print(f"Re-fetch callback for {target.name} failed: {exc}")
+
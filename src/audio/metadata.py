@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.misc.metrics import REGISTRY
+from src.misc.tracing import traced
+from src.sqlite_connection import SqliteConnection
+
+if TYPE_CHECKING:
+    from yt_dlp import YoutubeDL
+
+# Titles, durations and IDs rarely change; a week is plenty.
+METADATA_TTL_SECONDS = 7 * 24 * 3600
+# Format URLs in the info dict are signed and expire (hours on YouTube), so a
+# cached dict is only handed to the downloader while it is this fresh.
+FORMATS_TTL_SECONDS = 20 * 60
+PREFLIGHT_WORKERS = 4
+
+# Large fields nothing here reads; dropping them keeps rows small.
+_DROPPED_FIELDS = ("automatic_captions", "subtitles", "thumbnails", "heatmap", "requested_downloads", "__files_to_move")
+
+_LOOKUPS = REGISTRY.counter("sonos_thing_metadata_lookups_total", "Metadata lookups by result.", ["result"])
+
+_IMPORT_LOCK = Lock()
+
+
+def load_yt_dlp() -> type:
+    """
+    yt_dlp.YoutubeDL, imported on first use. yt-dlp's modules import each
+    other in cycles, which fail when two threads run the first import at
+    once (preflight and download workers do), so that import is serialized.
+    """
+    with _IMPORT_LOCK:
+        from yt_dlp import YoutubeDL
+    return YoutubeDL
+
+
+@lru_cache(maxsize=1)
+def _extractor_classes() -> Tuple[type, ...]:
+    load_yt_dlp()
+    from yt_dlp.extractor import gen_extractor_classes
+
+    return tuple(ie for ie in gen_extractor_classes() if ie.ie_key() != "Generic")
+
+
+@lru_cache(maxsize=1024)
+def extractor_id(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (extractor key, video id) for a URL, from the extractors' URL patterns
+    alone (no network). Lets youtu.be and youtube.com links share a cache row.
+    """
+    for ie in _extractor_classes():
+        if ie.suitable(url):
+            return ie.ie_key(), ie.get_temp_id(url)
+    return None, None
+
+
+@dataclass
+class PreflightResult:
+    url: str
+    ok: bool
+    title: Optional[str] = None
+    duration: Optional[float] = None
+    extractor: Optional[str] = None
+    video_id: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    # Library file already downloaded from the same video, if any.
+    existing_path: Optional[str] = None
+
+
+class MetadataCache:
+    """
+    Singleton cache of yt-dlp info dicts in SQLite, keyed by URL and by
+    (extractor, video id). `preflight` resolves many URLs concurrently with
+    download=False, sharing in-flight lookups, so previews and duplicate
+    checks don't repeat extractor work.
+    """
+
+    _instance: Optional["MetadataCache"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, ttl: float = METADATA_TTL_SECONDS, workers: int = PREFLIGHT_WORKERS) -> None:
+        self.ttl = ttl
+        self.workers = workers
+        self._lock = Lock()
+        self._pending: Dict[Tuple[Optional[str], str], Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+
+    @classmethod
+    def instance(cls) -> "MetadataCache":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    # --- cache ---
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cached info dict for `url` (or another URL of the same video) no
+        older than `max_age` seconds (default: the cache TTL).
+        """
+        entry = self._lookup(url, self.ttl if max_age is None else max_age)
+        return entry[0] if entry else None
+
+    def store(self, url: str, info: Dict[str, Any]) -> None:
+        YoutubeDL = load_yt_dlp()
+        extractor, video_id = extractor_id(url)
+        extractor = info.get("extractor_key") or extractor
+        video_id = info.get("id") or video_id
+        payload = {k: v for k, v in YoutubeDL.sanitize_info(info).items() if k not in _DROPPED_FIELDS}
+        try:
+            with SqliteConnection() as db:
+                db.save_metadata(url, extractor, video_id, json.dumps(payload), time.time())
+        except Exception as exc:
+            print(f"Could not cache metadata for {url}: {exc}")
+
+    def prune(self) -> int:
+        with SqliteConnection() as db:
+            return db.prune_metadata(time.time() - self.ttl)
+
+    def _lookup(self, url: str, max_age: float) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        extractor, video_id = extractor_id(url)
+        oldest = time.time() - max_age
+        try:
+            with SqliteConnection() as db:
+                row = db.get_metadata(url)
+                if (row is None or row["fetched_at"] < oldest) and extractor and video_id:
+                    row = db.get_metadata_by_id(extractor, video_id)
+                if row is None or row["fetched_at"] < oldest:
+                    _LOOKUPS.labels("miss").inc()
+                    return None
+                if row["url"] != url:
+                    # Remember this URL too, so songs downloaded from it match by video.
+                    db.save_metadata(url, row["extractor"], row["video_id"], row["info"], row["fetched_at"])
+                existing = db.find_downloaded_song(row["extractor"], row["video_id"], url)
+        except Exception as exc:
+            print(f"Could not read metadata cache: {exc}")
+            return None
+        _LOOKUPS.labels("hit").inc()
+        return json.loads(row["info"]), existing
+
+    # --- preflight ---
+    def preflight(self, urls: Iterable[str]) -> List[PreflightResult]:
+        """
+        Resolve metadata for `urls` without downloading, in input order.
+        Cached entries are answered from SQLite; the rest are extracted
+        concurrently.
+        """
+        futures = [self.preflight_async(url) for url in urls]
+        return [future.result() for future in futures]
+
+    def preflight_async(
+        self, url: str, on_result: Optional[Callable[[PreflightResult], None]] = None
+    ) -> Future:
+        """
+        Start resolving one URL in the background. Concurrent calls for the
+        same video, under any of its URLs, share one extraction.
+        """
+        extractor, video_id = extractor_id(url)
+        key = (extractor, video_id) if video_id else (None, url)
+        with self._lock:
+            shared = self._pending.get(key)
+            if shared is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preflight")
+                    # Expired rows are only dropped here, once per run.
+                    self._executor.submit(self.prune)
+                shared = self._executor.submit(self._resolve, url)
+                self._pending[key] = shared
+                shared.add_done_callback(lambda _f: self._forget(key))
+        future: Future = Future()
+        shared.add_done_callback(lambda f: future.set_result(replace(f.result(), url=url)))
+        if on_result:
+            future.add_done_callback(lambda f: on_result(f.result()))
+        return future
+
+    def _forget(self, key: Tuple[Optional[str], str]) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    @traced("metadata.resolve")
+    def _resolve(self, url: str) -> PreflightResult:
+        entry = self._lookup(url, self.ttl)
+        if entry:
+            return self._result(url, entry[0], cached=True, existing=entry[1])
+        try:
+            info = self._ydl().extract_info(url, download=False)
+        except Exception as exc:
+            extractor, video_id = extractor_id(url)
+            return PreflightResult(url, ok=False, extractor=extractor, video_id=video_id, error=str(exc))
+        self.store(url, info)
+        extractor, video_id = info.get("extractor_key"), info.get("id")
+        try:
+            with SqliteConnection() as db:
+                existing = db.find_downloaded_song(extractor, video_id, url)
+        except Exception:
+            existing = None
+        return self._result(url, info, cached=False, existing=existing)
+
+    @staticmethod
+    def _result(url: str, info: Dict[str, Any], cached: bool, existing: Optional[str]) -> PreflightResult:
+        if existing and not Path(existing).exists():
+            existing = None
+        return PreflightResult(
+            url,
+            ok=True,
+            title=info.get("title"),
+            duration=info.get("duration"),
+            extractor=info.get("extractor_key"),
+            video_id=info.get("id"),
+            cached=cached,
+            existing_path=existing,
+        )
+
+    def _ydl(self) -> YoutubeDL:
+        # YoutubeDL is not thread-safe; keep one per worker thread.
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = load_yt_dlp()({"quiet": True, "noplaylist": True, "skip_download": True, "format": "bestaudio/best"})
+            self._local.ydl = ydl
+        return ydl
@@ -1,12 +1,56 @@
 from __future__ import annotations
 
+import json
+import time
 from pathlib import Path
-from threading import Lock
-import random
-from typing import List, Optional
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import quote
 
+from src.audio.library_quota import LibraryQuota
+from src.audio.playback_clock import RESYNC_SECONDS, PlaybackClock, PlaybackPosition
+from src.audio.prefetch import TrackPrefetcher
+from src.audio.session_journal import SessionJournal, load_session
+from src.audio.shuffle_order import ShuffleOrder
+from src.audio.stream_format import StreamFormatSelector
+from src.audio.track_catalog import TrackCatalog
+from src.audio.wav import read_wav_layout
+from src.misc.metrics import REGISTRY
+from src.misc.tracing import traced
 from src.sonos import SonosDeviceHandle
+from src.sqlite_connection import SqliteConnection
+
+if TYPE_CHECKING:
+    from src.audio.crossfade_renderer import CrossfadeSession, StreamRenderer
+
+_POLLS = REGISTRY.counter("sonos_thing_transport_polls_total", "Transport state polls for auto-advance.")
+_EVENTS = REGISTRY.counter("sonos_thing_events_total", "Internal events by kind.", ["kind"])
+_AUTO_ADVANCE = _EVENTS.labels("auto_advance")
+
+# How often the (interpolated) playback position is written to the session journal.
+POSITION_SAVE_SECONDS = 5.0
+# While the playback clock says a track is well short of its end, the
+# transport state is only checked this often...
+TRANSPORT_CHECK_SECONDS = 5.0
+# ...and on every poll once it is this close.
+NEAR_END_SECONDS = 3.0
+# Volume changes made elsewhere (e.g. the Sonos app) are picked up this often.
+VOLUME_CHECK_SECONDS = RESYNC_SECONDS
+
+
+def _hms_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        hours, minutes, seconds = (float(part) for part in str(value).split(":"))
+    except ValueError:
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _track_duration(track: Path) -> Optional[float]:
+    try:
+        return read_wav_layout(track).duration
+    except (OSError, ValueError):
+        return None
 
 
 class MusicPlayerManager:
@@ -20,13 +64,39 @@ class MusicPlayerManager:
     def __init__(self) -> None:
         self.device: Optional[SonosDeviceHandle] = None
         self.device_name: Optional[str] = None
-        self._playlist: List[Path] = []
+        self.catalog = TrackCatalog.instance()
+        # Track IDs from the catalog, in play order.
+        self._playlist: List[int] = []
         self._current_index: int = 0
         self._playlist_lock = Lock()
         self.stream_base_url: Optional[str] = None
+        # Device IP -> base URL on the interface that reaches it (multi-homed hosts).
+        self._stream_url_for: Optional[Callable[[Optional[str]], Optional[str]]] = None
         self._current_track: Optional[Path] = None
+        # Evicted track being downloaded again; it plays once that finishes.
+        self._refetching: Optional[Path] = None
         self._user_stopped: bool = False
         self.shuffle: bool = False
+        self._shuffle_order = ShuffleOrder()
+        self.prefetcher = TrackPrefetcher()
+        self.prefetcher.register_variant_builder(self._build_variant)
+        self.renderer: Optional[StreamRenderer] = None
+        self._stream_session: Optional[CrossfadeSession] = None
+        self.clock = PlaybackClock()
+        self._played: List[Path] = []
+        self._played_lock = Lock()
+        self._played_writer = False
+        self._position_saved = 0.0
+        # (state, monotonic time) of the last transport state query.
+        self._transport: Optional[Tuple[str, float]] = None
+        # (volume, monotonic time) as last read from or set on the speaker.
+        self._volume: Optional[Tuple[int, float]] = None
+        # Restored position, applied when that track is next played.
+        self._resume_at: Optional[Tuple[Path, float]] = None
+        self._journal = SessionJournal(
+            self._playlist_lock, self._session_state, lambda: self.catalog.paths(self._playlist)
+        )
+        LibraryQuota.instance().add_protected_source(self._protected_tracks)
 
     @classmethod
     def instance(cls) -> "MusicPlayerManager":
@@ -39,34 +109,100 @@ class MusicPlayerManager:
         self.device = handle
         self.device_name = handle.player_name
         self._user_stopped = False
+        self._volume = None
+        self.prefetcher.clear()
 
     def set_stream_base_url(self, base_url: str) -> None:
         self.stream_base_url = base_url.rstrip("/")
+        self.prefetcher.clear()
+
+    def set_stream_url_resolver(self, resolver: Optional[Callable[[Optional[str]], Optional[str]]]) -> None:
+        """
+        Pick the stream base URL per device: `resolver` maps a device IP to
+        the URL it should fetch from. stream_base_url stays the fallback.
+        """
+        self._stream_url_for = resolver
+        self.prefetcher.clear()
+
+    def _device_base_url(self) -> Optional[str]:
+        resolver, device = self._stream_url_for, self.device
+        if resolver and device:
+            try:
+                url = resolver(device.ip_address)
+            except Exception:
+                url = None
+            if url:
+                return url.rstrip("/")
+        return self.stream_base_url
+
+    def set_stream_renderer(self, renderer: Optional[StreamRenderer]) -> None:
+        """
+        Route playback through one continuous crossfaded stream per session
+        instead of a play_uri call per file. Pass None to go back to per-file URIs.
+        """
+        self._close_stream_session()
+        self.renderer = renderer
 
     def add_song(self, path: Path) -> None:
-        track = Path(path).resolve()
-        if not track.exists():
+        record = self.catalog.intern(path)
+        track = record.path
+        # Evicted tracks may be queued; they are fetched again before playing.
+        if not track.exists() and not LibraryQuota.instance().is_restorable(track):
             raise FileNotFoundError(f"Track not found: {track}")
         with self._playlist_lock:
-            self._playlist.append(track)
+            self._playlist.append(record.id)
+            if self.shuffle:
+                self._shuffle_order.add(len(self._playlist) - 1)
+            self._journal.queue_appended(len(self._playlist) - 1, track)
+        self._prefetch_next()
 
     def remove_song(self, path: Path) -> bool:
-        target = Path(path).resolve()
+        target = self.catalog.find(path)
+        if target is None:
+            return False
         with self._playlist_lock:
-            for idx, track in enumerate(self._playlist):
-                if track.resolve() == target:
+            for idx, track_id in enumerate(self._playlist):
+                if track_id == target.id:
                     self._playlist.pop(idx)
+                    if self.shuffle:
+                        self._shuffle_order.remove(idx)
+                    self._journal.queue_removed(idx)
                     if idx < self._current_index:
                         self._current_index = max(0, self._current_index - 1)
                     elif idx == self._current_index and self._current_index >= len(self._playlist):
                         self._current_index = max(0, len(self._playlist) - 1)
-                    return True
-        return False
+                    break
+            else:
+                return False
+        self._prefetch_next()
+        return True
+
+    def rename_song(self, old_path: Path, new_path: Path) -> int:
+        """
+        Point queue entries for a file that was renamed on disk at its new path.
+        Returns the number of entries updated.
+        """
+        old = self.catalog.find(old_path)
+        if old is None:
+            return 0
+        new = self.catalog.intern(new_path)
+        updated = 0
+        with self._playlist_lock:
+            for idx, track_id in enumerate(self._playlist):
+                if track_id == old.id:
+                    self._playlist[idx] = new.id
+                    self._journal.queue_replaced(idx, new.path)
+                    updated += 1
+            if self._current_track == old.path:
+                self._current_track = new.path
+            self.clock.rename(old.path, new.path)
+        return updated
 
     def get_playlist(self) -> List[Path]:
         with self._playlist_lock:
-            return list(self._playlist)
+            return self.catalog.paths(self._playlist)
 
+    @traced("player._play_track")
     def _play_track(self, track: Path) -> None:
         if not self.device:
             print("No Sonos device set for playback.")
@@ -76,81 +212,266 @@ class MusicPlayerManager:
             raise RuntimeError("No stream server configured for playback.")
 
         print("Playing track:", track)
+        self._refetching = None
+        if not track.exists() and self._refetch(track):
+            return
+        self._queue_played(track)
+
+        if self.renderer:
+            self._play_via_renderer(track)
+            return
+
+        uri = self.prefetcher.take_uri(track) or self._build_track_uri(track)
+        print(uri)
+        self.device.play_uri(uri)
+
+    def _refetch(self, track: Path) -> bool:
+        """
+        Queue a re-download of an evicted track; it starts playing when the
+        download completes, if it is still the track to play by then. False
+        if the file turned up in the meantime.
+        """
+        self._refetching = track
+        try:
+            job_id = LibraryQuota.instance().restore_async(track, self._on_refetched)
+        except Exception as exc:
+            self._refetching = None
+            raise RuntimeError(f"Track is missing and could not be re-fetched: {exc}") from exc
+        if job_id is None:
+            self._refetching = None
+            return False
+        # Silence the previous track so what plays matches the queue.
+        self._close_stream_session()
+        try:
+            self.device.stop()
+        except Exception as exc:
+            print(f"Could not stop playback while re-fetching: {exc}")
+        return True
+
+    def _on_refetched(self, track: Path, error: Optional[Exception]) -> None:
+        # Runs on the download worker.
+        if self._refetching != track:
+            # Moved on (or stopped) while it downloaded.
+            return
+        self._refetching = None
+        if error is not None:
+            # The next poll sees the speaker stopped and advances past it.
+            return
+        if self._current_track != track or self._user_stopped:
+            return
+        try:
+            self._play_track(track)
+        except Exception as exc:
+            print(f"Could not play re-fetched track {track.name}: {exc}")
+            return
+        self._track_changed()
+        self._prefetch_next()
 
-        uri = self._build_track_uri(track)
+    @property
+    def refetching(self) -> Optional[Path]:
+        """
+        The track waiting for its re-download before it plays, if any.
+        """
+        return self._refetching
+
+    def _queue_played(self, track: Path) -> None:
+        # Off the play path: the SQLite commit can take a disk flush. Plays
+        # queued while a write is under way go in the next transaction.
+        with self._played_lock:
+            self._played.append(track)
+            if self._played_writer:
+                return
+            self._played_writer = True
+        Thread(target=self._record_played, daemon=True).start()
+
+    def _record_played(self) -> None:
+        while True:
+            with self._played_lock:
+                tracks, self._played = self._played, []
+                if not tracks:
+                    self._played_writer = False
+                    return
+            try:
+                with SqliteConnection() as db:
+                    for track in tracks:
+                        db.mark_song_played(track)
+            except Exception as exc:
+                print(f"Could not record play of {tracks[-1].name}: {exc}")
+
+    def _protected_tracks(self) -> List[Path]:
+        """
+        The live queue and the current track, which quota eviction must keep.
+        """
+        tracks = self.get_playlist()
+        if self._current_track:
+            tracks.append(self._current_track)
+        return tracks
+
+    def _play_via_renderer(self, track: Path) -> None:
+        session = self._stream_session
+        if session and not session.closed and self.get_transport_state() == "PLAYING" and session.accepts(track):
+            session.switch_to(track)
+            return
+
+        # Nothing playing, or a track in another sample format: start a new
+        # stream, in the format of this track.
+        self._close_stream_session()
+        session = self.renderer.create_session(track, self.peek_next, self._advance_for_stream)
+        self._stream_session = session
+        uri = f"{self._device_base_url()}{session.path}"
         print(uri)
-        self.device.sonos.play_uri(uri)
+        self.device.play_uri(uri)
+
+    def _advance_for_stream(self, track: Path) -> None:
+        """
+        Called by the renderer once it is mixing in `track`, which it got
+        from peek_next(). A track it cannot mix is never reported: the stream
+        ends first and the next poll plays it on its own stream.
+        """
+        stepped = self._step(1)
+        self._current_track = stepped or track
+        self._track_changed()
+        self._prefetch_next()
+
+    def _close_stream_session(self) -> None:
+        session, self._stream_session = self._stream_session, None
+        if session and self.renderer:
+            self.renderer.close_session(session.id)
+
+    def peek_next(self) -> Optional[Path]:
+        """
+        The track next() will play, including the pre-drawn shuffle choice.
+        """
+        with self._playlist_lock:
+            if not self._playlist:
+                return None
+            return self.catalog.path(self._playlist[self._next_index_locked()])
+
+    def _next_index_locked(self) -> int:
+        if self.shuffle:
+            self._sync_shuffle_order_locked()
+            return self._shuffle_order.peek_next()
+        return (self._current_index + 1) % len(self._playlist)
+
+    def _sync_shuffle_order_locked(self) -> None:
+        if len(self._shuffle_order) != len(self._playlist):
+            self._shuffle_order.reset(len(self._playlist), current=self._current_index)
+
+    def _prefetch_next(self) -> None:
+        if not self._current_track:
+            return
+        upcoming = self.peek_next()
+        if upcoming:
+            self.prefetcher.warm(upcoming, self._build_track_uri)
 
     def _build_track_uri(self, track: Path) -> str:
+        device = self.device
+        if device:
+            # The variant suited to this speaker's link.
+            return f"{self._device_base_url()}{StreamFormatSelector.instance().uri_path(track, device)}"
         filename = quote(track.name)
         return f"{self.stream_base_url}/{filename}"
 
+    def _build_variant(self, track: Path) -> Optional[Path]:
+        """
+        Prefetch hook: transcode the upcoming track for the current device.
+        """
+        device = self.device
+        if not device:
+            return None
+        selector = StreamFormatSelector.instance()
+        return selector.ensure_variant(track, selector.quality_for(device, track))
+
     def play(self) -> Optional[Path]:
         with self._playlist_lock:
             if not self._playlist:
                 return None
             if self._current_index >= len(self._playlist):
                 self._current_index = 0
-            track = self._playlist[self._current_index]
+            track = self.catalog.path(self._playlist[self._current_index])
         print("TRACK: ", track)
+        resume_at, self._resume_at = self._resume_at, None
         self._play_track(track)
         self._current_track = track
         self._user_stopped = False
+        self._track_changed()
+        if resume_at and resume_at[0] == track and not self._refetching:
+            self._seek(resume_at[1])
+        self._prefetch_next()
         return track
 
     def play_track(self, path: Path) -> Path:
-        target = Path(path).resolve()
+        target = self.catalog.find(path)
         with self._playlist_lock:
-            for idx, track in enumerate(self._playlist):
-                if track.resolve() == target:
-                    self._current_index = idx
-                    break
-            else:
-                raise ValueError("Track not found in playlist.")
-            track = self._playlist[self._current_index]
+            try:
+                self._current_index = self._playlist.index(target.id if target else -1)
+            except ValueError:
+                raise ValueError("Track not found in playlist.") from None
+            if self.shuffle:
+                self._sync_shuffle_order_locked()
+                self._shuffle_order.jump_to(self._current_index)
+            track = self.catalog.path(self._playlist[self._current_index])
         self._play_track(track)
         self._current_track = track
         self._user_stopped = False
+        self._track_changed()
+        self._prefetch_next()
         return track
 
     def stop(self) -> None:
         if self.device:
-            self.device.sonos.stop()
+            self.device.stop()
+        self._close_stream_session()
+        self._refetching = None
         self._user_stopped = True
         self._current_track = None
+        self._track_changed()
 
     def pause(self) -> None:
         if self.device:
-            self.device.sonos.pause()
+            self.device.pause()
         self._current_track = self.get_current_track()
         self._user_stopped = False
+        self._transport = None
+        if not self._sample_position(playing=False):
+            self.clock.pause()
+            self._journal.changed()
 
-    def next(self) -> Optional[Path]:
+    def _step(self, step: int) -> Optional[Path]:
         with self._playlist_lock:
             if not self._playlist:
                 return None
             if self.shuffle:
-                self._current_index = random.randrange(len(self._playlist))
+                self._sync_shuffle_order_locked()
+                if step > 0:
+                    self._current_index = self._shuffle_order.advance()
+                else:
+                    previous = self._shuffle_order.step_back()
+                    self._current_index = self._current_index if previous is None else previous
             else:
-                self._current_index = (self._current_index + 1) % len(self._playlist)
-            track = self._playlist[self._current_index]
+                self._current_index = (self._current_index + step) % len(self._playlist)
+            return self.catalog.path(self._playlist[self._current_index])
+
+    def next(self) -> Optional[Path]:
+        track = self._step(1)
+        if track is None:
+            return None
         self._play_track(track)
         self._current_track = track
         self._user_stopped = False
+        self._track_changed()
+        self._prefetch_next()
         return track
 
     def previous(self) -> Optional[Path]:
-        with self._playlist_lock:
-            if not self._playlist:
-                return None
-            if self.shuffle:
-                self._current_index = random.randrange(len(self._playlist))
-            else:
-                self._current_index = (self._current_index - 1) % len(self._playlist)
-            track = self._playlist[self._current_index]
+        track = self._step(-1)
+        if track is None:
+            return None
         self._play_track(track)
         self._current_track = track
         self._user_stopped = False
+        self._track_changed()
+        self._prefetch_next()
         return track
 
     def get_current_track(self) -> Optional[Path]:
@@ -159,45 +480,215 @@ class MusicPlayerManager:
                 return None
             if self._current_index >= len(self._playlist):
                 self._current_index = max(0, len(self._playlist) - 1)
-            return self._playlist[self._current_index] if self._playlist else None
+            return self.catalog.path(self._playlist[self._current_index])
 
-    def get_transport_state(self) -> Optional[str]:
+    def get_transport_state(self, max_age: float = 0.0) -> Optional[str]:
+        """
+        The speaker's transport state; a state queried less than `max_age`
+        seconds ago is returned without asking again.
+        """
         if not self.device:
             return None
+        cached = self._transport
+        if cached and time.monotonic() - cached[1] < max_age:
+            return cached[0]
         try:
-            info = self.device.sonos.get_current_transport_info()
-            return info.get("current_transport_state")
+            info = self.device.get_transport_info()
+            state = info.get("current_transport_state")
         except Exception:
             return None
+        self._transport = (state, time.monotonic()) if state else None
+        return state
+
+    def get_position(self) -> Optional[PlaybackPosition]:
+        """
+        Position within the current track, from the local playback clock.
+        """
+        return self.clock.position()
 
     def poll_and_maybe_advance(self) -> None:
         """
         Poll current transport state and auto-advance when playback stops naturally.
+        Between checks the playback clock stands in for the speaker, so polls
+        far from the end of a track make no network calls.
         """
+        if self._refetching:
+            # Stopped on purpose until the download is in; don't skip the track.
+            return
+        now = time.monotonic()
+        position = self.clock.position()
+        checked = self._transport
+        if (
+            position is not None
+            and position.playing
+            and checked is not None
+            and now - checked[1] < TRANSPORT_CHECK_SECONDS
+            and not self.clock.near_end(NEAR_END_SECONDS)
+            and not self.clock.resync_due()
+        ):
+            self._save_position(now)
+            return
+        _POLLS.inc()
         state = self.get_transport_state()
         if not state:
             return
 
         if state == "STOPPED" and not self._user_stopped and self._current_track:
             if self._playlist:
+                _AUTO_ADVANCE.inc()
                 self.next()
+        elif state == "PLAYING":
+            if position is None or not position.playing or self.clock.resync_due():
+                # Resumed from elsewhere (e.g. the Sonos app), or time to check for drift.
+                self._sample_position(playing=True)
+                self._refresh_volume(VOLUME_CHECK_SECONDS)
+            self._save_position(now)
+        elif state == "PAUSED_PLAYBACK" and position is not None and position.playing:
+            if not self._sample_position(playing=False):
+                self.clock.pause()
 
     def toggle_shuffle(self) -> bool:
-        self.shuffle = not self.shuffle
+        with self._playlist_lock:
+            self.shuffle = not self.shuffle
+            if self.shuffle:
+                self._shuffle_order.reset(len(self._playlist), current=self._current_index)
+        self._journal.changed()
+        self._prefetch_next()
         return self.shuffle
 
+    # Session journal
+    def restore_session(self) -> bool:
+        """
+        Load the queue, queue position, shuffle order and playback position
+        saved by the last run. Paths are used as stored, without a library
+        scan; missing files are dealt with when played, like evicted tracks.
+        The saved position is applied the next time play() starts that
+        track. Does nothing if the queue already has tracks.
+        """
+        try:
+            snapshot = load_session()
+        except Exception as exc:
+            print(f"Could not load the saved playback session: {exc}")
+            return False
+        if snapshot is None or not snapshot.queue:
+            return False
+        with self._playlist_lock:
+            if self._playlist:
+                return False
+            # Journaled paths are canonical already.
+            self._playlist = [self.catalog.intern(path, resolved=True).id for path in snapshot.queue]
+            self._current_index = min(max(0, snapshot.current_index), len(self._playlist) - 1)
+            self.shuffle = snapshot.shuffle
+            if self.shuffle:
+                restored = snapshot.shuffle_order is not None and self._shuffle_order.restore(snapshot.shuffle_order)
+                if not restored or len(self._shuffle_order) != len(self._playlist):
+                    self._shuffle_order.reset(len(self._playlist), current=self._current_index)
+            # Without this process serving the stream the speaker stopped
+            # soon after the last sample, so the position is not extrapolated.
+            if snapshot.position_track and snapshot.position_seconds > 0:
+                track = self.catalog.intern(snapshot.position_track, resolved=True).path
+                self._resume_at = (track, snapshot.position_seconds)
+                self.clock.anchor(track, snapshot.position_seconds, False, source="restore")
+        print(f"Restored playback session: {len(snapshot.queue)} track(s), at #{self._current_index + 1}.")
+        return True
+
+    def get_resume_point(self) -> Optional[Tuple[Path, float]]:
+        """
+        The restored (track, seconds) play() will resume at, if any.
+        """
+        resume_at = self._resume_at
+        if resume_at and resume_at[0] == self.get_current_track():
+            return resume_at
+        return None
+
+    def _session_state(self) -> Dict[str, Any]:
+        # Called by the journal with _playlist_lock held.
+        position = self.clock.position()
+        return {
+            "current_index": self._current_index,
+            "shuffle": int(self.shuffle),
+            "shuffle_order": json.dumps(self._shuffle_order.snapshot()) if self.shuffle else None,
+            "position_track": str(position.track) if position else None,
+            "position_seconds": position.seconds if position else None,
+            "was_playing": int(bool(position and position.playing)),
+        }
+
+    def _track_changed(self) -> None:
+        track = self._current_track
+        if track and track != self._refetching:
+            self.clock.start(track, _track_duration(track))
+        else:
+            self.clock.stop()
+        # The speaker's state changed under the cached one.
+        self._transport = None
+        self._position_saved = time.monotonic()
+        self._journal.changed()
+
+    def _save_position(self, now: float) -> None:
+        if now - self._position_saved >= POSITION_SAVE_SECONDS:
+            self._position_saved = now
+            self._journal.changed()
+
+    def _sample_position(self, playing: bool) -> bool:
+        """
+        Re-anchor the playback clock from the speaker's position. Skipped
+        for crossfaded streams, whose position spans several tracks.
+        """
+        track = self._current_track
+        if not self.device or not track or self._stream_session:
+            return False
+        try:
+            info = self.device.get_current_track_info()
+        except Exception:
+            return False
+        seconds = _hms_seconds(info.get("position"))
+        if seconds is None:
+            return False
+        self.clock.anchor(track, seconds, playing, duration=_hms_seconds(info.get("duration")))
+        self._journal.changed()
+        return True
+
+    def _seek(self, seconds: float) -> None:
+        if not self.device or self._stream_session:
+            return
+        try:
+            self.device.seek(seconds)
+        except Exception as exc:
+            print(f"Could not resume at {int(seconds)}s: {exc}")
+            return
+        if self._current_track:
+            self.clock.anchor(self._current_track, seconds, True, source="seek")
+
     # Volume passthrough
-    def get_volume(self) -> Optional[int]:
+    def get_volume(self, max_age: float = 0.0) -> Optional[int]:
+        """
+        The speaker's volume; one read or set less than `max_age` seconds
+        ago is returned without asking again.
+        """
         if not self.device:
             return None
-        return self.device.get_volume()
+        cached = self._volume
+        if cached and time.monotonic() - cached[1] < max_age:
+            return cached[0]
+        return self._remember_volume(self.device.get_volume())
 
     def set_volume(self, volume: int) -> Optional[int]:
         if not self.device:
             return None
-        return self.device.set_volume(volume)
+        return self._remember_volume(self.device.set_volume(volume))
 
     def change_volume(self, delta: int) -> Optional[int]:
         if not self.device:
             return None
-        return self.device.change_volume(delta)
+        # Relative to the cached volume: one SOAP call instead of two.
+        return self.set_volume(self.get_volume(max_age=VOLUME_CHECK_SECONDS) + delta)
+
+    def _remember_volume(self, volume: Optional[int]) -> Optional[int]:
+        self._volume = (volume, time.monotonic()) if volume is not None else None
+        return volume
+
+    def _refresh_volume(self, max_age: float) -> None:
+        try:
+            self.get_volume(max_age=max_age)
+        except Exception:
+            pass
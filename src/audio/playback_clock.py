@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from src.misc.metrics import REGISTRY
+
+# While playing, re-anchor from the speaker at least this often.
+RESYNC_SECONDS = 30.0
+# A sample this far from the interpolated position counts as drift.
+DRIFT_TOLERANCE = 1.0
+
+_ANCHORS = REGISTRY.counter("sonos_thing_playback_clock_anchors_total", "Playback clock anchors by source.", ["source"])
+_DRIFT = REGISTRY.histogram(
+    "sonos_thing_playback_clock_drift_seconds",
+    "Difference between a speaker position sample and the interpolated position.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+@dataclass(frozen=True)
+class PlaybackPosition:
+    track: Path
+    seconds: float
+    duration: Optional[float]
+    playing: bool
+
+    @property
+    def remaining(self) -> Optional[float]:
+        return max(0.0, self.duration - self.seconds) if self.duration is not None else None
+
+
+class PlaybackClock:
+    """
+    Local estimate of the position within the current track. Anchored by
+    what the app does (play, pause, seek) and by occasional position samples
+    from the speaker, and interpolated with the monotonic clock in between,
+    so reading the position costs no network traffic.
+    """
+
+    def __init__(self, resync_seconds: float = RESYNC_SECONDS) -> None:
+        self.resync_seconds = resync_seconds
+        self._lock = Lock()
+        self._track: Optional[Path] = None
+        self._duration: Optional[float] = None
+        self._seconds = 0.0
+        self._playing = False
+        self._anchored_at = 0.0
+        # When a speaker sample last confirmed the anchor.
+        self._synced_at = 0.0
+
+    # --- anchoring ---
+    def start(self, track: Path, duration: Optional[float] = None, seconds: float = 0.0) -> None:
+        """
+        `track` started playing at `seconds`.
+        """
+        with self._lock:
+            self._track, self._duration = track, duration
+            self._set_locked(seconds, True)
+            self._synced_at = self._anchored_at
+        _ANCHORS.labels("start").inc()
+
+    def anchor(
+        self,
+        track: Path,
+        seconds: float,
+        playing: bool,
+        duration: Optional[float] = None,
+        source: str = "sample",
+    ) -> Optional[float]:
+        """
+        Re-anchor at a known position. Returns the drift from the interpolated
+        position when the sample is for the track the clock was following.
+        """
+        with self._lock:
+            drift = None
+            if self._track == track:
+                drift = seconds - self._position_locked(time.monotonic())
+            else:
+                self._track, self._duration = track, None
+            if duration:
+                self._duration = duration
+            self._set_locked(seconds, playing)
+            if source == "sample":
+                self._synced_at = self._anchored_at
+        _ANCHORS.labels(source).inc()
+        if drift is not None and source == "sample":
+            _DRIFT.observe(abs(drift))
+            if abs(drift) > DRIFT_TOLERANCE:
+                print(f"Playback clock drifted {drift:+.1f}s on {track.name}; re-synced.")
+        return drift
+
+    def pause(self) -> None:
+        with self._lock:
+            if self._track is not None and self._playing:
+                self._set_locked(self._position_locked(time.monotonic()), False)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._track, self._duration = None, None
+            self._set_locked(0.0, False)
+
+    def rename(self, old: Path, new: Path) -> None:
+        with self._lock:
+            if self._track == old:
+                self._track = new
+
+    def _set_locked(self, seconds: float, playing: bool) -> None:
+        self._seconds = max(0.0, seconds)
+        self._playing = playing
+        self._anchored_at = time.monotonic()
+
+    # --- reading ---
+    def position(self) -> Optional[PlaybackPosition]:
+        with self._lock:
+            if self._track is None:
+                return None
+            seconds = self._position_locked(time.monotonic())
+            return PlaybackPosition(self._track, seconds, self._duration, self._playing)
+
+    def near_end(self, within: float) -> bool:
+        """
+        True while playing with less than `within` seconds of a known duration left.
+        """
+        position = self.position()
+        return bool(position and position.playing and position.remaining is not None and position.remaining <= within)
+
+    def resync_due(self) -> bool:
+        with self._lock:
+            return self._playing and time.monotonic() - self._synced_at >= self.resync_seconds
+
+    def _position_locked(self, now: float) -> float:
+        seconds = self._seconds + (now - self._anchored_at if self._playing else 0.0)
+        return min(seconds, self._duration) if self._duration is not None else seconds
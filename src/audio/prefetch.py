@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from src.audio.analysis import AudioAnalysisManager
+
+VariantBuilder = Callable[[Path], Optional[Path]]
+
+_READ_CHUNK = 1024 * 1024
+
+
+def readahead(path: Path) -> None:
+    """
+    Pull a file into the page cache. Uses posix_fadvise(WILLNEED) where the
+    kernel supports it, otherwise reads the file through once.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            return
+        while os.read(fd, _READ_CHUNK):
+            pass
+    finally:
+        os.close(fd)
+
+
+class TrackPrefetcher:
+    """
+    Warms the predicted next track on a background thread: page cache,
+    analysis, any registered variant builders (e.g. the speaker's MP3
+    transcode) and the stream URI, so the track boundary only costs the
+    play_uri call.
+    """
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._lock = Lock()
+        self._variant_builders: List[VariantBuilder] = []
+        self._uris: Dict[Path, str] = {}
+        self._target: Optional[Path] = None
+        self._future: Optional[Future] = None
+
+    def register_variant_builder(self, builder: VariantBuilder) -> None:
+        """
+        Add a builder that makes (or finds) a variant of a track ahead of
+        time, returning its path or None. Builders run in registration order.
+        """
+        with self._lock:
+            self._variant_builders.append(builder)
+
+    def warm(self, track: Path, uri_builder: Callable[[Path], str]) -> Optional[Future]:
+        """
+        Schedule warming of `track`; re-warming the same target is a no-op.
+        """
+        with self._lock:
+            if self._target == track and self._future and not self._future.cancelled():
+                return self._future
+            if self._future:
+                self._future.cancel()
+            self._target = track
+            self._future = self._executor.submit(self._warm, track, uri_builder)
+            return self._future
+
+    def take_uri(self, track: Path) -> Optional[str]:
+        with self._lock:
+            return self._uris.pop(track, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._uris.clear()
+            self._target = None
+            if self._future:
+                self._future.cancel()
+                self._future = None
+
+    def _warm(self, track: Path, uri_builder: Callable[[Path], str]) -> None:
+        if not track.exists():
+            # Evicted by the library quota: queue it again before it is needed.
+            # The download lands in the page cache, so there is nothing to warm.
+            from src.audio.library_quota import LibraryQuota
+
+            try:
+                LibraryQuota.instance().restore_async(track)
+            except Exception as exc:
+                print(f"Prefetch could not re-fetch {track.name}: {exc}")
+            return
+
+        try:
+            readahead(track)
+        except OSError as exc:
+            print(f"Prefetch could not read {track.name}: {exc}")
+            return
+
+        try:
+            AudioAnalysisManager.instance().submit(track)
+        except Exception:
+            pass
+
+        with self._lock:
+            builders = list(self._variant_builders)
+        for builder in builders:
+            try:
+                variant = builder(track)
+                if variant:
+                    readahead(variant)
+            except Exception as exc:
+                print(f"Prefetch variant failed for {track.name}: {exc}")
+
+        try:
+            uri = uri_builder(track)
+        except Exception:
+            return
+        with self._lock:
+            if self._target == track:
+                # Only the latest prediction is kept; older URIs are stale guesses.
+                self._uris = {track: uri}
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import atexit
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.misc.metrics import REGISTRY
+from src.sqlite_connection import SqliteConnection
+
+# Mutations within this window are written together in one transaction.
+FLUSH_DELAY = 0.5
+# Past this many pending queue edits, rewriting the whole queue is cheaper.
+MAX_QUEUE_OPS = 64
+
+_FLUSHES = REGISTRY.counter("sonos_thing_session_flushes_total", "Session journal writes by kind.", ["kind"])
+
+
+@dataclass
+class SessionSnapshot:
+    queue: List[Path]
+    current_index: int
+    shuffle: bool
+    shuffle_order: Optional[Dict[str, Any]]
+    position_track: Optional[Path]
+    position_seconds: float
+    was_playing: bool
+    updated_at: float
+
+
+def load_session() -> Optional[SessionSnapshot]:
+    """
+    The session saved by the last run, or None if there is none.
+    """
+    with SqliteConnection() as db:
+        state = db.get_session_state()
+        queue = db.get_session_queue()
+    if state is None:
+        return None
+    try:
+        shuffle_order = json.loads(state["shuffle_order"]) if state["shuffle_order"] else None
+    except ValueError:
+        shuffle_order = None
+    return SessionSnapshot(
+        queue=[Path(p) for p in queue],
+        current_index=int(state["current_index"]),
+        shuffle=bool(state["shuffle"]),
+        shuffle_order=shuffle_order,
+        position_track=Path(state["position_track"]) if state["position_track"] else None,
+        position_seconds=float(state["position_seconds"] or 0.0),
+        was_playing=bool(state["was_playing"]),
+        updated_at=float(state["updated_at"]),
+    )
+
+
+class SessionJournal:
+    """
+    Write-behind journal of the live queue and playback state in SQLite.
+    Queue edits are recorded as appends, removals and replacements, and the
+    rest of the state is one row, so a flush costs a few statements however
+    long the queue is. Edits are batched for FLUSH_DELAY seconds and flushed
+    once more at exit.
+
+    `source_lock` guards the player state: hold it around the queue_* calls,
+    so edits are journaled in the order they were made. The `state` and
+    `queue` callables are called with it held.
+    """
+
+    def __init__(
+        self,
+        source_lock: Lock,
+        state: Callable[[], Dict[str, Any]],
+        queue: Callable[[], List[Path]],
+        delay: float = FLUSH_DELAY,
+    ) -> None:
+        self.delay = delay
+        self._source_lock = source_lock
+        self._state = state
+        self._queue = queue
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._ops: List[Tuple[Any, ...]] = []
+        # Until the first flush, the stored queue may belong to another run.
+        self._rewrite = True
+        self._dirty = False
+        self._timer: Optional[Timer] = None
+        atexit.register(self.flush)
+
+    # --- recording ---
+    def queue_appended(self, position: int, path: Path) -> None:
+        self._record(("append", position, str(path)))
+
+    def queue_removed(self, position: int) -> None:
+        self._record(("remove", position))
+
+    def queue_replaced(self, position: int, path: Path) -> None:
+        self._record(("replace", position, str(path)))
+
+    def changed(self) -> None:
+        """
+        Something other than the queue changed (index, shuffle, position).
+        """
+        self._record(None)
+
+    def _record(self, op: Optional[Tuple[Any, ...]]) -> None:
+        with self._lock:
+            if op and not self._rewrite:
+                self._ops.append(op)
+                if len(self._ops) > MAX_QUEUE_OPS:
+                    self._ops.clear()
+                    self._rewrite = True
+            self._dirty = True
+            if self._timer is None:
+                self._timer = Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    # --- writing ---
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._source_lock:
+                with self._lock:
+                    if self._timer is not None:
+                        self._timer.cancel()
+                        self._timer = None
+                    if not self._dirty:
+                        return
+                    ops, self._ops = self._ops, []
+                    rewrite, self._rewrite = self._rewrite, False
+                    self._dirty = False
+                state = self._state()
+                queue = self._queue() if rewrite else None
+            state["updated_at"] = time.time()
+            try:
+                with SqliteConnection() as db:
+                    if queue is not None:
+                        db.replace_session_queue(queue)
+                    for op in ops:
+                        if op[0] == "append":
+                            db.append_session_track(op[1], op[2])
+                        elif op[0] == "remove":
+                            db.remove_session_track(op[1])
+                        else:
+                            db.update_session_track(op[1], op[2])
+                    db.save_session_state(state)
+            except Exception as exc:
+                print(f"Could not save the playback session: {exc}")
+                # The edits are gone; write the whole queue on the next change.
+                with self._lock:
+                    self._rewrite = True
+                return
+        _FLUSHES.labels("rewrite" if queue is not None else "incremental").inc()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List, Optional
+
+
+class ShuffleOrder:
+    """
+    Precomputed shuffle play order over playlist indices.
+
+    The order is a sequence of Fisher–Yates permutations with a cursor on the
+    current entry: everything before the cursor is history (for previous()),
+    everything after it is the known upcoming order (for next() and
+    prefetching). A new permutation is appended when the cursor runs off the
+    end, so every track plays once per cycle.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None, history_limit: int = 500) -> None:
+        self._rng = rng or random.Random()
+        self.history_limit = history_limit
+        self._sequence: List[int] = []
+        self._cursor = -1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def reset(self, size: int, current: Optional[int] = None) -> None:
+        """
+        Start a new order over `size` tracks, optionally with `current` as the
+        track already playing.
+        """
+        self._size = size
+        self._sequence = self._permutation(avoid_first=None)
+        self._cursor = -1
+        if current is not None and 0 <= current < size:
+            pos = self._sequence.index(current)
+            self._sequence[0], self._sequence[pos] = self._sequence[pos], self._sequence[0]
+            self._cursor = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"sequence": list(self._sequence), "cursor": self._cursor, "size": self._size}
+
+    def restore(self, state: Dict[str, Any]) -> bool:
+        """
+        Load a snapshot() taken earlier. Returns False (leaving the order as
+        it was) if the snapshot does not describe a valid order.
+        """
+        try:
+            size = int(state["size"])
+            sequence = [int(value) for value in state["sequence"]]
+            cursor = int(state["cursor"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if any(not 0 <= value < size for value in sequence) or not -1 <= cursor < len(sequence):
+            return False
+        self._size, self._sequence, self._cursor = size, sequence, cursor
+        return True
+
+    def current(self) -> Optional[int]:
+        if 0 <= self._cursor < len(self._sequence):
+            return self._sequence[self._cursor]
+        return None
+
+    def history(self) -> List[int]:
+        return self._sequence[: max(0, self._cursor)]
+
+    def peek_next(self) -> Optional[int]:
+        if self._size == 0:
+            return None
+        if self._cursor + 1 >= len(self._sequence):
+            last = self._sequence[-1] if self._sequence else None
+            self._sequence.extend(self._permutation(avoid_first=last))
+        return self._sequence[self._cursor + 1]
+
+    def advance(self) -> Optional[int]:
+        upcoming = self.peek_next()
+        if upcoming is None:
+            return None
+        self._cursor += 1
+        if self._cursor > 2 * self.history_limit:
+            drop = self._cursor - self.history_limit
+            del self._sequence[:drop]
+            self._cursor -= drop
+        return upcoming
+
+    def step_back(self) -> Optional[int]:
+        """
+        Move to the previously played track; stays put when there is no history.
+        """
+        if self._cursor > 0:
+            self._cursor -= 1
+        return self.current()
+
+    def jump_to(self, index: int) -> None:
+        """
+        Make `index` the current track (e.g. the user picked it), keeping the
+        rest of the upcoming order intact.
+        """
+        target = self._cursor + 1
+        if target >= len(self._sequence):
+            self.peek_next()
+        try:
+            pos = self._sequence.index(index, target)
+            self._sequence[target], self._sequence[pos] = self._sequence[pos], self._sequence[target]
+        except ValueError:
+            self._sequence.insert(target, index)
+        self._cursor = target
+
+    def add(self, index: int) -> None:
+        """
+        A track was appended to the playlist at `index`: place it at a uniformly
+        random position among the tracks not yet played this cycle.
+        """
+        self._size += 1
+        self._sequence.append(index)
+        lo = self._cursor + 1
+        pos = self._rng.randrange(lo, len(self._sequence))
+        self._sequence[pos], self._sequence[-1] = self._sequence[-1], self._sequence[pos]
+
+    def remove(self, index: int) -> None:
+        """
+        The playlist entry at `index` was removed; later indices shift down by one.
+        If it was current, the cursor falls back so next() plays what was upcoming.
+        """
+        self._size = max(0, self._size - 1)
+        cursor = self._cursor
+        sequence: List[int] = []
+        for pos, value in enumerate(self._sequence):
+            if value == index:
+                if pos <= self._cursor:
+                    cursor -= 1
+                continue
+            sequence.append(value - 1 if value > index else value)
+        self._sequence = sequence
+        self._cursor = max(-1, cursor)
+
+    def _permutation(self, avoid_first: Optional[int]) -> List[int]:
+        order = list(range(self._size))
+        # Fisher–Yates
+        for i in range(len(order) - 1, 0, -1):
+            j = self._rng.randint(0, i)
+            order[i], order[j] = order[j], order[i]
+        if avoid_first is not None and len(order) > 1 and order[0] == avoid_first:
+            swap = self._rng.randrange(1, len(order))
+            order[0], order[swap] = order[swap], order[0]
+        return order
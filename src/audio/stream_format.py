@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from src.audio.wav import read_wav_layout
+from src.misc.bandwidth import BandwidthScheduler
+from src.misc.metrics import REGISTRY
+from src.misc.pathing import DOWNLOADS_DIR
+from src.sqlite_connection import SqliteConnection
+
+if TYPE_CHECKING:
+    from src.sonos import SonosDeviceHandle
+
+LOSSLESS, HIGH, LOW = "lossless", "high", "low"
+# Best first.
+QUALITIES = (LOSSLESS, HIGH, LOW)
+# MP3 bitrates (bits/s) of the transcoded variants; lossless is the WAV itself.
+VARIANT_BITRATES = {HIGH: 320_000, LOW: 128_000}
+# "auto" (default) or one of QUALITIES to serve every device the same.
+QUALITY_SETTING = "stream_quality"
+VARIANTS_DIRNAME = ".variants"
+
+# A quality is picked when the measured link capacity is this many times its rate.
+HEADROOM = 1.5
+# Moving back up needs more margin, so a borderline link does not flap.
+UPGRADE_HEADROOM = 2.5
+# After a stall forces a step down, stay there at least this long.
+HOLD_SECONDS = 10 * 60
+_CD_BYTE_RATE = 44_100 * 2 * 2
+
+_QUALITY_CHANGES = REGISTRY.counter(
+    "sonos_thing_stream_quality_changes_total", "Per-device stream quality changes, by new quality.", ["quality"]
+)
+_TRANSCODES = REGISTRY.counter("sonos_thing_variant_transcodes_total", "Variant transcodes by result.", ["result"])
+
+
+def variant_byte_rate(path: Path) -> Optional[int]:
+    """
+    Playback rate in bytes/s of a file under the variants directory, else None.
+    """
+    path = Path(path)
+    if path.parent.parent.name != VARIANTS_DIRNAME:
+        return None
+    bitrate = VARIANT_BITRATES.get(path.parent.name)
+    return bitrate // 8 if bitrate else None
+
+
+def variants_of(track: Path, downloads_dir: Path = DOWNLOADS_DIR) -> List[Path]:
+    """
+    Transcoded variants of `track` that exist on disk.
+    """
+    variants_dir = Path(downloads_dir) / VARIANTS_DIRNAME
+    candidates = (variants_dir / quality / f"{Path(track).stem}.mp3" for quality in VARIANT_BITRATES)
+    return [variant for variant in candidates if variant.is_file()]
+
+
+@dataclass
+class _DeviceFormat:
+    quality: str = LOSSLESS
+    capacity: Optional[float] = None
+    stalls: int = 0
+    held_until: Optional[float] = None
+    # ClientDelivery counters already taken into account (this run only).
+    connections_seen: int = 0
+    stalls_seen: int = 0
+
+
+class StreamFormatSelector:
+    """
+    Singleton that picks, per speaker, which variant of a track to serve:
+    the lossless WAV, or a high or low bitrate MP3 transcoded with ffmpeg
+    into downloads/.variants/<quality>/. The choice follows the delivery the
+    stream server measured for the speaker's IP (BandwidthScheduler): drop a
+    level when a connection stalled or the link cannot carry the current
+    rate, go back up when it comfortably can. Choices persist in SQLite.
+    Without ffmpeg every device gets the WAV.
+    """
+
+    _instance: Optional["StreamFormatSelector"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, downloads_dir: Path = DOWNLOADS_DIR) -> None:
+        self.downloads_dir = Path(downloads_dir)
+        self.variants_dir = self.downloads_dir / VARIANTS_DIRNAME
+        self._lock = Lock()
+        self._devices: Dict[str, _DeviceFormat] = {}
+        self._pending: Dict[Tuple[Path, str], Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._ffmpeg = shutil.which("ffmpeg")
+
+    @classmethod
+    def instance(cls) -> "StreamFormatSelector":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    # --- choosing ---
+    def quality_for(self, handle: SonosDeviceHandle, track: Optional[Path] = None) -> str:
+        """
+        The quality to serve `handle`, updated from any deliveries measured
+        since the last call. `track` gives the lossless rate to compare with.
+        """
+        if not self._ffmpeg:
+            return LOSSLESS
+        forced = self._forced_quality()
+        if forced:
+            return forced
+        name = handle.player_name
+        state = self._state_for(name)
+        ip = handle.ip_address
+        delivery = BandwidthScheduler.instance().client_delivery(ip) if ip else None
+        if delivery is None or delivery.connections <= state.connections_seen:
+            return state.quality
+        lossless_rate = self._lossless_rate(track)
+        with self._lock:
+            if delivery.connections <= state.connections_seen:
+                return state.quality
+            stalled = delivery.stalls > state.stalls_seen
+            state.connections_seen, state.stalls_seen = delivery.connections, delivery.stalls
+            previous = state.quality
+            state.quality, state.held_until = self._decide(state, delivery.capacity, stalled, lossless_rate)
+            state.capacity = delivery.capacity
+            state.stalls += stalled
+            snapshot = (state.quality, state.capacity, state.stalls, state.held_until)
+        if snapshot[0] != previous:
+            _QUALITY_CHANGES.labels(snapshot[0]).inc()
+            print(f"Stream quality for {name}: {previous} -> {snapshot[0]} (link ~{snapshot[1] / 1000:.0f} kB/s)")
+        try:
+            with SqliteConnection() as db:
+                db.set_device_stream_format(name, *snapshot)
+        except Exception as exc:
+            print(f"Could not save stream quality for {name}: {exc}")
+        return snapshot[0]
+
+    def current(self, device_name: str) -> str:
+        if not self._ffmpeg:
+            return LOSSLESS
+        return self._forced_quality() or self._state_for(device_name).quality
+
+    @staticmethod
+    def _decide(
+        state: _DeviceFormat, capacity: float, stalled: bool, lossless_rate: int
+    ) -> Tuple[str, Optional[float]]:
+        now = time.time()
+        rates = {LOSSLESS: lossless_rate, **{q: bitrate // 8 for q, bitrate in VARIANT_BITRATES.items()}}
+        level = QUALITIES.index(state.quality)
+        if stalled:
+            return QUALITIES[min(level + 1, len(QUALITIES) - 1)], now + HOLD_SECONDS
+        fitting = next((q for q in QUALITIES if rates[q] * HEADROOM <= capacity), QUALITIES[-1])
+        if QUALITIES.index(fitting) > level:
+            return fitting, state.held_until
+        if level and (state.held_until is None or now >= state.held_until):
+            better = QUALITIES[level - 1]
+            if rates[better] * UPGRADE_HEADROOM <= capacity:
+                return better, None
+        return state.quality, state.held_until
+
+    @staticmethod
+    def _lossless_rate(track: Optional[Path]) -> int:
+        if track is not None:
+            try:
+                return read_wav_layout(track).byte_rate
+            except (OSError, ValueError):
+                pass
+        return _CD_BYTE_RATE
+
+    def _state_for(self, name: str) -> _DeviceFormat:
+        with self._lock:
+            state = self._devices.get(name)
+        if state is not None:
+            return state
+        state = _DeviceFormat()
+        try:
+            with SqliteConnection() as db:
+                row = db.get_device_stream_format(name)
+        except Exception:
+            row = None
+        if row and row["quality"] in QUALITIES:
+            state = _DeviceFormat(row["quality"], row["capacity"], row["stalls"], row["held_until"])
+        with self._lock:
+            return self._devices.setdefault(name, state)
+
+    @staticmethod
+    def _forced_quality() -> Optional[str]:
+        try:
+            with SqliteConnection() as db:
+                value = (db.get_setting(QUALITY_SETTING) or "").lower()
+        except Exception:
+            return None
+        return value if value in QUALITIES else None
+
+    # --- variants ---
+    def uri_path(self, track: Path, handle: SonosDeviceHandle) -> str:
+        """
+        URL path (under the stream server) of the variant `handle` should
+        get. Falls back to the WAV while a missing variant is transcoded.
+        """
+        quality = self.quality_for(handle, track)
+        if quality != LOSSLESS:
+            variant = self.variant_path(track, quality)
+            if self._fresh(variant, track):
+                return f"/{VARIANTS_DIRNAME}/{quality}/{quote(variant.name)}"
+            self.request_variant(track, quality)
+        return f"/{quote(track.name)}"
+
+    def variant_path(self, track: Path, quality: str) -> Path:
+        return self.variants_dir / quality / f"{Path(track).stem}.mp3"
+
+    def ensure_variant(self, track: Path, quality: str) -> Optional[Path]:
+        """
+        Transcode `track` for `quality` if needed, blocking until done.
+        Returns the variant, or None for lossless or when it cannot be made.
+        """
+        future = self.request_variant(track, quality)
+        if future is None:
+            variant = self.variant_path(track, quality)
+            return variant if quality != LOSSLESS and self._fresh(variant, track) else None
+        try:
+            return future.result()
+        except Exception as exc:
+            print(f"Could not transcode {Path(track).name} ({quality}): {exc}")
+            return None
+
+    def request_variant(self, track: Path, quality: str) -> Optional[Future]:
+        if quality == LOSSLESS or not self._ffmpeg or self._fresh(self.variant_path(track, quality), track):
+            return None
+        key = (Path(track), quality)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._executor is None:
+                    # One at a time: transcodes compete with playback for CPU.
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcode")
+                    # Variants of tracks that are gone are only dropped here, once per run.
+                    self._executor.submit(self.prune)
+                future = self._executor.submit(self._transcode, Path(track), quality)
+                self._pending[key] = future
+                future.add_done_callback(lambda _f: self._forget(key))
+        return future
+
+    def prune(self) -> int:
+        """
+        Delete variants whose source WAV is no longer in the library.
+        """
+        removed = 0
+        for quality in VARIANT_BITRATES:
+            folder = self.variants_dir / quality
+            if not folder.is_dir():
+                continue
+            for variant in folder.iterdir():
+                if not (self.downloads_dir / f"{variant.stem}.wav").exists():
+                    try:
+                        variant.unlink()
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    def _forget(self, key: Tuple[Path, str]) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _transcode(self, track: Path, quality: str) -> Path:
+        target = self.variant_path(track, quality)
+        if self._fresh(target, track):
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + ".part")
+        bitrate = f"{VARIANT_BITRATES[quality] // 1000}k"
+        command = [self._ffmpeg, "-v", "error", "-y", "-i", str(track), "-vn", "-codec:a", "libmp3lame"]
+        command += ["-b:a", bitrate, "-f", "mp3", str(partial)]
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=600)
+            os.replace(partial, target)
+        except Exception:
+            _TRANSCODES.labels("error").inc()
+            partial.unlink(missing_ok=True)
+            raise
+        _TRANSCODES.labels("ok").inc()
+        return target
+
+    @staticmethod
+    def _fresh(variant: Path, track: Path) -> bool:
+        try:
+            return variant.stat().st_mtime_ns >= Path(track).stat().st_mtime_ns
+        except OSError:
+            return False
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Union
+
+from src.misc.metrics import REGISTRY
+
+PathLike = Union[Path, str]
+
+# Alias spellings kept before the cache starts over from the canonical keys.
+MAX_ALIASES = 16_384
+
+_TRACKS = REGISTRY.gauge("sonos_thing_catalog_tracks", "Track records in the in-memory catalog.")
+
+
+class TrackRecord:
+    """
+    One library file: its integer ID, canonical (resolved) path, and the
+    path and stem as interned strings. Records are never copied, so they
+    compare and hash by identity.
+    """
+
+    __slots__ = ("id", "path", "key", "stem")
+
+    def __init__(self, track_id: int, key: str) -> None:
+        self.id = track_id
+        self.key = key
+        self.path = Path(key)
+        self.stem = sys.intern(self.path.stem)
+
+    def __repr__(self) -> str:
+        return f"TrackRecord({self.id}, {self.key!r})"
+
+
+class TrackCatalog:
+    """
+    Singleton, process-wide table of track records. Every spelling of a path
+    is resolved against the filesystem once and then maps straight to its
+    record, so callers can pass paths around freely and store the integer
+    IDs (e.g. the play queue) instead of Path objects. IDs are stable for the
+    life of the process; records are not removed when files go away, but
+    their cached spellings are (see forget) and the cache is bounded.
+    """
+
+    _instance: Optional["TrackCatalog"] = None
+    _instance_lock = Lock()
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._records: List[TrackRecord] = []
+        self._by_key: Dict[str, TrackRecord] = {}
+        # Path as given -> record; saves resolving the same spelling twice.
+        # Replaced, never cleared in place, as lookups read it without the lock.
+        self._aliases: Dict[str, TrackRecord] = {}
+
+    @classmethod
+    def instance(cls) -> "TrackCatalog":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def intern(self, path: PathLike, resolved: bool = False) -> TrackRecord:
+        """
+        The record for `path`, created on first sight. Pass resolved=True for
+        paths known to be canonical already (e.g. read back from SQLite).
+        """
+        spelling = os.fspath(path)
+        record = self._aliases.get(spelling)
+        if record is not None:
+            return record
+        key = sys.intern(spelling if resolved else os.path.realpath(spelling))
+        with self._lock:
+            record = self._by_key.get(key)
+            if record is None:
+                record = TrackRecord(len(self._records), key)
+                self._records.append(record)
+                self._by_key[key] = record
+                self._aliases[key] = record
+                _TRACKS.set(len(self._records))
+            if len(self._aliases) >= MAX_ALIASES + len(self._by_key):
+                self._aliases = dict(self._by_key)
+            self._aliases[spelling] = record
+        return record
+
+    def forget(self, path: PathLike) -> None:
+        """
+        Drop the cached spellings of `path` (e.g. after it was renamed or
+        deleted), so they are resolved again next time. The record stays.
+        """
+        spelling = os.fspath(path)
+        with self._lock:
+            record = self._aliases.get(spelling) or self._by_key.get(os.path.realpath(spelling))
+            self._aliases = {
+                alias: known
+                for alias, known in self._aliases.items()
+                if alias == known.key or (alias != spelling and known is not record)
+            }
+
+    def id_for(self, path: PathLike) -> int:
+        return self.intern(path).id
+
+    def key(self, path: PathLike) -> str:
+        """
+        Canonical path string of `path`, as stored in SQLite.
+        """
+        return self.intern(path).key
+
+    def find(self, path: PathLike) -> Optional[TrackRecord]:
+        """
+        The record for `path` if one exists; never creates one.
+        """
+        spelling = os.fspath(path)
+        record = self._aliases.get(spelling)
+        if record is None:
+            record = self._by_key.get(os.path.realpath(spelling))
+        return record
+
+    def get(self, track_id: int) -> TrackRecord:
+        return self._records[track_id]
+
+    def path(self, track_id: int) -> Path:
+        return self._records[track_id].path
+
+    def paths(self, track_ids: Iterable[int]) -> List[Path]:
+        records = self._records
+        return [records[i].path for i in track_ids]
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass(frozen=True)
+class WavLayout:
+    """
+    Location and encoding of the PCM payload inside a RIFF/WAVE file.
+    """
+
+    sample_rate: int
+    channels: int
+    sample_width: int
+    is_float: bool
+    data_offset: int
+    data_size: int
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.frame_size
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def byte_rate(self) -> int:
+        return self.sample_rate * self.frame_size
+
+    @property
+    def numpy_dtype(self) -> str:
+        if self.is_float:
+            return {4: "<f4", 8: "<f8"}[self.sample_width]
+        return {1: "u1", 2: "<i2", 4: "<i4"}[self.sample_width]
+
+    @property
+    def full_scale(self) -> float:
+        if self.is_float:
+            return 1.0
+        return float(1 << (self.sample_width * 8 - 1))
+
+    def same_format(self, other: "WavLayout") -> bool:
+        return (self.sample_rate, self.channels, self.sample_width, self.is_float) == (
+            other.sample_rate,
+            other.channels,
+            other.sample_width,
+            other.is_float,
+        )
+
+
+def read_wav_layout(path: Path) -> WavLayout:
+    """
+    Parse the RIFF chunks of a WAV file up to the start of its data chunk.
+    Raises ValueError for files that are not plain PCM/float WAVs.
+    """
+    path = Path(path)
+    file_size = path.stat().st_size
+    with path.open("rb") as fh:
+        riff = fh.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path.name}")
+
+        fmt = None
+        while True:
+            header = fh.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV file has no data chunk: {path.name}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = fh.read(chunk_size)
+                if chunk_size % 2:
+                    fh.seek(1, 1)
+            elif chunk_id == b"data":
+                data_offset = fh.tell()
+                break
+            else:
+                fh.seek(chunk_size + (chunk_size % 2), 1)
+
+    if fmt is None or len(fmt) < 16:
+        raise ValueError(f"WAV file has no format chunk: {path.name}")
+
+    format_tag, channels, sample_rate, _byte_rate, _block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    if format_tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT):
+        raise ValueError(f"Unsupported WAV encoding {format_tag:#x}: {path.name}")
+
+    is_float = format_tag == _WAVE_FORMAT_IEEE_FLOAT
+    sample_width = bits // 8
+    if (is_float and sample_width not in (4, 8)) or (not is_float and sample_width not in (1, 2, 4)):
+        raise ValueError(f"Unsupported WAV sample width {bits} bits: {path.name}")
+
+    # Streamed WAVs may carry a placeholder size; trust the file length instead.
+    data_size = min(chunk_size, file_size - data_offset)
+    return WavLayout(
+        sample_rate=sample_rate,
+        channels=channels,
+        sample_width=sample_width,
+        is_float=is_float,
+        data_offset=data_offset,
+        data_size=data_size - data_size % (channels * sample_width),
+    )
+
+
+def map_pcm(path: Path, layout: WavLayout) -> Any:
+    """
+    Memory-map the PCM payload as a read-only (frames, channels) NumPy array.
+    """
+    import numpy as np
+
+    if layout.frames == 0:
+        return np.zeros((0, layout.channels), dtype=layout.numpy_dtype)
+    return np.memmap(
+        path,
+        dtype=layout.numpy_dtype,
+        mode="r",
+        offset=layout.data_offset,
+        shape=(layout.frames, layout.channels),
+    )
+
+
+def to_float(block: Any, layout: WavLayout) -> Any:
+    """
+    Convert a slice of mapped PCM to float32 in [-1.0, 1.0].
+    """
+    import numpy as np
+
+    samples = np.asarray(block, dtype=np.float32)
+    if not layout.is_float and layout.sample_width == 1:
+        samples -= 128.0
+    return samples / layout.full_scale if layout.full_scale != 1.0 else samples
+
+
+def from_float(samples: Any, layout: WavLayout) -> bytes:
+    """
+    Encode float32 samples in [-1.0, 1.0] back into `layout`'s PCM encoding.
+    """
+    import numpy as np
+
+    if layout.is_float:
+        return np.asarray(samples, dtype=layout.numpy_dtype).tobytes()
+    scaled = np.clip(samples, -1.0, 1.0) * (layout.full_scale - 1)
+    if layout.sample_width == 1:
+        scaled += 128.0
+    return np.rint(scaled).astype(layout.numpy_dtype).tobytes()
+
+
+def wav_header(layout: WavLayout, data_size: int) -> bytes:
+    """
+    Build a canonical 44-byte header for `data_size` bytes of PCM in `layout`'s format.
+    Open-ended streams pass the largest size the RIFF fields can hold.
+    """
+    format_tag = _WAVE_FORMAT_IEEE_FLOAT if layout.is_float else _WAVE_FORMAT_PCM
+    data_size = min(data_size, 0xFFFFFFFF - 36)
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        format_tag,
+        layout.channels,
+        layout.sample_rate,
+        layout.byte_rate,
+        layout.frame_size,
+        layout.sample_width * 8,
+        b"data",
+        data_size,
+    )
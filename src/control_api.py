@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import queue
+import socket
+from dataclasses import asdict
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from src.audio import (
+    AudioDownloadManager,
+    ContentHasher,
+    LibraryIndex,
+    MetadataCache,
+    MusicPlayerManager,
+    StreamFormatSelector,
+    is_valid_url,
+)
+from src.audio.downloader import PRIORITY_NAMES, PRIORITY_NORMAL
+from src.audio.music_player_manager import TRANSPORT_CHECK_SECONDS, VOLUME_CHECK_SECONDS
+from src.misc.bandwidth import BandwidthScheduler
+from src.misc.metrics import REGISTRY
+from src.sonos import SonosDeviceHandle
+from src.sqlite_connection import SqliteConnection
+
+API_PREFIX = "/api/"
+
+ApiResponse = Tuple[int, Dict[str, Any]]
+
+_EVENTS = REGISTRY.counter("sonos_thing_events_total", "Internal events by kind.", ["kind"])
+_STATUS_PUBLISHED = _EVENTS.labels("status")
+_STATUS_DROPPED = _EVENTS.labels("status_dropped")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _ip(address: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return None
+    # IPv4 clients of a dual-stack socket show up as ::ffff:a.b.c.d.
+    mapped = getattr(ip, "ipv4_mapped", None)
+    return mapped or ip
+
+
+def is_loopback(address: str) -> bool:
+    ip = _ip(address)
+    return ip is not None and ip.is_loopback
+
+
+def is_public_url(url: str) -> bool:
+    """
+    True for http(s) URLs whose host resolves only to public addresses, so
+    API clients cannot point the downloader at the LAN or this machine.
+    """
+    if not is_valid_url(url):
+        return False
+    host = urlsplit(url).hostname
+    if not host:
+        return False
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError):
+        return False
+    addresses = [_ip(info[4][0]) for info in infos]
+    return bool(addresses) and all(ip is not None and ip.is_global for ip in addresses)
+
+
+class StatusFeed:
+    """
+    Fan-out of status snapshots to streaming subscribers (one queue each).
+    Only snapshots that differ from the last one are published.
+    """
+
+    def __init__(self, backlog: int = 16) -> None:
+        self.backlog = backlog
+        self._subscribers: List[queue.Queue] = []
+        self._lock = Lock()
+        self._last: Optional[Dict[str, Any]] = None
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            self._subscribers.append(q)
+            if self._last is not None:
+                q.put_nowait(self._last)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def publish(self, status: Dict[str, Any]) -> bool:
+        with self._lock:
+            if status == self._last:
+                return False
+            self._last = status
+            subscribers = list(self._subscribers)
+        _STATUS_PUBLISHED.inc()
+        for q in subscribers:
+            try:
+                q.put_nowait(status)
+            except queue.Full:
+                # Slow client: drop its oldest snapshot, the newest matters most.
+                _STATUS_DROPPED.inc()
+                try:
+                    q.get_nowait()
+                    q.put_nowait(status)
+                except (queue.Empty, queue.Full):
+                    pass
+        return True
+
+
+class ControlAPI:
+    """
+    JSON control surface over the player, downloader and library, served by
+    DownloadHTTPServer under /api/. Usable without any GUI toolkit.
+    """
+
+    def __init__(
+        self,
+        player_manager: Optional[MusicPlayerManager] = None,
+        downloader: Optional[AudioDownloadManager] = None,
+        library: Optional[LibraryIndex] = None,
+        token: Optional[str] = None,
+    ) -> None:
+        self.player_manager = player_manager or MusicPlayerManager.instance()
+        self.downloader = downloader or AudioDownloadManager.instance()
+        self.library = library or LibraryIndex.instance()
+        self.token = token
+        self.feed = StatusFeed()
+        self._devices: Dict[str, SonosDeviceHandle] = {}
+        self._monitor_stop = Event()
+        self._monitor: Optional[Thread] = None
+        self._routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], ApiResponse]] = {
+            ("GET", "status"): lambda _body: (200, self.status()),
+            ("GET", "playlist"): self._get_playlist,
+            ("GET", "library"): self._get_library,
+            ("GET", "library/duplicates"): self._get_duplicates,
+            ("GET", "devices"): self._get_devices,
+            ("POST", "device"): self._select_device,
+            ("POST", "enqueue"): self._enqueue,
+            ("GET", "downloads"): lambda _body: (200, {"downloads": self._downloads()}),
+            ("POST", "downloads/cancel"): self._cancel_download,
+            ("POST", "preflight"): self._preflight,
+            ("POST", "playlist/add"): self._playlist_add,
+            ("POST", "playlist/remove"): self._playlist_remove,
+            ("POST", "playlist/play"): self._playlist_play,
+            ("POST", "volume"): self._volume,
+        }
+        for action in ("play", "pause", "stop", "next", "previous", "shuffle"):
+            self._routes[("POST", f"transport/{action}")] = lambda _body, a=action: self._transport(a)
+
+    # --- request entry points ---
+    def is_authorized(self, authorization: Optional[str], client_ip: str) -> bool:
+        """
+        With a token set, requests must carry it. Without one the API only
+        answers this machine: the server listens on the LAN for the speakers.
+        """
+        if self.token:
+            return hmac.compare_digest((authorization or "").encode(), f"Bearer {self.token}".encode())
+        return is_loopback(client_ip)
+
+    def handle(self, method: str, path: str, raw_body: bytes) -> ApiResponse:
+        route = path[len(API_PREFIX) :].strip("/")
+        handler = self._routes.get((method, route))
+        if handler is None:
+            known_paths = {r for _m, r in self._routes}
+            return (405, {"error": "method not allowed"}) if route in known_paths else (404, {"error": "not found"})
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+            if not isinstance(body, dict):
+                raise ApiError(400, "request body must be a JSON object")
+            result = handler(body)
+        except json.JSONDecodeError:
+            return 400, {"error": "invalid JSON"}
+        except ApiError as exc:
+            return exc.status, {"error": str(exc)}
+        except Exception as exc:
+            return 500, {"error": str(exc)}
+        if method == "POST":
+            self.publish_status()
+        return result
+
+    # --- status ---
+    def status(self) -> Dict[str, Any]:
+        pm = self.player_manager
+        current = pm.get_current_track()
+        try:
+            # Cached; the player re-reads it when it resyncs with the speaker.
+            volume = pm.get_volume(max_age=VOLUME_CHECK_SECONDS)
+        except Exception:
+            volume = None
+        return {
+            "device": pm.device_name,
+            "transport_state": pm.get_transport_state(max_age=TRANSPORT_CHECK_SECONDS),
+            "current_track": current.stem if current else None,
+            "next_track": self._stem(pm.peek_next()),
+            "refetching": self._stem(pm.refetching),
+            "shuffle": pm.shuffle,
+            "stream_quality": StreamFormatSelector.instance().current(pm.device_name) if pm.device_name else None,
+            "resume_at": self._resume_at(),
+            "position": self._position(),
+            "volume": volume,
+            "queue_length": len(pm.get_playlist()),
+            "downloads_pending": self.downloader.queue_depth,
+            "downloads": self._downloads(),
+            "download_rate_limit": BandwidthScheduler.instance().current_limit(),
+        }
+
+    def publish_status(self) -> None:
+        try:
+            self.feed.publish(self.status())
+        except Exception:
+            pass
+
+    def start_monitor(self, interval: float = 1.0) -> None:
+        """
+        Drive auto-advance and the status feed, replacing the GUI's poll loop.
+        """
+        if self._monitor:
+            return
+        self._monitor_stop.clear()
+        self._monitor = Thread(target=self._monitor_loop, args=(interval,), daemon=True)
+        self._monitor.start()
+
+    def stop_monitor(self) -> None:
+        self._monitor_stop.set()
+        if self._monitor:
+            self._monitor.join(timeout=2)
+            self._monitor = None
+
+    def _monitor_loop(self, interval: float) -> None:
+        while not self._monitor_stop.wait(interval):
+            try:
+                self.player_manager.poll_and_maybe_advance()
+            except Exception:
+                pass
+            self.publish_status()
+
+    # --- devices ---
+    def select_device(self, name: str) -> str:
+        handle = self._devices.get(name)
+        if handle is None:
+            self._refresh_devices()
+            handle = self._devices.get(name)
+        if handle is None:
+            raise ApiError(404, f"Device not found: {name}")
+        try:
+            handle.ungroup()
+        except RuntimeError as exc:
+            print(f"Selected {name} (ungroup failed: {exc})")
+        self.player_manager.set_device(handle)
+        try:
+            with SqliteConnection() as db:
+                db.set_default_device(name)
+        except Exception:
+            pass
+        return name
+
+    def select_default_device(self) -> Optional[str]:
+        """
+        Pick the persisted default device, or the first discovered one.
+        """
+        self._refresh_devices()
+        if not self._devices:
+            return None
+        try:
+            with SqliteConnection() as db:
+                preferred = db.get_default_device()
+        except Exception:
+            preferred = None
+        name = preferred if preferred in self._devices else sorted(self._devices)[0]
+        return self.select_device(name)
+
+    def _refresh_devices(self) -> List[str]:
+        handles = SonosDeviceHandle.discover()
+        self._devices = {h.player_name: h for h in handles}
+        return [h.player_name for h in handles]
+
+    # --- route handlers ---
+    def _get_playlist(self, _body: Dict[str, Any]) -> ApiResponse:
+        current = self.player_manager.get_current_track()
+        tracks = self.player_manager.get_playlist()
+        return 200, {
+            "tracks": [t.stem for t in tracks],
+            "current_track": current.stem if current else None,
+        }
+
+    def _get_library(self, _body: Dict[str, Any]) -> ApiResponse:
+        return 200, {"tracks": self.library.stems(), "evicted": [Path(p).stem for p in self._evicted_paths()]}
+
+    def _get_duplicates(self, _body: Dict[str, Any]) -> ApiResponse:
+        groups = ContentHasher.instance().duplicates()
+        return 200, {
+            "duplicates": [{"canonical": group[0].stem, "copies": [p.stem for p in group[1:]]} for group in groups]
+        }
+
+    def _get_devices(self, _body: Dict[str, Any]) -> ApiResponse:
+        return 200, {"devices": self._refresh_devices(), "selected": self.player_manager.device_name}
+
+    def _select_device(self, body: Dict[str, Any]) -> ApiResponse:
+        return 200, {"selected": self.select_device(self._require(body, "name"))}
+
+    def _enqueue(self, body: Dict[str, Any]) -> ApiResponse:
+        url = self._require(body, "url")
+        if not is_public_url(url):
+            raise ApiError(400, "url must be an http/https URL on a public host")
+        priority = self._priority(body.get("priority", PRIORITY_NORMAL))
+        job_id = self.downloader.enqueue(
+            url, on_complete=self._download_callback(bool(body.get("add_to_playlist"))), priority=priority
+        )
+        return 202, {"queued": url, "id": job_id, "priority": priority}
+
+    @staticmethod
+    def _priority(value: Any) -> int:
+        if isinstance(value, str) and value.lower() in PRIORITY_NAMES:
+            return PRIORITY_NAMES[value.lower()]
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        raise ApiError(400, f"priority must be one of {sorted(PRIORITY_NAMES)} or an integer")
+
+    def _preflight(self, body: Dict[str, Any]) -> ApiResponse:
+        urls = body.get("urls")
+        if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and is_public_url(u) for u in urls):
+            raise ApiError(400, "urls must be a non-empty list of http/https URLs on public hosts")
+        return 200, {"results": [asdict(r) for r in MetadataCache.instance().preflight(urls)]}
+
+    def _downloads(self) -> List[Dict[str, Any]]:
+        return [asdict(progress) for progress in self.downloader.jobs()]
+
+    def _cancel_download(self, body: Dict[str, Any]) -> ApiResponse:
+        job_id = body.get("id")
+        if not isinstance(job_id, int) or isinstance(job_id, bool):
+            raise ApiError(400, "missing 'id'")
+        if not self.downloader.cancel(job_id):
+            raise ApiError(404, "No unfinished download with that id.")
+        return 200, {"cancelled": job_id}
+
+    def resume_downloads(self) -> int:
+        """
+        Pick up downloads journaled by a previous run.
+        """
+        return self.downloader.resume_journal(on_complete=self._download_callback(add_to_playlist=False))
+
+    def _download_callback(self, add_to_playlist: bool) -> Callable[[str, Optional[Path], Optional[Exception]], None]:
+        def _on_complete(_url: str, path: Optional[Path], error: Optional[Exception]) -> None:
+            if path:
+                self.library.notify_created(path)
+                if add_to_playlist:
+                    try:
+                        self.player_manager.add_song(path)
+                    except Exception:
+                        pass
+            self.publish_status()
+
+        return _on_complete
+
+    def _playlist_add(self, body: Dict[str, Any]) -> ApiResponse:
+        track = self._resolve_track(self._require(body, "track"))
+        try:
+            self.player_manager.add_song(track)
+        except FileNotFoundError as exc:
+            raise ApiError(404, str(exc)) from exc
+        return 200, {"added": track.stem}
+
+    def _playlist_remove(self, body: Dict[str, Any]) -> ApiResponse:
+        track = self._resolve_track(self._require(body, "track"))
+        if not self.player_manager.remove_song(track):
+            raise ApiError(404, "Track not found in playlist.")
+        return 200, {"removed": track.stem}
+
+    def _playlist_play(self, body: Dict[str, Any]) -> ApiResponse:
+        track = self._resolve_track(self._require(body, "track"))
+        try:
+            played = self.player_manager.play_track(track)
+        except ValueError as exc:
+            raise ApiError(404, str(exc)) from exc
+        except RuntimeError as exc:
+            raise ApiError(409, str(exc)) from exc
+        return 200, {"playing": played.stem}
+
+    def _transport(self, action: str) -> ApiResponse:
+        pm = self.player_manager
+        try:
+            if action == "shuffle":
+                return 200, {"shuffle": pm.toggle_shuffle()}
+            if action in ("stop", "pause"):
+                getattr(pm, action)()
+                return 200, {"state": action}
+            track = getattr(pm, action)()
+        except RuntimeError as exc:
+            raise ApiError(409, str(exc)) from exc
+        return 200, {"playing": self._stem(track)}
+
+    def _volume(self, body: Dict[str, Any]) -> ApiResponse:
+        pm = self.player_manager
+        if pm.device is None:
+            raise ApiError(409, "No Sonos device selected.")
+        try:
+            if "volume" in body:
+                volume = pm.set_volume(int(body["volume"]))
+            elif "delta" in body:
+                volume = pm.change_volume(int(body["delta"]))
+            else:
+                raise ApiError(400, "expected 'volume' or 'delta'")
+        except (TypeError, ValueError) as exc:
+            raise ApiError(400, f"invalid volume: {exc}") from exc
+        return 200, {"volume": volume}
+
+    # --- helpers ---
+    def _resume_at(self) -> Optional[Dict[str, Any]]:
+        resume_at = self.player_manager.get_resume_point()
+        return {"track": resume_at[0].stem, "seconds": resume_at[1]} if resume_at else None
+
+    def _position(self) -> Optional[Dict[str, Any]]:
+        position = self.player_manager.get_position()
+        if position is None:
+            return None
+        duration = round(position.duration, 1) if position.duration is not None else None
+        return {"seconds": round(position.seconds, 1), "duration": duration, "playing": position.playing}
+
+    def _resolve_track(self, name: str) -> Path:
+        stem = Path(name).stem if name.lower().endswith(".wav") else name
+        path = self.library.path_for(stem)
+        if path is None:
+            # Evicted tracks can still be queued and played; they are re-fetched.
+            path = next((Path(p) for p in self._evicted_paths() if Path(p).stem == stem), None)
+        if path is None:
+            raise ApiError(404, f"Track not in library: {name}")
+        return path
+
+    @staticmethod
+    def _evicted_paths() -> List[str]:
+        try:
+            with SqliteConnection() as db:
+                return [r["path"] for r in db.get_evicted_songs() if r.get("source_url")]
+        except Exception:
+            return []
+
+    @staticmethod
+    def _require(body: Dict[str, Any], key: str) -> str:
+        value = body.get(key)
+        if not isinstance(value, str) or not value.strip():
+            raise ApiError(400, f"missing '{key}'")
+        return value.strip()
+
+    @staticmethod
+    def _stem(track: Optional[Path]) -> Optional[str]:
+        return Path(track).stem if track else None
@@ -1,24 +1,28 @@
+from bisect import bisect_left
 from pathlib import Path
-from typing import Iterable, List
+from typing import Dict, Iterable, List
 
 import customtkinter as ctk
 
+from src.audio import LibraryIndex
+from src.audio.library import scan_wav_files
+from src.misc.fs_watcher import CREATED, REMOVED, RENAMED, WatchEvent
+
 
 def list_wav_files(downloads_dir: Path) -> List[str]:
     """
     Return WAV filenames (without extension) from the downloads directory.
     """
-    if not downloads_dir.exists():
-        return []
-    return sorted(
-        [p.stem for p in downloads_dir.iterdir() if p.is_file() and p.suffix.lower() == ".wav"]
-    )
+    return [p.stem for p in scan_wav_files(downloads_dir)]
 
 
 class DownloadsListFrame(ctk.CTkFrame):
-    def __init__(self, master, downloads_dir: Path, **kwargs) -> None:
+    def __init__(self, master, downloads_dir: Path, library: LibraryIndex | None = None, **kwargs) -> None:
         super().__init__(master, **kwargs)
         self.downloads_dir = downloads_dir
+        self.library = library or LibraryIndex.instance()
+        self._names: List[str] = []
+        self._rows: Dict[str, ctk.CTkLabel] = {}
         header = ctk.CTkLabel(self, text="Available WAV files", font=("Segoe UI", 14))
         header.pack(pady=(4, 2))
 
@@ -28,23 +32,69 @@ class DownloadsListFrame(ctk.CTkFrame):
         self.refresh_button.pack(pady=(4, 8))
 
         self._empty_label = ctk.CTkLabel(self._list_container, text="No WAV files found.", text_color="gray", font=("Segoe UI", 11))
-        self.refresh()
+        # Subscribe first: the library may still be scanning in the background,
+        # and rows inserted twice are ignored.
+        self._unsubscribe = self.library.subscribe(self._on_library_event)
+        self._render_list(self.library.stems())
+
+    def destroy(self) -> None:
+        self._unsubscribe()
+        super().destroy()
 
     def _render_list(self, items: Iterable[str]) -> None:
         # Clear old items
         for child in self._list_container.winfo_children():
             child.destroy()
+        self._rows.clear()
 
-        entries = list(items)
-        if not entries:
-            self._empty_label = ctk.CTkLabel(self._list_container, text="No WAV files found.", text_color="gray", font=("Segoe UI", 11))
+        self._names = sorted(items)
+        self._empty_label = ctk.CTkLabel(self._list_container, text="No WAV files found.", text_color="gray", font=("Segoe UI", 11))
+        if not self._names:
             self._empty_label.pack(pady=6, padx=6)
             return
 
-        for name in entries:
-            row = ctk.CTkLabel(self._list_container, text=name, anchor="w", font=("Segoe UI", 11))
+        for name in self._names:
+            self._rows[name] = self._make_row(name)
+            self._rows[name].pack(fill="x", padx=6, pady=3)
+
+    def _make_row(self, name: str) -> ctk.CTkLabel:
+        return ctk.CTkLabel(self._list_container, text=name, anchor="w", font=("Segoe UI", 11))
+
+    def _insert_row(self, name: str) -> None:
+        if name in self._rows:
+            return
+        idx = bisect_left(self._names, name)
+        self._names.insert(idx, name)
+        row = self._make_row(name)
+        self._rows[name] = row
+        if idx + 1 < len(self._names):
+            row.pack(fill="x", padx=6, pady=3, before=self._rows[self._names[idx + 1]])
+        else:
             row.pack(fill="x", padx=6, pady=3)
+        self._empty_label.pack_forget()
+
+    def _remove_row(self, name: str) -> None:
+        row = self._rows.pop(name, None)
+        if row is None:
+            return
+        self._names.remove(name)
+        row.destroy()
+        if not self._names:
+            self._empty_label.pack(pady=6, padx=6)
+
+    def _on_library_event(self, event: WatchEvent) -> None:
+        # Library events arrive on the watcher thread; apply them on the Tk loop.
+        self.after(0, lambda: self._apply_library_event(event))
+
+    def _apply_library_event(self, event: WatchEvent) -> None:
+        if event.kind == CREATED:
+            self._insert_row(event.path.stem)
+        elif event.kind == REMOVED:
+            self._remove_row(event.path.stem)
+        elif event.kind == RENAMED and event.old_path is not None:
+            self._remove_row(event.old_path.stem)
+            self._insert_row(event.path.stem)
 
     def refresh(self) -> None:
-        files = list_wav_files(self.downloads_dir)
-        self._render_list(files)
+        # Differences surface through _on_library_event.
+        self.library.rescan()
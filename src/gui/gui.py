@@ -1,11 +1,67 @@
+from pathlib import Path
+
 import customtkinter as ctk
 
-from src.audio import AudioDownloadManager, DOWNLOADS_DIR, MusicPlayerManager, ensure_downloads_dir, is_valid_url
+from src.audio import (
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    AudioDownloadManager,
+    ContentHasher,
+    DOWNLOADS_DIR,
+    DownloadCancelled,
+    DownloadProgress,
+    LibraryIndex,
+    LibraryQuota,
+    MetadataCache,
+    MusicPlayerManager,
+    PreflightResult,
+    ensure_downloads_dir,
+    is_valid_url,
+)
+from src.audio.music_player_manager import TRANSPORT_CHECK_SECONDS
 from src.gui.audio_level_controls import AudioLevelControls
 from src.gui.downloads_list import DownloadsListFrame
 from src.gui.playlist_control_panel import PlaylistControlPanel
 from src.gui.playlist_manager import PlaylistManagerFrame
-from src.gui.sonos_selector import SonosSelectorFrame
+from src.gui.sonos_selector import SonosSelectorFrame, activate_default_device
+from src.misc.dependency_validation import ffmpeg_available
+from src.misc.startup import STARTUP
+from src.misc.tracing import traced
+from src.sonos import SonosDeviceHandle
+
+
+def _format_bytes(size: float) -> str:
+    if size < 1024:
+        return f"{size:.0f} B"
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
+def format_download_progress(progress: DownloadProgress, waiting: int = 0) -> str:
+    name = progress.title or progress.url
+    if progress.status == "processing":
+        text = f"Converting {name}..."
+    elif progress.status == "retrying":
+        text = f"Retrying {name} (attempt {progress.attempts}): {progress.error}"
+    elif progress.status == "queued":
+        text = f"Queued {name}"
+    else:
+        parts = []
+        if progress.fraction is not None:
+            parts.append(f"{progress.fraction:.0%} of {_format_bytes(progress.total_bytes or 0)}")
+        elif progress.downloaded_bytes:
+            parts.append(_format_bytes(progress.downloaded_bytes))
+        if progress.speed:
+            parts.append(f"at {_format_bytes(progress.speed)}/s")
+        if progress.eta is not None:
+            parts.append(f"ETA {int(progress.eta)}s")
+        text = f"Downloading {name}" + (": " + ", ".join(parts) if parts else "...")
+    if waiting:
+        text += f" ({waiting} queued)"
+    return text
 
 
 class SonosAppThing(ctk.CTk):
@@ -16,20 +72,46 @@ class SonosAppThing(ctk.CTk):
         self.resizable(False, False)
 
         self.url_var = ctk.StringVar()
+        self.play_next_var = ctk.BooleanVar(value=False)
         self.status_var = ctk.StringVar(value="Enter a URL to download audio as WAV.")
         self.downloader = AudioDownloadManager.instance()
         self.player_manager = MusicPlayerManager.instance()
+        self.library = LibraryIndex.instance()
         self.downloads_list: DownloadsListFrame | None = None
         self.playlist_frame: PlaylistManagerFrame | None = None
         self.control_panel: PlaylistControlPanel | None = None
+        self.audio_levels: AudioLevelControls | None = None
+        self.sonos_frame: SonosSelectorFrame | None = None
+        self._discovered: list[SonosDeviceHandle] | None = None
 
+        STARTUP.expect_window()
         ensure_downloads_dir()
+        LibraryQuota.instance().enforce_async()
         if stream_base_url:
             self.player_manager.set_stream_base_url(stream_base_url)
+        self.player_manager.restore_session()
         self._last_playback_signature: tuple | None = None
+        self._active_download: int | None = None
+        self._unsubscribe_progress = self.downloader.subscribe(
+            lambda progress: self.after(0, self._on_download_progress, progress)
+        )
 
         self._build_content()
+        resumed = self.downloader.resume_journal(on_complete=self._on_download_complete)
+        if resumed:
+            self.status_var.set(f"Resuming {resumed} unfinished download(s)...")
         self._schedule_polling()
+        self.after_idle(self._on_first_idle)
+        STARTUP.mark("init")
+
+    def _on_first_idle(self) -> None:
+        # Slow start-up work starts once the window is drawn and runs off the
+        # Tk thread; "ready" is marked when it has all finished.
+        self.update_idletasks()
+        STARTUP.run_in_background("library", self._start_library)
+        STARTUP.run_in_background("discovery", self._discover_devices)
+        STARTUP.run_in_background("ffmpeg", self._probe_ffmpeg)
+        STARTUP.mark("window")
 
     def _build_content(self) -> None:
         header = ctk.CTkLabel(self, text="Sonos Thing", font=("Segoe UI", 22))
@@ -39,8 +121,9 @@ class SonosAppThing(ctk.CTk):
         self.tabs.pack(fill="both", expand=True, padx=16, pady=(0, 12))
 
         download_tab = self.tabs.add("Audio download")
-        device_tab = self.tabs.add("Device")
-        play_tab = self.tabs.add("Play")
+        # The other tabs are filled in when first opened.
+        self.tabs.add("Device")
+        self.tabs.add("Play")
 
         # Download tab
         entry_frame = ctk.CTkFrame(download_tab)
@@ -62,6 +145,18 @@ class SonosAppThing(ctk.CTk):
         )
         submit_button.pack(side="right", padx=(0, 16), pady=12)
 
+        play_next_check = ctk.CTkCheckBox(entry_frame, text="Play next", variable=self.play_next_var, width=90)
+        play_next_check.pack(side="right", padx=(0, 8), pady=12)
+
+        self.cancel_button = ctk.CTkButton(
+            download_tab,
+            text="Cancel download",
+            command=self._handle_cancel,
+            width=140,
+            state="disabled",
+        )
+        self.cancel_button.pack(anchor="w", padx=24, pady=(0, 4))
+
         status_label = ctk.CTkLabel(
             download_tab,
             textvariable=self.status_var,
@@ -85,11 +180,17 @@ class SonosAppThing(ctk.CTk):
         )
         downloads_path_label.pack(fill="x", padx=24, pady=(0, 8))
 
-        # Device tab
-        sonos_frame = SonosSelectorFrame(device_tab, player_manager=self.player_manager)
-        sonos_frame.pack(fill="x", padx=24, pady=(24, 12))
+        close_button = ctk.CTkButton(self, text="Close", command=self.destroy)
+        close_button.pack(pady=(0, 12))
+
+    def _build_device_tab(self) -> None:
+        self.sonos_frame = SonosSelectorFrame(
+            self.tabs.tab("Device"), player_manager=self.player_manager, devices=self._discovered
+        )
+        self.sonos_frame.pack(fill="x", padx=24, pady=(24, 12))
 
-        # Play tab
+    def _build_play_tab(self) -> None:
+        play_tab = self.tabs.tab("Play")
         self.playlist_frame = PlaylistManagerFrame(
             play_tab,
             downloads_dir=DOWNLOADS_DIR,
@@ -107,8 +208,27 @@ class SonosAppThing(ctk.CTk):
         self.audio_levels = AudioLevelControls(play_tab, player_manager=self.player_manager)
         self.audio_levels.pack(fill="x", padx=24, pady=(0, 12))
 
-        close_button = ctk.CTkButton(self, text="Close", command=self.destroy)
-        close_button.pack(pady=(0, 12))
+    # --- background start-up ---
+    def _start_library(self) -> None:
+        self.library.start()
+        # Hashing and duplicate checks run on their own; they don't hold up "ready".
+        ContentHasher.instance().start(self.library)
+
+    def _discover_devices(self) -> None:
+        handles = SonosDeviceHandle.discover()
+        self.after(0, self._apply_discovered, handles)
+
+    def _apply_discovered(self, handles: list[SonosDeviceHandle]) -> None:
+        self._discovered = handles
+        if self.sonos_frame:
+            self.sonos_frame.apply_devices(handles, error=None)
+        else:
+            activate_default_device(handles, self.player_manager)
+
+    def _probe_ffmpeg(self) -> None:
+        available, _descriptor = ffmpeg_available()
+        if not available:
+            self.after(0, self.status_var.set, "ffmpeg was not found on PATH; downloads cannot be converted to WAV.")
 
     def _handle_submit(self) -> None:
         url = self.url_var.get().strip()
@@ -116,26 +236,56 @@ class SonosAppThing(ctk.CTk):
             self.status_var.set("Please enter a valid http/https URL.")
             return
 
-        self.status_var.set("Downloading...")
-        self.downloader.enqueue(url, on_complete=self._on_download_complete)
+        self.status_var.set("Checking URL...")
+        priority = PRIORITY_HIGH if self.play_next_var.get() else PRIORITY_NORMAL
+        # The preflight result is cached, so the download does not extract again.
+        MetadataCache.instance().preflight_async(
+            url, on_result=lambda result: self.after(0, self._on_preflight, url, priority, result)
+        )
+
+    def _on_preflight(self, url: str, priority: int, result: PreflightResult) -> None:
+        if result.existing_path:
+            self.status_var.set(f"Already downloaded: {Path(result.existing_path).name}")
+            self.url_var.set("")
+            return
+        self.status_var.set(f"Downloading {result.title}..." if result.title else "Downloading...")
+        self.downloader.enqueue(url, on_complete=self._on_download_complete, priority=priority)
+
+    def _handle_cancel(self) -> None:
+        if self._active_download is not None:
+            self.downloader.cancel(self._active_download)
+
+    def _on_download_progress(self, progress: DownloadProgress) -> None:
+        if progress.status in ("done", "failed", "cancelled"):
+            if progress.job_id == self._active_download:
+                self._active_download = None
+                self.cancel_button.configure(state="disabled")
+            return
+        if progress.status == "queued" and self._active_download is not None:
+            return
+        self._active_download = progress.job_id
+        self.cancel_button.configure(state="normal")
+        waiting = sum(1 for p in self.downloader.jobs() if p.status in ("queued", "retrying"))
+        if progress.status == "queued":
+            waiting -= 1
+        self.status_var.set(format_download_progress(progress, waiting=max(0, waiting)))
 
     def _on_download_complete(self, url: str, path, error) -> None:
         # Run UI updates on the main thread.
         def _update_ui() -> None:
-            if error:
-                self.status_var.set(f"Download failed; removed from queue. ({error})")
+            if isinstance(error, DownloadCancelled):
+                self.status_var.set("Download cancelled.")
+            elif error:
+                self.status_var.set(f"Download failed after retries; removed from queue. ({error})")
             elif path:
                 self.status_var.set(f"Saved to downloads/{path.name}")
                 self.url_var.set("")
             else:
                 self.status_var.set("Download finished.")
 
-            if self.downloads_list:
-                self.downloads_list.refresh()
-            if self.playlist_frame:
-                self.playlist_frame.refresh_available()
-                self.playlist_frame.refresh_playlist()
-
+        # The list frames follow the library index; no rescan needed.
+        if path:
+            self.library.notify_created(path)
         self.after(0, _update_ui)
 
     def _start_http_server(self) -> None:
@@ -148,11 +298,15 @@ class SonosAppThing(ctk.CTk):
     def _on_tab_change(self, tab_name: str | None = None) -> None:
         # CustomTkinter tabview command provides no args; use current selection when absent.
         current = tab_name or (self.tabs.get() if hasattr(self, "tabs") else None)
+        if current == "Device" and self.sonos_frame is None:
+            self._build_device_tab()
         if current == "Play":
-            if self.playlist_frame:
-                self.playlist_frame.refresh_available()
-                self.playlist_frame.refresh_playlist()
-            if hasattr(self, "audio_levels") and self.audio_levels:
+            if self.playlist_frame is None:
+                # A fresh frame reads the current state; nothing to refresh.
+                self._build_play_tab()
+                return
+            self.playlist_frame.refresh_playlist()
+            if self.audio_levels:
                 try:
                     self.audio_levels.refresh_volume()
                 except Exception:
@@ -161,18 +315,21 @@ class SonosAppThing(ctk.CTk):
     def _schedule_polling(self) -> None:
         self.after(1000, self._poll_playback)
 
+    @traced("gui._poll_playback")
     def _poll_playback(self) -> None:
         current_track = None
         transport_state = None
         try:
             self.player_manager.poll_and_maybe_advance()
             current_track = self.player_manager.get_current_track()
-            transport_state = self.player_manager.get_transport_state()
+            transport_state = self.player_manager.get_transport_state(max_age=TRANSPORT_CHECK_SECONDS)
         except Exception:
             pass
+        if self.control_panel:
+            self.control_panel.refresh_position()
 
         signature = (
-            str(current_track.resolve()) if current_track else None,
+            str(current_track) if current_track else None,
             transport_state,
         )
         if signature != self._last_playback_signature:
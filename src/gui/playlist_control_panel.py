@@ -6,6 +6,11 @@ import customtkinter as ctk
 from src.audio import MusicPlayerManager
 
 
+def _format_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
 class PlaylistControlPanel(ctk.CTkFrame):
     def __init__(
         self,
@@ -46,9 +51,38 @@ class PlaylistControlPanel(ctk.CTkFrame):
             hover_color="#3c3c3c",
         )
         self.shuffle_btn.grid(row=0, column=5, padx=6, pady=6, sticky="ew")
+        if self.player_manager.shuffle:
+            self.shuffle_btn.configure(fg_color="#1db954", hover_color="#169b43")
+        resume_at = self.player_manager.get_resume_point()
+        if resume_at:
+            minutes, seconds = divmod(int(resume_at[1]), 60)
+            self.status_var.set(f"Play resumes {resume_at[0].stem} at {minutes}:{seconds:02d}.")
 
         status_label = ctk.CTkLabel(self, textvariable=self.status_var, text_color="gray", font=("Segoe UI", 11))
-        status_label.pack(pady=(2, 8))
+        status_label.pack(pady=(2, 0))
+
+        self.position_var = ctk.StringVar(value="")
+        position_label = ctk.CTkLabel(self, textvariable=self.position_var, text_color="gray", font=("Segoe UI", 11))
+        position_label.pack(pady=(0, 8))
+        self.refresh_position()
+
+    def refresh_position(self) -> None:
+        """
+        Show the position in the current track. Read from the player's local
+        clock, so calling this every second costs no speaker round trips.
+        """
+        refetching = self.player_manager.refetching
+        if refetching is not None:
+            self.position_var.set(f"Re-fetching {refetching.stem}...")
+            return
+        position = self.player_manager.get_position()
+        if position is None:
+            self.position_var.set("")
+            return
+        text = _format_time(position.seconds)
+        if position.duration is not None:
+            text += f" / {_format_time(position.duration)}  (-{_format_time(position.remaining)})"
+        self.position_var.set(text if position.playing else f"{text}  paused")
 
     def _play(self) -> None:
         try:
@@ -58,11 +92,16 @@ class PlaylistControlPanel(ctk.CTkFrame):
             return
 
         if track:
-            self.status_var.set(f"Playing {Path(track).stem}")
+            self.status_var.set(self._playing_text(track))
         else:
             self.status_var.set("No track in playlist.")
         self._notify(track)
 
+    def _playing_text(self, track: Path) -> str:
+        if self.player_manager.refetching == track:
+            return f"Re-fetching {Path(track).stem} before it plays..."
+        return f"Playing {Path(track).stem}"
+
     def _stop(self) -> None:
         self.player_manager.stop()
         self.status_var.set("Stopped.")
@@ -81,7 +120,7 @@ class PlaylistControlPanel(ctk.CTkFrame):
             return
 
         if track:
-            self.status_var.set(f"Playing {Path(track).stem}")
+            self.status_var.set(self._playing_text(track))
         else:
             self.status_var.set("No next track.")
         self._notify(track)
@@ -94,7 +133,7 @@ class PlaylistControlPanel(ctk.CTkFrame):
             return
 
         if track:
-            self.status_var.set(f"Playing {Path(track).stem}")
+            self.status_var.set(self._playing_text(track))
         else:
             self.status_var.set("No previous track.")
         self._notify(track)
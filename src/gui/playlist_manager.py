@@ -1,16 +1,29 @@
+from bisect import insort
 from pathlib import Path
+from typing import List
 
 import customtkinter as ctk
 
-from src.audio import MusicPlayerManager
-from src.gui.downloads_list import list_wav_files
+from src.audio import LibraryIndex, MusicPlayerManager
+from src.audio.music_player_manager import TRANSPORT_CHECK_SECONDS
+from src.misc.fs_watcher import CREATED, REMOVED, RENAMED, WatchEvent
+from src.misc.tracing import traced
 
 
 class PlaylistManagerFrame(ctk.CTkFrame):
-    def __init__(self, master, downloads_dir: Path, player_manager: MusicPlayerManager, **kwargs) -> None:
+    def __init__(
+        self,
+        master,
+        downloads_dir: Path,
+        player_manager: MusicPlayerManager,
+        library: LibraryIndex | None = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         self.downloads_dir = downloads_dir
         self.player_manager = player_manager
+        self.library = library or LibraryIndex.instance()
+        self._available: List[str] = []
 
         self.selection_var = ctk.StringVar()
         self.status_var = ctk.StringVar(value="Add WAVs from downloads to the playlist queue.")
@@ -35,9 +48,18 @@ class PlaylistManagerFrame(ctk.CTkFrame):
 
         self.refresh_available()
         self.refresh_playlist()
+        self._unsubscribe = self.library.subscribe(self._on_library_event)
+
+    def destroy(self) -> None:
+        self._unsubscribe()
+        super().destroy()
 
     def refresh_available(self) -> None:
-        options = list_wav_files(self.downloads_dir)
+        self._available = self.library.stems()
+        self._apply_available()
+
+    def _apply_available(self) -> None:
+        options = self._available
         self.selector.configure(values=options)
         if options:
             if self.selection_var.get() not in options:
@@ -47,23 +69,45 @@ class PlaylistManagerFrame(ctk.CTkFrame):
             self.selection_var.set("")
             self.add_button.configure(state="disabled")
 
+    def _on_library_event(self, event: WatchEvent) -> None:
+        # Library events arrive on the watcher thread; apply them on the Tk loop.
+        self.after(0, lambda: self._apply_library_event(event))
+
+    def _apply_library_event(self, event: WatchEvent) -> None:
+        if event.kind == CREATED:
+            if event.path.stem not in self._available:
+                insort(self._available, event.path.stem)
+        elif event.kind == REMOVED:
+            if event.path.stem in self._available:
+                self._available.remove(event.path.stem)
+        elif event.kind == RENAMED and event.old_path is not None:
+            if event.old_path.stem in self._available:
+                self._available.remove(event.old_path.stem)
+            if event.path.stem not in self._available:
+                insort(self._available, event.path.stem)
+            if self.player_manager.rename_song(event.old_path, event.path):
+                self.refresh_playlist()
+        self._apply_available()
+
     def refresh_playlist(self) -> None:
         playlist = self.player_manager.get_playlist()
         self._render_playlist(playlist)
 
+    @traced("gui._render_playlist")
     def _render_playlist(self, playlist) -> None:
         for child in self.playlist_container.winfo_children():
             child.destroy()
 
         current = self.player_manager.get_current_track()
-        transport_state = self.player_manager.get_transport_state()
+        transport_state = self.player_manager.get_transport_state(max_age=TRANSPORT_CHECK_SECONDS)
         if not playlist:
             empty = ctk.CTkLabel(self.playlist_container, text="Playlist is empty.", text_color="gray", font=("Segoe UI", 11))
             empty.pack(pady=6, padx=6)
             return
 
         for track in playlist:
-            is_current = bool(current and track.resolve() == current.resolve())
+            # Catalog paths are canonical; no need to resolve them.
+            is_current = track == current
             is_playing = is_current and transport_state == "PLAYING"
             row_color = "#2fa572" if is_playing else "#2b2b2b"
             row = ctk.CTkFrame(self.playlist_container, fg_color=row_color)
@@ -103,7 +147,7 @@ class PlaylistManagerFrame(ctk.CTkFrame):
             self.status_var.set("Select a WAV from downloads first.")
             return
 
-        track_path = self.downloads_dir / f"{selection}.wav"
+        track_path = self.library.path_for(selection) or self.downloads_dir / f"{selection}.wav"
         try:
             self.player_manager.add_song(track_path)
             self.status_var.set(f"Added to playlist: {selection}")
@@ -124,7 +168,10 @@ class PlaylistManagerFrame(ctk.CTkFrame):
     def _handle_play(self, path: Path) -> None:
         try:
             track = self.player_manager.play_track(path)
-            self.status_var.set(f"Playing {track.stem}")
+            if self.player_manager.refetching == track:
+                self.status_var.set(f"Re-fetching {track.stem} before it plays...")
+            else:
+                self.status_var.set(f"Playing {track.stem}")
         except Exception as exc:
             self.status_var.set(f"Cannot play track: {exc}")
         self.refresh_playlist()
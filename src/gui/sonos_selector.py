@@ -1,15 +1,76 @@
 from threading import Thread
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import customtkinter as ctk
 
 from src.audio import MusicPlayerManager
+from src.misc.tracing import traced
 from src.sqlite_connection import SqliteConnection
 from src.sonos import SonosDeviceHandle
 
 
+def _load_default_device() -> str | None:
+    try:
+        with SqliteConnection() as db:
+            return db.get_default_device()
+    except Exception:
+        return None
+
+
+def _persist_default_device(player_name: str) -> None:
+    try:
+        with SqliteConnection() as db:
+            db.set_default_device(player_name)
+    except Exception:
+        # Non-fatal; UI should still continue.
+        pass
+
+
+def choose_device(handles: List[SonosDeviceHandle], current: str | None = None) -> Optional[SonosDeviceHandle]:
+    """
+    The saved default device if present, else `current`, else the first.
+    """
+    by_name = {h.player_name: h for h in handles}
+    for name in (_load_default_device(), current):
+        if name in by_name:
+            return by_name[name]
+    return handles[0] if handles else None
+
+
+def activate_device(handle: SonosDeviceHandle, player_manager: MusicPlayerManager) -> str | None:
+    """
+    Ungroup the device, hand it to the player and remember it as the default.
+    Returns a warning if ungrouping failed.
+    """
+    warning = None
+    try:
+        handle.ungroup()
+    except Exception as exc:
+        warning = f"ungroup failed: {exc}"
+    player_manager.set_device(handle)
+    _persist_default_device(handle.player_name)
+    return warning
+
+
+def activate_default_device(handles: List[SonosDeviceHandle], player_manager: MusicPlayerManager) -> None:
+    """
+    Select a device after discovery when the Device tab has not been opened.
+    """
+    if player_manager.device_name:
+        return
+    handle = choose_device(handles)
+    if handle:
+        activate_device(handle, player_manager)
+
+
 class SonosSelectorFrame(ctk.CTkFrame):
-    def __init__(self, master, player_manager: MusicPlayerManager, **kwargs) -> None:
+    def __init__(
+        self,
+        master,
+        player_manager: MusicPlayerManager,
+        devices: Optional[List[SonosDeviceHandle]] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(master, **kwargs)
         self.player_manager = player_manager
         self.devices: List[SonosDeviceHandle] = []
@@ -39,8 +100,11 @@ class SonosSelectorFrame(ctk.CTkFrame):
         status_label = ctk.CTkLabel(self, textvariable=self.status_var, text_color="gray", font=("Segoe UI", 11))
         status_label.pack(pady=(2, 6), padx=8, anchor="w")
 
-        # Initial fetch
-        self._refresh_devices(initial=True)
+        if devices is None:
+            self._refresh_devices(initial=True)
+        else:
+            # Discovered in the background at start-up; don't select again.
+            self._show_devices(devices, error=None)
 
     def _refresh_devices(self, initial: bool = False) -> None:
         self.status_var.set("Discovering Sonos devices..." if initial else "Syncing devices...")
@@ -51,28 +115,33 @@ class SonosSelectorFrame(ctk.CTkFrame):
             handles = SonosDeviceHandle.discover()
         except Exception as exc:
             error_message = str(exc)
-            self.after(0, lambda msg=error_message: self._apply_devices([], error=msg))
+            self.after(0, lambda msg=error_message: self.apply_devices([], error=msg))
+            return
+        self.after(0, lambda: self.apply_devices(handles, error=None))
+
+    @traced("gui._apply_devices")
+    def apply_devices(self, handles: List[SonosDeviceHandle], error: str | None) -> None:
+        if not self._show_devices(handles, error):
             return
-        self.after(0, lambda: self._apply_devices(handles, error=None))
+        chosen = choose_device(handles, current=self.selection_var.get())
+        self.selection_var.set(chosen.player_name)
+        self._apply_selection(chosen.player_name)
 
-    def _apply_devices(self, handles: List[SonosDeviceHandle], error: str | None) -> None:
+    def _show_devices(self, handles: List[SonosDeviceHandle], error: str | None) -> bool:
         self.devices = handles
         self.device_lookup = {h.player_name: h for h in handles}
         options = [h.player_name for h in handles]
 
         self.device_select.configure(values=options)
 
-        if options:
-            preferred = self._load_default_device()
-            chosen = preferred if preferred in options else None
-            if not chosen:
-                chosen = self.selection_var.get() if self.selection_var.get() in options else options[0]
-            self.selection_var.set(chosen)
-            self.status_var.set(f"Found {len(options)} device(s).")
-            self._apply_selection(chosen)
-        else:
+        if not options:
             self.selection_var.set("")
             self.status_var.set(error or "No Sonos devices found. Click Sync to retry.")
+            return False
+        if self.player_manager.device_name in options:
+            self.selection_var.set(self.player_manager.device_name)
+        self.status_var.set(f"Found {len(options)} device(s).")
+        return True
 
     def _on_device_selected(self, selection: str) -> None:
         if selection:
@@ -81,25 +150,5 @@ class SonosSelectorFrame(ctk.CTkFrame):
     def _apply_selection(self, player_name: str) -> None:
         handle = self.device_lookup.get(player_name)
         if handle:
-            try:
-                handle.ungroup()
-            except Exception as exc:
-                self.status_var.set(f"Selected {player_name} (ungroup failed: {exc})")
-            self.player_manager.set_device(handle)
-            self._persist_default_device(player_name)
-            self.status_var.set(f"Selected: {player_name}")
-
-    def _load_default_device(self) -> str | None:
-        try:
-            with SqliteConnection() as db:
-                return db.get_default_device()
-        except Exception:
-            return None
-
-    def _persist_default_device(self, player_name: str) -> None:
-        try:
-            with SqliteConnection() as db:
-                db.set_default_device(player_name)
-        except Exception:
-            # Non-fatal; UI should still continue.
-            pass
+            warning = activate_device(handle, self.player_manager)
+            self.status_var.set(f"Selected {player_name} ({warning})" if warning else f"Selected: {player_name}")
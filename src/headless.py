@@ -0,0 +1,84 @@
+import signal
+from threading import Event
+
+from src.audio import ContentHasher, LibraryIndex, LibraryQuota, MusicPlayerManager, ensure_downloads_dir
+from src.audio.crossfade_renderer import renderer_from_settings
+from src.control_api import ControlAPI
+from src.misc.dependency_validation import ffmpeg_available
+from src.misc.http_server import start_download_server
+from src.misc.startup import STARTUP
+from src.sqlite_connection import SqliteConnection
+
+
+def _load_api_token() -> str | None:
+    try:
+        with SqliteConnection() as db:
+            return db.get_setting("api_token")
+    except Exception:
+        return None
+
+
+def _select_device_in_background(api: ControlAPI) -> None:
+    def _worker() -> None:
+        try:
+            name = api.select_default_device()
+        except Exception as exc:
+            print(f"Device selection failed: {exc}")
+            return
+        print(f"Selected device: {name}" if name else "No Sonos devices found; select one via POST /api/device.")
+        api.publish_status()
+
+    STARTUP.run_in_background("discovery", _worker)
+
+
+def _start_library(library: LibraryIndex) -> None:
+    library.start()
+    # Hashing and duplicate checks run on their own; they don't hold up "ready".
+    ContentHasher.instance().start(library)
+
+
+def _probe_ffmpeg() -> None:
+    available, descriptor = ffmpeg_available()
+    print(f"ffmpeg: {descriptor}" if available else "ffmpeg was not found on PATH; downloads cannot be converted to WAV.")
+
+
+def run_headless(host: str = "0.0.0.0", port: int = 0) -> None:
+    """
+    Run the stream server, downloader and player without a display. Control
+    goes through the JSON API on the stream server's port.
+    """
+    STARTUP.begin("init")
+    downloads_dir = ensure_downloads_dir()
+    library = LibraryIndex.instance()
+    STARTUP.run_in_background("library", lambda: _start_library(library))
+    STARTUP.run_in_background("ffmpeg", _probe_ffmpeg)
+    LibraryQuota.instance().enforce_async()
+
+    player_manager = MusicPlayerManager.instance()
+    player_manager.restore_session()
+    token = _load_api_token()
+    api = ControlAPI(player_manager=player_manager, library=library, token=token)
+    if not token:
+        print("No api_token setting: the control API only answers requests from this machine.")
+    renderer = renderer_from_settings()
+    server = start_download_server(str(downloads_dir), host=host, port=port, renderer=renderer, control_api=api)
+    if server.base_url:
+        player_manager.set_stream_base_url(server.base_url)
+        player_manager.set_stream_url_resolver(server.base_url_for)
+    if renderer:
+        player_manager.set_stream_renderer(renderer)
+
+    api.resume_downloads()
+    _select_device_in_background(api)
+    api.start_monitor()
+    print(f"Headless mode: control API at {server.base_url}/api/status (events: /api/events)")
+    STARTUP.end("init")
+
+    stop = Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda _signum, _frame: stop.set())
+    stop.wait()
+
+    api.stop_monitor()
+    server.stop()
+    library.stop()
@@ -1,4 +1,4 @@
-from src.misc.dependency_validation import ffmpeg_available
+from src.misc.dependency_validation import ffmpeg_available, numpy_available
 from src.misc.pathing import DOWNLOADS_DIR, ROOT_DIR, ensure_downloads_dir
 
-__all__ = ["ffmpeg_available", "DOWNLOADS_DIR", "ROOT_DIR", "ensure_downloads_dir"]
+__all__ = ["ffmpeg_available", "numpy_available", "DOWNLOADS_DIR", "ROOT_DIR", "ensure_downloads_dir"]
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from src.misc.metrics import REGISTRY
+from src.sqlite_connection import SqliteConnection
+
+UPLINK_SETTING = "uplink_bytes_per_sec"
+
+# Downloads never drop below this while streams run, so they still finish.
+MIN_DOWNLOAD_RATE = 64 * 1024
+# Where the limit starts when a stream begins and no uplink capacity is set.
+START_DOWNLOAD_RATE = 1024 * 1024
+# Additive increase per control step while every stream keeps up.
+RATE_STEP = 256 * 1024
+# A stream is starved when it gets less than this share of its playback rate.
+STARVED_RATIO = 0.9
+# Share of a configured uplink that streams and downloads may use together.
+UPLINK_HEADROOM = 0.9
+
+_CONTROL_INTERVAL = 0.5
+_WINDOW_SECONDS = 2.0
+# New connections burst to fill the speaker's buffer; judge them after this.
+_WARMUP_SECONDS = 3.0
+_MAX_SLEEP = 0.25
+# Longest single wait per progress callback; any remaining debt carries over,
+# so cancellation hooks further down the chain still run regularly.
+_MAX_WAIT = 1.0
+# Starved for this long in one connection counts as a stall for the client.
+STALL_SECONDS = 1.0
+# Weight of the newest connection in a client's capacity estimate.
+_CAPACITY_WEIGHT = 0.3
+# Shorter connections say little about the link and are not recorded.
+_MIN_JUDGED_BYTES = 256 * 1024
+
+_ACTIVE_STREAMS = REGISTRY.gauge("sonos_thing_active_streams", "Audio streams being served to speakers.")
+_DOWNLOAD_LIMIT = REGISTRY.gauge(
+    "sonos_thing_download_rate_limit_bytes", "Current download rate limit in bytes/s (0 when unlimited)."
+)
+_THROTTLED_SECONDS = REGISTRY.counter(
+    "sonos_thing_download_throttled_seconds_total", "Time downloads spent waiting for the rate limiter."
+)
+
+
+@dataclass
+class ClientDelivery:
+    """
+    How well stream connections to one client IP have been delivered.
+    """
+
+    client: str
+    # Smoothed peak throughput per connection (bytes/s): what the link can
+    # carry, seen while the client fills its buffer.
+    capacity: float = 0.0
+    # Connections that stalled (starved for STALL_SECONDS or more).
+    stalls: int = 0
+    connections: int = 0
+    updated_at: float = 0.0
+
+
+class StreamMeter:
+    """
+    Byte counter for one stream connection, with throughput over a short
+    sliding window, its peak, and time spent below the playback rate.
+    """
+
+    def __init__(
+        self, scheduler: "BandwidthScheduler", required_rate: Optional[float], client: Optional[str] = None
+    ) -> None:
+        self.scheduler = scheduler
+        self.required_rate = required_rate
+        self.client = client
+        self.opened_at = time.monotonic()
+        self.total = 0
+        self.peak = 0.0
+        self.starved_time = 0.0
+        self._samples: Deque[Tuple[float, int]] = deque([(self.opened_at, 0)])
+
+    def add(self, size: int) -> None:
+        self.total += size
+        now = time.monotonic()
+        if now - self._samples[-1][0] >= _CONTROL_INTERVAL:
+            self.sample(now)
+
+    def sample(self, now: float) -> None:
+        previous = self._samples[-1][0]
+        self._samples.append((now, self.total))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= _WINDOW_SECONDS:
+            self._samples.popleft()
+        rate = self.throughput()
+        if rate is not None:
+            self.peak = max(self.peak, rate)
+        if self.starved(now):
+            self.starved_time += now - previous
+
+    def throughput(self) -> Optional[float]:
+        (start, start_bytes), (end, end_bytes) = self._samples[0], self._samples[-1]
+        if end - start < _CONTROL_INTERVAL:
+            return None
+        return (end_bytes - start_bytes) / (end - start)
+
+    def starved(self, now: float) -> bool:
+        if not self.required_rate or now - self.opened_at < _WARMUP_SECONDS:
+            return False
+        rate = self.throughput()
+        return rate is not None and rate < self.required_rate * STARVED_RATIO
+
+    def close(self) -> None:
+        self.scheduler.close_stream(self)
+
+    def __enter__(self) -> "StreamMeter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class BandwidthScheduler:
+    """
+    Singleton that gives stream connections priority over downloads. While
+    streams run, downloads share a token bucket whose rate follows AIMD:
+    halve it when any stream falls behind its playback rate, raise it step
+    by step while all keep up. If `uplink_bytes_per_sec` is set (read at
+    start-up), the limit also stays under what the streams leave of it.
+    No streams, no limit.
+    """
+
+    _instance: Optional["BandwidthScheduler"] = None
+    _instance_lock = Lock()
+
+    def __init__(self, uplink: Optional[float] = None) -> None:
+        self._lock = Lock()
+        self._streams: Set[StreamMeter] = set()
+        # Read here, not on first use: _ceiling runs with the lock held.
+        self._uplink = uplink if uplink is not None else self._load_uplink()
+        self._limit: Optional[float] = None
+        self._last_control = 0.0
+        self._last_decrease = 0.0
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._clients: Dict[str, ClientDelivery] = {}
+        _ACTIVE_STREAMS.set_function(lambda: len(self._streams))
+        _DOWNLOAD_LIMIT.set_function(lambda: self._limit or 0)
+
+    @classmethod
+    def instance(cls) -> "BandwidthScheduler":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+        return cls._instance
+
+    # --- streams ---
+    def open_stream(self, required_rate: Optional[float] = None, client: Optional[str] = None) -> StreamMeter:
+        """
+        Register a stream connection. `required_rate` is its playback rate in
+        bytes/s, if known; only streams with one can signal starvation.
+        With a `client` IP, its delivery is recorded for client_delivery().
+        """
+        meter = StreamMeter(self, required_rate, client)
+        with self._lock:
+            self._streams.add(meter)
+            if self._limit is None:
+                self._limit = self._ceiling() or START_DOWNLOAD_RATE
+                self._tokens = 0.0
+        return meter
+
+    def close_stream(self, meter: StreamMeter) -> None:
+        now = time.monotonic()
+        with self._lock:
+            meter.sample(now)
+            if not meter.peak and meter.total >= _MIN_JUDGED_BYTES:
+                # Too short for a windowed rate; the average will do.
+                meter.peak = meter.total / max(now - meter.opened_at, 1e-3)
+            self._streams.discard(meter)
+            if not self._streams:
+                self._limit = None
+            if meter.client and meter.required_rate and meter.peak:
+                self._record_delivery(meter)
+
+    def client_delivery(self, client: str) -> Optional[ClientDelivery]:
+        with self._lock:
+            delivery = self._clients.get(client)
+            return replace(delivery) if delivery else None
+
+    def _record_delivery(self, meter: StreamMeter) -> None:
+        delivery = self._clients.setdefault(meter.client, ClientDelivery(meter.client))
+        if delivery.connections:
+            delivery.capacity += _CAPACITY_WEIGHT * (meter.peak - delivery.capacity)
+        else:
+            delivery.capacity = meter.peak
+        delivery.stalls += meter.starved_time >= STALL_SECONDS
+        delivery.connections += 1
+        delivery.updated_at = time.time()
+
+    # --- downloads ---
+    def current_limit(self) -> Optional[float]:
+        """
+        Download limit in bytes/s, or None when unlimited.
+        """
+        with self._lock:
+            self._control(time.monotonic())
+            return self._limit
+
+    def consume(self, size: int) -> None:
+        """
+        Account `size` downloaded bytes and sleep while the bucket is in debt.
+        Sleeps in short slices so limit changes take effect immediately.
+        """
+        waited = 0.0
+        with self._lock:
+            self._control(time.monotonic())
+            if self._limit is None:
+                return
+            self._refill(time.monotonic())
+            self._tokens -= size
+        while waited < _MAX_WAIT:
+            with self._lock:
+                now = time.monotonic()
+                self._control(now)
+                if self._limit is None:
+                    self._tokens = 0.0
+                    break
+                self._refill(now)
+                if self._tokens >= 0:
+                    break
+                delay = min(_MAX_SLEEP, -self._tokens / self._limit)
+            time.sleep(delay)
+            waited += delay
+        if waited:
+            _THROTTLED_SECONDS.inc(waited)
+
+    def download_hook(self) -> Callable[[dict], None]:
+        """
+        yt-dlp progress hook that throttles one download through the bucket.
+        Only bytes transferred between callbacks are charged: the first
+        callback of a transfer (or a restart) just sets the baseline, since
+        a resumed download counts the bytes already on disk.
+        """
+        last: List[Optional[int]] = [None]
+
+        def _hook(status: dict) -> None:
+            if status.get("status") != "downloading":
+                last[0] = None
+                return
+            downloaded = int(status.get("downloaded_bytes") or 0)
+            previous, last[0] = last[0], downloaded
+            if previous is not None and downloaded > previous:
+                self.consume(downloaded - previous)
+
+        return _hook
+
+    # --- control (lock held) ---
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        # Allow a quarter second of burst, no more.
+        self._tokens = min(self._limit * _MAX_SLEEP, self._tokens + elapsed * self._limit)
+
+    def _control(self, now: float) -> None:
+        if now - self._last_control < _CONTROL_INTERVAL:
+            return
+        self._last_control = now
+        if not self._streams:
+            self._limit = None
+            return
+        for meter in self._streams:
+            meter.sample(now)
+        ceiling = self._ceiling()
+        limit = self._limit or START_DOWNLOAD_RATE
+        if any(meter.starved(now) for meter in self._streams):
+            # Halve at most once per window, so one dip is not punished repeatedly.
+            if now - self._last_decrease >= _WINDOW_SECONDS:
+                self._last_decrease = now
+                limit /= 2
+        else:
+            limit += RATE_STEP
+        if ceiling:
+            limit = min(limit, ceiling)
+        self._limit = max(MIN_DOWNLOAD_RATE, limit)
+
+    def _ceiling(self) -> Optional[float]:
+        uplink = self._uplink
+        if not uplink:
+            return None
+        demand = sum(meter.required_rate or meter.throughput() or 0 for meter in self._streams)
+        return max(MIN_DOWNLOAD_RATE, uplink * UPLINK_HEADROOM - demand)
+
+    @staticmethod
+    def _load_uplink() -> Optional[float]:
+        try:
+            with SqliteConnection() as db:
+                value = db.get_setting(UPLINK_SETTING)
+            return float(value) if value else None
+        except Exception as exc:
+            print(f"Ignoring {UPLINK_SETTING} setting: {exc}")
+            return None
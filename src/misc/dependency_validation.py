@@ -26,3 +26,15 @@ def ffmpeg_available() -> Tuple[bool, Optional[str]]:
         return True, descriptor or ffmpeg_path
     except Exception:
         return True, ffmpeg_path
+
+
+def numpy_available() -> Tuple[bool, Optional[str]]:
+    """
+    Check if NumPy (optional, needed for audio analysis and rendering) is importable.
+    Returns (is_available, version).
+    """
+    try:
+        import numpy
+    except ImportError:
+        return False, None
+    return True, numpy.__version__
@@ -0,0 +1,221 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Event, Thread
+from typing import Callable, Dict, Optional, Tuple
+
+CREATED = "created"
+REMOVED = "removed"
+RENAMED = "renamed"
+
+# inotify(7) constants
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Unpaired IN_MOVED_FROM events older than this are reported as removals.
+_MOVE_PAIR_WINDOW = 0.25
+
+
+@dataclass(frozen=True)
+class WatchEvent:
+    kind: str
+    path: Path
+    old_path: Optional[Path] = None
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        # Attribute access raises AttributeError when the symbols are missing.
+        getattr(libc, "inotify_init1")
+        getattr(libc, "inotify_add_watch")
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirectoryWatcher:
+    """
+    Watch a single directory (non-recursive) and report created, removed and
+    renamed files. Uses inotify on Linux and falls back to periodic polling.
+    Events are delivered on the watcher thread.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        on_event: Callable[[WatchEvent], None],
+        poll_interval: float = 2.0,
+        force_polling: bool = False,
+    ) -> None:
+        self.directory = Path(directory)
+        self.on_event = on_event
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.backend: Optional[str] = None
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        self._fd: Optional[int] = None
+        self._known: Dict[str, Tuple[int, int, int]] = {}
+
+    def start(self) -> None:
+        if self._thread:
+            return
+        self._stop.clear()
+        self._fd = None if self.force_polling else self._open_inotify()
+        self.backend = "inotify" if self._fd is not None else "polling"
+        if self._fd is None:
+            # Baseline taken synchronously so callers can scan right after start().
+            self._known = self._snapshot()
+        target = self._inotify_loop if self._fd is not None else self._polling_loop
+        self._thread = Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=2)
+        self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _emit(self, kind: str, name: str, old_name: Optional[str] = None) -> None:
+        old_path = self.directory / old_name if old_name else None
+        try:
+            self.on_event(WatchEvent(kind, self.directory / name, old_path))
+        except Exception:
+            # Keep watching even if a consumer misbehaves.
+            pass
+
+    # --- inotify backend ---
+    def _open_inotify(self) -> Optional[int]:
+        libc = _load_libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), _WATCH_MASK)
+        if wd < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _inotify_loop(self) -> None:
+        pending_moves: Dict[int, Tuple[str, float]] = {}
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 0.5)
+            if ready:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                except OSError:
+                    break
+                if not self._handle_inotify_batch(data, pending_moves):
+                    break
+            self._flush_moves(pending_moves, time.monotonic() - _MOVE_PAIR_WINDOW)
+        self._flush_moves(pending_moves, float("inf"))
+
+    def _handle_inotify_batch(self, data: bytes, pending_moves: Dict[int, Tuple[str, float]]) -> bool:
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                return False
+            if mask & _IN_ISDIR or not raw_name:
+                continue
+
+            name = os.fsdecode(raw_name)
+            if mask & _IN_MOVED_FROM:
+                pending_moves[cookie] = (name, time.monotonic())
+            elif mask & _IN_MOVED_TO:
+                source = pending_moves.pop(cookie, None)
+                if source:
+                    self._emit(RENAMED, name, source[0])
+                else:
+                    self._emit(CREATED, name)
+            elif mask & _IN_CLOSE_WRITE:
+                self._emit(CREATED, name)
+            elif mask & _IN_DELETE:
+                self._emit(REMOVED, name)
+        return True
+
+    def _flush_moves(self, pending_moves: Dict[int, Tuple[str, float]], cutoff: float) -> None:
+        for cookie, (name, seen_at) in list(pending_moves.items()):
+            if seen_at <= cutoff:
+                del pending_moves[cookie]
+                self._emit(REMOVED, name)
+
+    # --- polling backend ---
+    def _snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        entries: Dict[str, Tuple[int, int, int]] = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries[entry.name] = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            pass
+        return entries
+
+    def _polling_loop(self) -> None:
+        known = self._known
+        # New files are only reported once their size/mtime stop changing.
+        unsettled: Dict[str, Tuple[int, int, int]] = {}
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+
+            removed = {name: known[name] for name in known.keys() - current.keys()}
+            removed_by_inode = {stat[0]: name for name, stat in removed.items()}
+            for name in removed:
+                del known[name]
+
+            for name, stat in current.items():
+                if name in known:
+                    known[name] = stat
+                    continue
+                old_name = removed_by_inode.pop(stat[0], None)
+                if old_name:
+                    known[name] = stat
+                    self._emit(RENAMED, name, old_name)
+                elif unsettled.get(name) == stat:
+                    del unsettled[name]
+                    known[name] = stat
+                    self._emit(CREATED, name)
+                else:
+                    unsettled[name] = stat
+
+            for name in list(unsettled):
+                if name not in current:
+                    del unsettled[name]
+            for old_name in removed_by_inode.values():
+                self._emit(REMOVED, old_name)
@@ -1,8 +1,61 @@
+from __future__ import annotations
+
+import email.utils
+import json
+import mimetypes
+import os
+import queue
+import re
 import socket
+import stat
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
 from functools import partial
+from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
-from threading import Thread
-from typing import Optional
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from src.misc.bandwidth import BandwidthScheduler
+from src.misc.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from src.audio.crossfade_renderer import StreamRenderer
+    from src.control_api import ControlAPI
+
+_API_PREFIX = "/api/"
+_EVENTS_PATH = "/api/events"
+_MAX_API_BODY = 64 * 1024
+_KEEPALIVE_SECONDS = 15
+_METRICS_PATH = "/metrics"
+_COPY_CHUNK = 64 * 1024
+# Bytes per sendfile() call; metering and disconnect checks happen between calls.
+_SENDFILE_CHUNK = 256 * 1024
+_STAT_CACHE_ENTRIES = 512
+# Sonos players listen on 1400; any port works for a route lookup.
+_SONOS_PORT = 1400
+# Routes change rarely (DHCP renewals, VPNs); look them up again after this.
+SOURCE_IP_TTL = 300.0
+
+_BYTES_SERVED = REGISTRY.counter(
+    "sonos_thing_http_bytes_served_total", "Response body bytes sent, by client IP.", ["client"]
+)
+_ACTIVE_CONNECTIONS = REGISTRY.gauge(
+    "sonos_thing_http_active_connections", "Open HTTP connections, by client IP.", ["client"]
+)
+_REQUEST_LATENCY = REGISTRY.histogram(
+    "sonos_thing_http_request_latency_seconds",
+    "Time from reading the request line to sending response headers.",
+    ["route"],
+)
+_REQUESTS = REGISTRY.counter("sonos_thing_http_requests_total", "HTTP responses by route and status.", ["route", "status"])
+_SOURCE_IP_LOOKUPS = REGISTRY.counter(
+    "sonos_thing_http_source_ip_lookups_total", "Per-device source address lookups by result.", ["result"]
+)
+_STAT_CACHE = REGISTRY.counter("sonos_thing_http_stat_cache_total", "File metadata cache lookups by result.", ["result"])
 
 
 def _best_local_ip() -> str:
@@ -30,19 +83,532 @@ def _best_local_ip() -> str:
     return "127.0.0.1"
 
 
+def _source_ip_for(peer: str) -> Optional[str]:
+    """
+    The local address the kernel would use to reach `peer`, from a routing
+    lookup (connecting a UDP socket sends nothing).
+    """
+    family = socket.AF_INET6 if ":" in peer else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as s:
+            s.connect((peer, _SONOS_PORT))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+
+# first-last, first- or -suffix; plain ASCII digits only.
+_RANGE_SPEC = re.compile(r"(\d*)-(\d*)", re.ASCII)
+
+
+class _Unsatisfiable(Exception):
+    pass
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single-range `Range` header, clamped to the
+    file. None means serve the whole file: multiple ranges, an unknown unit
+    or an invalid range (RFC 9110 says to ignore those). Raises
+    _Unsatisfiable for ranges past the end, empty suffixes and suffixes of
+    an empty file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    match = _RANGE_SPEC.fullmatch(spec.strip())
+    if not match or match.group() == "-":
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise _Unsatisfiable()
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    end = int(last) if last else None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise _Unsatisfiable()
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if weak:
+        etag = etag[2:] if etag.startswith("W/") else etag
+    elif etag.startswith("W/"):
+        # Strong comparison never matches a weak tag.
+        return "*" in (c.strip() for c in header.split(","))
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+@dataclass
+class _FileEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    content_type: str
+    last_modified: str
+    # For WAVs the content hash once known, until then the weak size-mtime
+    # tag; for other files a strong size-mtime tag.
+    etag: str
+    # Whether `etag` is the content hash rather than size/mtime.
+    hashed: bool
+    # Playback rate for WAVs, so serving them can be metered as a stream.
+    byte_rate: Optional[int]
+    # The WAV's content hash while it is being computed.
+    hash_pending: Optional[Future] = None
+
+    @property
+    def mtime(self) -> int:
+        return self.mtime_ns // 1_000_000_000
+
+    @property
+    def stat_etag(self) -> str:
+        return f'W/"{self.size:x}-{self.mtime_ns:x}"'
+
+    def take_hash(self) -> None:
+        """
+        Switch to the content hash ETag once the pending hash has finished.
+        Only looks at the future, so it is cheap enough for every request.
+        """
+        future = self.hash_pending
+        if future is None or not future.done():
+            return
+        self.hash_pending = None
+        try:
+            result = future.result()
+        except Exception:
+            # Keep the weak tag; a changed file gets a new entry and a new hash.
+            return
+        if result.matches(self.size, self.mtime_ns):
+            self.etag, self.hashed = result.etag, True
+
+
+def _content_hash(path: str) -> Optional[Future]:
+    # Imported here: src.audio pulls in the player and its dependencies.
+    from src.audio.content_hash import ContentHasher
+
+    try:
+        return ContentHasher.instance().submit(path)
+    except Exception as exc:
+        print(f"Could not hash {os.path.basename(path)}: {exc}")
+        return None
+
+
+class FileStatCache:
+    """
+    Request path -> file metadata and validators, so repeat requests skip
+    path translation, MIME lookup, WAV parsing and date formatting. A hit
+    costs one os.stat to check the file's size and mtime are unchanged.
+    WAVs are content-hashed: the hash is submitted once when the entry is
+    built, and hits only check whether it has finished. Until then their
+    ETag is the weak size-mtime tag, so the only strong validator a client
+    ever sees for one is the hash, and the weak tag keeps matching
+    If-None-Match after the switch. Other files keep a strong size-mtime ETag.
+    """
+
+    def __init__(self, max_entries: int = _STAT_CACHE_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: "OrderedDict[str, _FileEntry]" = OrderedDict()
+
+    def get(self, request_path: str, translate: Callable[[str], str]) -> Optional[_FileEntry]:
+        with self._lock:
+            entry = self._entries.get(request_path)
+            if entry:
+                self._entries.move_to_end(request_path)
+        path = entry.path if entry else translate(request_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            if entry:
+                self.invalidate(request_path)
+            return None
+
+        if entry and (entry.size, entry.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            _STAT_CACHE.labels("hit").inc()
+            if entry.hash_pending is not None:
+                entry.take_hash()
+            return entry
+
+        _STAT_CACHE.labels("miss").inc()
+        entry = self._build(path, st)
+        with self._lock:
+            self._entries[request_path] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, request_path: str) -> None:
+        with self._lock:
+            self._entries.pop(request_path, None)
+
+    @staticmethod
+    def _build(path: str, st: os.stat_result) -> _FileEntry:
+        byte_rate = None
+        pending = None
+        stat_etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        if path.lower().endswith(".wav"):
+            from src.audio.wav import read_wav_layout
+
+            # Weak until the content hash replaces it.
+            stat_etag = "W/" + stat_etag
+            try:
+                byte_rate = read_wav_layout(path).byte_rate
+            except (OSError, ValueError):
+                pass
+            # Submitted once per entry; requests then only check the future.
+            pending = _content_hash(path)
+        else:
+            from src.audio.stream_format import variant_byte_rate
+
+            byte_rate = variant_byte_rate(path)
+        entry = _FileEntry(
+            path=path,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            content_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            last_modified=email.utils.formatdate(st.st_mtime, usegmt=True),
+            etag=stat_etag,
+            hashed=False,
+            byte_rate=byte_rate,
+            hash_pending=pending,
+        )
+        # A stored hash comes back as a finished future: strong ETag right away.
+        entry.take_hash()
+        return entry
+
+
+class DownloadRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler that also serves rendered crossfade streams and,
+    when a ControlAPI is attached, the JSON control API under /api/.
+    """
+
+    def __init__(
+        self,
+        *args,
+        renderer: Optional[StreamRenderer] = None,
+        control_api: Optional[ControlAPI] = None,
+        stat_cache: Optional[FileStatCache] = None,
+        **kwargs,
+    ) -> None:
+        # Must be set before super().__init__, which handles the request.
+        self.renderer = renderer
+        self.control_api = control_api
+        self.stat_cache = stat_cache or FileStatCache()
+        self._request_started: Optional[float] = None
+        self._status: Optional[int] = None
+        super().__init__(*args, **kwargs)
+
+    # --- instrumentation ---
+    def setup(self) -> None:
+        super().setup()
+        client = self.client_address[0]
+        self._bytes_served = _BYTES_SERVED.labels(client)
+        self._connections = _ACTIVE_CONNECTIONS.labels(client)
+        self._connections.inc()
+
+    def finish(self) -> None:
+        try:
+            super().finish()
+        finally:
+            self._connections.dec()
+
+    def parse_request(self) -> bool:
+        self._request_started = time.perf_counter()
+        return super().parse_request()
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self) -> None:
+        super().end_headers()
+        if self._request_started is not None:
+            route = self._route()
+            _REQUEST_LATENCY.labels(route).observe(time.perf_counter() - self._request_started)
+            _REQUESTS.labels(route, self._status).inc()
+            self._request_started = None
+
+    def _route(self) -> str:
+        path = urlsplit(self.path).path
+        if path == _METRICS_PATH:
+            return "metrics"
+        if path == _EVENTS_PATH:
+            return "events"
+        if path.startswith(_API_PREFIX):
+            return "api"
+        if self.renderer and self.renderer.session_for_path(path):
+            return "stream"
+        return "file"
+
+    def _write(self, data: bytes) -> None:
+        self.wfile.write(data)
+        self._bytes_served.inc(len(data))
+
+    def copyfile(self, source, outputfile) -> None:
+        # Only directory listings and errors get here; files go through _serve_file.
+        while True:
+            chunk = source.read(_COPY_CHUNK)
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            self._bytes_served.inc(len(chunk))
+
+    # --- routing ---
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path == _METRICS_PATH:
+            self._serve_metrics()
+            return
+        if self._serve_api("GET"):
+            return
+        if not self._serve_stream(send_body=True) and not self._serve_file(send_body=True):
+            super().do_GET()
+
+    def do_POST(self) -> None:
+        if not self._serve_api("POST"):
+            self.send_error(405, "Method not allowed")
+
+    def do_HEAD(self) -> None:
+        if not self._serve_stream(send_body=False) and not self._serve_file(send_body=False):
+            super().do_HEAD()
+
+    def _serve_api(self, method: str) -> bool:
+        path = urlsplit(self.path).path
+        if not self.control_api or not path.startswith(_API_PREFIX):
+            return False
+        if not self.control_api.is_authorized(self.headers.get("Authorization"), self.client_address[0]):
+            self._send_json(401, {"error": "unauthorized"})
+            return True
+        if method == "GET" and path == _EVENTS_PATH:
+            self._serve_events()
+            return True
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > _MAX_API_BODY:
+            # The body is left unread, so this connection cannot be reused.
+            self.close_connection = True
+            if length < 0:
+                self._send_json(400, {"error": "invalid Content-Length"})
+            else:
+                self._send_json(413, {"error": "request body too large"})
+            return True
+        body = self.rfile.read(length) if length else b""
+        status, payload = self.control_api.handle(method, path, body)
+        self._send_json(status, payload)
+        return True
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self._write(data)
+
+    def _serve_metrics(self) -> None:
+        data = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self._write(data)
+
+    def _serve_events(self) -> None:
+        """
+        Server-sent events: one `data:` line per status change, so clients need not poll.
+        """
+        feed = self.control_api.feed
+        updates = feed.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                try:
+                    status = updates.get(timeout=_KEEPALIVE_SECONDS)
+                    self._write(f"data: {json.dumps(status)}\n\n".encode("utf-8"))
+                except queue.Empty:
+                    self._write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            feed.unsubscribe(updates)
+
+    def _serve_stream(self, send_body: bool) -> bool:
+        if not self.renderer:
+            return False
+        session = self.renderer.session_for_path(urlsplit(self.path).path)
+        if session is None:
+            return False
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        if not send_body:
+            return True
+        with BandwidthScheduler.instance().open_stream(session.layout.byte_rate, self.client_address[0]) as meter:
+            try:
+                for chunk in session.stream():
+                    self._write(chunk)
+                    meter.add(len(chunk))
+            except (BrokenPipeError, ConnectionResetError):
+                # Speaker went away; it may reconnect and resume the session.
+                pass
+        return True
+
+    def _serve_file(self, send_body: bool) -> bool:
+        """
+        Serve a regular file with ETag/Last-Modified validators, honouring
+        If-None-Match, If-Modified-Since, Range and If-Range. Returns False
+        for anything that is not a file (directories, missing paths).
+        """
+        entry = self.stat_cache.get(urlsplit(self.path).path, self.translate_path)
+        if entry is None:
+            return False
+
+        if self._not_modified(entry):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", entry.etag)
+            self.send_header("Last-Modified", entry.last_modified)
+            self.end_headers()
+            return True
+
+        first, last = 0, entry.size - 1
+        partial_response = False
+        range_header = self.headers.get("Range")
+        if range_header and self._if_range_holds(entry):
+            try:
+                byte_range = _parse_range(range_header, entry.size)
+            except _Unsatisfiable:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{entry.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+            if byte_range:
+                (first, last), partial_response = byte_range, True
+
+        source = None
+        if send_body:
+            try:
+                source = open(entry.path, "rb")
+            except OSError:
+                self.stat_cache.invalidate(urlsplit(self.path).path)
+                return False
+        try:
+            self.send_response(HTTPStatus.PARTIAL_CONTENT if partial_response else HTTPStatus.OK)
+            self.send_header("Content-Type", entry.content_type)
+            self.send_header("Content-Length", str(last - first + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", entry.etag)
+            self.send_header("Last-Modified", entry.last_modified)
+            if partial_response:
+                self.send_header("Content-Range", f"bytes {first}-{last}/{entry.size}")
+            self.end_headers()
+            if source:
+                self._send_file_body(source, first, last - first + 1, entry.byte_rate)
+        finally:
+            if source:
+                source.close()
+        return True
+
+    def _not_modified(self, entry: _FileEntry) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # The size and mtime were just checked, so the weak tag still holds.
+            return _etag_matches(if_none_match, entry.etag, weak=True) or _etag_matches(
+                if_none_match, entry.stat_etag, weak=True
+            )
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return entry.mtime <= since
+        return False
+
+    def _if_range_holds(self, entry: _FileEntry) -> bool:
+        """
+        Whether a Range request may be served partially: no If-Range, or one
+        naming the current version (strong ETag or exact Last-Modified).
+        """
+        if_range = self.headers.get("If-Range")
+        if not if_range:
+            return True
+        if if_range.startswith(('"', "W/")):
+            return _etag_matches(if_range, entry.etag, weak=False)
+        return if_range.strip() == entry.last_modified
+
+    def _send_file_body(self, source, offset: int, count: int, byte_rate: Optional[int]) -> None:
+        # Audio counts as a stream that downloads must yield to.
+        meter = BandwidthScheduler.instance().open_stream(byte_rate, self.client_address[0]) if byte_rate else None
+        try:
+            while count > 0:
+                sent = self.connection.sendfile(source, offset, min(_SENDFILE_CHUNK, count))
+                if not sent:
+                    break
+                offset += sent
+                count -= sent
+                self._bytes_served.inc(sent)
+                if meter:
+                    meter.add(sent)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            if meter:
+                meter.close()
+
+
 class DownloadHTTPServer:
     """
     Lightweight HTTP server serving a directory for Sonos consumption.
     """
 
-    def __init__(self, directory: str, host: str = "0.0.0.0", port: int = 0) -> None:
+    def __init__(
+        self,
+        directory: str,
+        host: str = "0.0.0.0",
+        port: int = 0,
+        renderer: Optional[StreamRenderer] = None,
+        control_api: Optional[ControlAPI] = None,
+    ) -> None:
         self.directory = directory
         self.bind_host = host
         self.bind_port = port
+        self.renderer = renderer
+        self.control_api = control_api
+        self.stat_cache = FileStatCache()
         self.server: Optional[ThreadingHTTPServer] = None
         self.thread: Optional[Thread] = None
         self.client_host: str = _best_local_ip()
         self.client_port: Optional[int] = None
+        self._source_ips: Dict[str, Tuple[str, float]] = {}
+        self._source_lock = Lock()
 
     @property
     def base_url(self) -> Optional[str]:
@@ -50,11 +616,48 @@ class DownloadHTTPServer:
             return None
         return f"http://{self.client_host}:{self.client_port}"
 
+    def base_url_for(self, peer: Optional[str]) -> Optional[str]:
+        """
+        Base URL a device at `peer` should fetch from: this host's address on
+        the interface that routes to it, so a multi-homed host serves each
+        speaker over its nearest network. Lookups are cached per peer.
+        """
+        if self.client_port is None:
+            return None
+        if not peer or self.bind_host not in ("", "0.0.0.0", "::"):
+            # Bound to one address: that is the only one that answers.
+            return self.base_url
+        if ":" in peer and self.bind_host != "::":
+            # An IPv4 socket cannot serve an IPv6 peer.
+            return self.base_url
+        now = time.monotonic()
+        with self._source_lock:
+            cached = self._source_ips.get(peer)
+        if cached and now - cached[1] < SOURCE_IP_TTL:
+            _SOURCE_IP_LOOKUPS.labels("cached").inc()
+            host = cached[0]
+        else:
+            host = _source_ip_for(peer)
+            _SOURCE_IP_LOOKUPS.labels("routed" if host else "failed").inc()
+            if not host:
+                return self.base_url
+            with self._source_lock:
+                self._source_ips[peer] = (host, now)
+        if ":" in host:
+            host = f"[{host}]"
+        return f"http://{host}:{self.client_port}"
+
     def start(self) -> None:
         if self.server:
             return
 
-        handler = partial(SimpleHTTPRequestHandler, directory=self.directory)
+        handler = partial(
+            DownloadRequestHandler,
+            directory=self.directory,
+            renderer=self.renderer,
+            control_api=self.control_api,
+            stat_cache=self.stat_cache,
+        )
         self.server = ThreadingHTTPServer((self.bind_host, self.bind_port), handler)
         self.client_port = self.server.server_port
 
@@ -73,7 +676,19 @@ class DownloadHTTPServer:
         self.client_port = None
 
 
-def start_download_server(directory: str, host: str = "0.0.0.0", port: int = 0) -> DownloadHTTPServer:
-    server = DownloadHTTPServer(directory=directory, host=host, port=port)
+def start_download_server(
+    directory: str,
+    host: str = "0.0.0.0",
+    port: int = 0,
+    renderer: Optional[StreamRenderer] = None,
+    control_api: Optional[ControlAPI] = None,
+) -> DownloadHTTPServer:
+    server = DownloadHTTPServer(
+        directory=directory,
+        host=host,
+        port=port,
+        renderer=renderer,
+        control_api=control_api,
+    )
     server.start()
     return server
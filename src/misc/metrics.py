@@ -0,0 +1,284 @@
+import math
+import weakref
+from bisect import bisect_left
+from threading import Lock, local
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+class _ShardHolder:
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self) -> None:
+        self.shard: dict = {}
+
+
+class _Sharded:
+    """
+    Per-thread value shards: writers only touch their own thread's dict, so the
+    hot path takes no lock. Readers sum the shards at scrape time. When a
+    thread exits (e.g. a finished HTTP request), its shard is folded into a
+    retired total so shards do not pile up.
+    """
+
+    def __init__(self) -> None:
+        self._local = local()
+        self._shards: List[dict] = []
+        self._retired: dict = {}
+        self._shards_lock = Lock()
+
+    def _shard(self) -> dict:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ShardHolder()
+            self._local.holder = holder
+            with self._shards_lock:
+                self._shards.append(holder.shard)
+            weakref.finalize(holder, self._retire, holder.shard)
+        return holder.shard
+
+    def _retire(self, shard: dict) -> None:
+        with self._shards_lock:
+            self._shards = [s for s in self._shards if s is not shard]
+            for key, value in shard.items():
+                self._retired[key] = self._combine(self._retired.get(key), value)
+
+    def _combine(self, total, value):
+        return value if total is None else total + value
+
+    def _snapshots(self) -> List[list]:
+        with self._shards_lock:
+            shards = list(self._shards)
+            retired = list(self._retired.items())
+        # list(dict.items()) runs without releasing the GIL, so it is a
+        # consistent copy even while the owning thread keeps writing.
+        return [retired] + [list(shard.items()) for shard in shards]
+
+
+class _Metric(_Sharded):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Tuple[object, ...]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def _format_labels(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return "{" + body + "}"
+
+    def labels(self, *values: object) -> "_Child":
+        """
+        Bind label values once; keep the child around on hot paths.
+        """
+        return _Child(self, self._key(values))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Child:
+    __slots__ = ("metric", "key")
+
+    def __init__(self, metric: _Metric, key: LabelValues) -> None:
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.metric._add(self.key, amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.metric._add(self.key, -amount)
+
+    def set(self, value: float) -> None:
+        self.metric._set(self.key, value)
+
+    def observe(self, value: float) -> None:
+        self.metric._observe(self.key, value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._add((), amount)
+
+    def _add(self, key: LabelValues, amount: float) -> None:
+        shard = self._shard()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for items in self._snapshots():
+            for key, value in items:
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(k)} {_fmt(v)}" for k, v in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """
+    Use either set() (last write wins) or inc()/dec() for a given gauge; the
+    reported value is the set value plus the sum of increments.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._set_values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._add((), -amount)
+
+    def set(self, value: float) -> None:
+        self._set((), value)
+
+    def _set(self, key: LabelValues, value: float) -> None:
+        self._set_values[key] = value
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """
+        Evaluate `fn` at scrape time (unlabelled gauges only).
+        """
+        self._function = fn
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals = dict(self._set_values)
+        for key, value in super().values().items():
+            totals[key] = totals.get(key, 0.0) + value
+        if self._function is not None:
+            try:
+                totals[()] = float(self._function())
+            except Exception:
+                pass
+        return totals
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        self._observe((), value)
+
+    def _observe(self, key: LabelValues, value: float) -> None:
+        shard = self._shard()
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts..., +Inf count, sum]
+            state = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[key] = state
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _combine(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def _merged(self) -> Dict[LabelValues, list]:
+        merged: Dict[LabelValues, list] = {}
+        for items in self._snapshots():
+            for key, state in items:
+                target = merged.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for idx, value in enumerate(list(state)):
+                    target[idx] += value
+        return merged
+
+    def _render_samples(self) -> List[str]:
+        lines: List[str] = []
+        for key, state in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _fmt(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_fmt(state[-1])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional, Set
+
+from src.misc.metrics import REGISTRY
+
+STARTUP_REPORT_ENV = "SONOS_THING_STARTUP_REPORT"
+
+_STARTUP_SECONDS = REGISTRY.gauge(
+    "sonos_thing_startup_seconds", "Seconds from process start to each startup milestone.", ["milestone"]
+)
+
+
+def _process_age() -> float:
+    """
+    Seconds since the process started, so interpreter start-up counts too.
+    Falls back to 0 (i.e. time since this module was imported) off Linux.
+    """
+    try:
+        with open("/proc/self/stat", encoding="ascii") as fh:
+            # Field 22, counted after the parenthesised command name.
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="ascii") as fh:
+            uptime = float(fh.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+_ORIGIN = time.perf_counter() - _process_age()
+
+
+class StartupTimer:
+    """
+    Records start-up milestones as seconds since process start. "window" is
+    when the GUI is first drawn; "ready" is when the window (if any) is up
+    and every background start-up task has finished. Wrap the synchronous
+    set-up in begin("init")/end("init") so ready cannot fire while tasks are
+    still being scheduled.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._milestones: Dict[str, float] = {}
+        self._pending: Set[str] = set()
+        self._needs_window = False
+        self._ready_fired = False
+        self._report_path: Optional[Path] = None
+        self._on_ready: List[Callable[[Dict[str, float]], None]] = []
+
+    def mark(self, milestone: str) -> float:
+        """
+        Record a milestone once; later calls return the first time.
+        """
+        with self._lock:
+            if milestone not in self._milestones:
+                self._milestones[milestone] = time.perf_counter() - _ORIGIN
+                _STARTUP_SECONDS.labels(milestone).set(self._milestones[milestone])
+            elapsed = self._milestones[milestone]
+        if milestone == "window":
+            self._check_ready()
+        return elapsed
+
+    def expect_window(self) -> None:
+        self._needs_window = True
+
+    def begin(self, task: str) -> None:
+        with self._lock:
+            self._pending.add(task)
+
+    def end(self, task: str) -> None:
+        """
+        Finish a background task, marking its own milestone.
+        """
+        self.mark(task)
+        with self._lock:
+            self._pending.discard(task)
+        self._check_ready()
+
+    def run_in_background(self, task: str, fn: Callable[[], None]) -> None:
+        self.begin(task)
+
+        def _worker() -> None:
+            try:
+                fn()
+            except Exception as exc:
+                print(f"Start-up task {task} failed: {exc}")
+            finally:
+                self.end(task)
+
+        Thread(target=_worker, name=f"startup-{task}", daemon=True).start()
+
+    def set_report_path(self, path: Optional[str]) -> None:
+        self._report_path = Path(path) if path else None
+
+    def on_ready(self, callback: Callable[[Dict[str, float]], None]) -> None:
+        self._on_ready.append(callback)
+
+    def milestones(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._milestones.items(), key=lambda item: item[1]))
+
+    def report(self) -> str:
+        return "Startup: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.milestones().items())
+
+    def _check_ready(self) -> None:
+        with self._lock:
+            if self._ready_fired or self._pending:
+                return
+            if self._needs_window and "window" not in self._milestones:
+                return
+            self._ready_fired = True
+        self.mark("ready")
+        milestones = self.milestones()
+        print(self.report())
+        if self._report_path:
+            try:
+                self._report_path.write_text(json.dumps(milestones, indent=2) + "\n", encoding="utf-8")
+            except OSError as exc:
+                print(f"Could not write start-up report: {exc}")
+        for callback in self._on_ready:
+            callback(milestones)
+
+
+STARTUP = StartupTimer()
+if os.environ.get(STARTUP_REPORT_ENV):
+    STARTUP.set_report_path(os.environ[STARTUP_REPORT_ENV])
@@ -0,0 +1,268 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+TRACE_ENV = "SONOS_THING_TRACE"
+PROFILE_ENV = "SONOS_THING_PROFILE"
+PROFILE_OUT_ENV = "SONOS_THING_PROFILE_OUT"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class TraceRecorder:
+    """
+    Collects spans as Chrome trace events and writes them as JSON that
+    chrome://tracing and ui.perfetto.dev can open.
+    """
+
+    def __init__(self, output: Path | str, max_events: int = 500_000) -> None:
+        self.output = Path(output)
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._pid = os.getpid()
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin_ns) / 1000
+
+    def record(self, name: str, start_us: float, end_us: float, args: Optional[Dict[str, Any]] = None) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": end_us - start_us,
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = {k: v if isinstance(v, (int, float, bool)) or v is None else str(v) for k, v in args.items()}
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = thread.name
+
+    def write(self) -> Path:
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            dropped = self.dropped
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        with self.output.open("w", encoding="utf-8") as fh:
+            json.dump(
+                {"traceEvents": metadata + events, "displayTimeUnit": "ms", "otherData": {"dropped_events": dropped}},
+                fh,
+            )
+        return self.output
+
+
+_recorder: Optional[TraceRecorder] = None
+
+
+def enable_tracing(output: Path | str) -> TraceRecorder:
+    """
+    Start recording spans; the trace is written to `output` at exit.
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = TraceRecorder(output)
+        atexit.register(flush_trace)
+    return _recorder
+
+
+def tracing_enabled() -> bool:
+    return _recorder is not None
+
+
+def flush_trace() -> Optional[Path]:
+    if _recorder is None:
+        return None
+    try:
+        path = _recorder.write()
+    except OSError as exc:
+        print(f"Could not write trace: {exc}")
+        return None
+    print(f"Trace written to {path}")
+    return path
+
+
+@contextmanager
+def _recording_span(recorder: TraceRecorder, name: str, args: Dict[str, Any]) -> Iterator[None]:
+    start = recorder.now_us()
+    try:
+        yield
+    finally:
+        recorder.record(name, start, recorder.now_us(), args)
+
+
+class _NullSpan:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args: Any):
+    """
+    Time a block as a named span. A no-op unless tracing is enabled.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _recording_span(recorder, name, args)
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Decorator form of span(); defaults to the function's qualified name.
+    """
+
+    def decorator(fn: F) -> F:
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return fn(*args, **kwargs)
+            start = recorder.now_us()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.record(span_name, start, recorder.now_us())
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+class StackSampler:
+    """
+    Sampling profiler over every thread: periodically captures each thread's
+    Python stack and counts identical stacks. Output is the collapsed-stack
+    format read by speedscope and flamegraph.pl.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._ignored = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, ignore_current_thread: bool = False) -> None:
+        if self._thread:
+            return
+        if ignore_current_thread:
+            self._ignored.add(threading.get_ident())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def write(self, output: Path | str) -> Path:
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as fh:
+            for stack, count in self._stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+    def _run(self) -> None:
+        self._ignored.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident in self._ignored:
+                    continue
+                self._stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        parts: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ";".join(reversed(parts))
+
+
+def start_profile_window(seconds: float, output: Path | str, delay: float = 0.0) -> StackSampler:
+    """
+    Sample all threads for `seconds`, starting after `delay`, then write the
+    collapsed stacks to `output`.
+    """
+    sampler = StackSampler()
+
+    def _window() -> None:
+        sampler.start(ignore_current_thread=True)
+        time.sleep(seconds)
+        sampler.stop()
+        try:
+            path = sampler.write(output)
+            print(f"Profile ({sampler.samples} samples) written to {path}")
+        except OSError as exc:
+            print(f"Could not write profile: {exc}")
+
+    timer = threading.Timer(delay, _window)
+    timer.daemon = True
+    timer.start()
+    return sampler
+
+
+def configure_from_options(
+    trace: Optional[str] = None,
+    profile: Optional[float] = None,
+    profile_delay: float = 0.0,
+    profile_out: Optional[str] = None,
+) -> None:
+    """
+    Apply CLI options, falling back to the environment:
+    SONOS_THING_TRACE=<trace.json>, SONOS_THING_PROFILE=<seconds>[@<delay>]
+    and SONOS_THING_PROFILE_OUT=<path>.
+    """
+    trace = trace or os.environ.get(TRACE_ENV)
+    if trace:
+        enable_tracing(trace)
+
+    if profile is None and os.environ.get(PROFILE_ENV):
+        seconds, _, delay = os.environ[PROFILE_ENV].partition("@")
+        try:
+            profile = float(seconds)
+            profile_delay = float(delay) if delay else profile_delay
+        except ValueError:
+            print(f"Ignoring invalid {PROFILE_ENV}={os.environ[PROFILE_ENV]!r}")
+            profile = None
+    if profile and profile > 0:
+        out = profile_out or os.environ.get(PROFILE_OUT_ENV) or f"profile-{int(time.time())}.folded"
+        start_profile_window(profile, out, delay=profile_delay)
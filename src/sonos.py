@@ -1,7 +1,46 @@
+import os
+import time
 from dataclasses import dataclass
-from typing import Any, Iterable, List, Optional
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
 
-from soco import discover
+from src.misc.metrics import REGISTRY
+from src.misc.tracing import span
+
+_SOAP_CALLS = REGISTRY.counter(
+    "sonos_thing_soap_calls_total", "SOAP/UPnP calls per SonosDeviceHandle method and outcome.", ["method", "outcome"]
+)
+_SOAP_LATENCY = REGISTRY.histogram(
+    "sonos_thing_soap_latency_seconds", "SOAP/UPnP call latency per SonosDeviceHandle method.", ["method"]
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _instrumented(fn: F) -> F:
+    """
+    Count, time and trace a device call; children are bound once so the wrapper stays cheap.
+    """
+    ok = _SOAP_CALLS.labels(fn.__name__, "ok")
+    failed = _SOAP_CALLS.labels(fn.__name__, "error")
+    latency = _SOAP_LATENCY.labels(fn.__name__)
+    span_name = f"sonos.{fn.__name__}"
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with span(span_name):
+                result = fn(*args, **kwargs)
+        except Exception:
+            failed.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+        ok.inc()
+        return result
+
+    return wrapper  # type: ignore[return-value]
 
 
 @dataclass
@@ -14,8 +53,17 @@ class SonosDeviceHandle:
         return SonosDeviceHandle(player_name=device.player_name, sonos=device)
 
     @staticmethod
+    @_instrumented
     def discover() -> List["SonosDeviceHandle"]:
-        devices = discover() or set()
+        if os.environ.get("SONOS_THING_SIMULATOR"):
+            from src.sonos_simulator import discover_simulated
+
+            devices = discover_simulated()
+        else:
+            # Deferred so start-up does not pay for importing SoCo.
+            from soco import discover
+
+            devices = discover() or set()
         handles = [SonosDeviceHandle.from_device(d) for d in devices]
         return sorted(handles, key=lambda h: h.player_name)
 
@@ -26,13 +74,66 @@ class SonosDeviceHandle:
                 return handle
         return None
 
+    @property
+    def ip_address(self) -> Optional[str]:
+        return getattr(self.sonos, "ip_address", None)
+
+    # Transport controls
+    @_instrumented
+    def play_uri(self, uri: str) -> None:
+        try:
+            self.sonos.play_uri(uri)
+        except Exception as exc:
+            raise RuntimeError(f"Unable to play URI: {exc}") from exc
+
+    @_instrumented
+    def stop(self) -> None:
+        try:
+            self.sonos.stop()
+        except Exception as exc:
+            raise RuntimeError(f"Unable to stop playback: {exc}") from exc
+
+    @_instrumented
+    def pause(self) -> None:
+        try:
+            self.sonos.pause()
+        except Exception as exc:
+            raise RuntimeError(f"Unable to pause playback: {exc}") from exc
+
+    @_instrumented
+    def seek(self, seconds: float) -> None:
+        """
+        Jump to `seconds` into the current track.
+        """
+        total = max(0, int(seconds))
+        try:
+            self.sonos.seek(f"{total // 3600}:{total // 60 % 60:02d}:{total % 60:02d}")
+        except Exception as exc:
+            raise RuntimeError(f"Unable to seek: {exc}") from exc
+
+    @_instrumented
+    def get_transport_info(self) -> Dict[str, Any]:
+        try:
+            return self.sonos.get_current_transport_info()
+        except Exception as exc:
+            raise RuntimeError(f"Unable to fetch transport info: {exc}") from exc
+
+    @_instrumented
+    def get_current_track_info(self) -> Dict[str, Any]:
+        try:
+            return self.sonos.get_current_track_info()
+        except Exception as exc:
+            raise RuntimeError(f"Unable to fetch track info: {exc}") from exc
+
     # Volume controls
+    @_instrumented
     def get_volume(self) -> int:
         try:
             return int(self.sonos.volume)
         except Exception as exc:
             raise RuntimeError(f"Unable to fetch volume: {exc}") from exc
 
+    @_instrumented
     def set_volume(self, volume: int) -> int:
         clamped = max(0, min(100, int(volume)))
         try:
@@ -46,6 +147,7 @@ class SonosDeviceHandle:
         return self.set_volume(current + delta)
 
     # Group management
+    @_instrumented
     def ungroup(self) -> None:
         """
         Ensure this device leaves any existing group to avoid multi-room playback.
@@ -0,0 +1,409 @@
+import itertools
+import os
+import queue
+import random
+import struct
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from threading import Event, Lock, Thread
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from soco.exceptions import SoCoUPnPException
+
+SIMULATOR_ENV = "SONOS_THING_SIMULATOR"
+
+# 16-bit stereo 44.1 kHz, what the downloader's WAVs usually are.
+DEFAULT_BYTE_RATE = 44_100 * 2 * 2
+_READ_INTERVAL = 0.05
+
+
+@dataclass
+class SimulatorConfig:
+    """
+    Behaviour knobs for simulated speakers. `speed` scales playback (and so
+    the fetch rate); `byte_rate` is used when the stream is not a WAV.
+    """
+
+    latency: float = 0.02
+    jitter: float = 0.01
+    failure_rate: float = 0.0
+    failing_methods: FrozenSet[str] = frozenset()
+    byte_rate: int = DEFAULT_BYTE_RATE
+    speed: float = 1.0
+    fetch: bool = True
+    seed: Optional[int] = None
+
+
+@dataclass
+class FetchStats:
+    uri: str
+    requested_at: float
+    first_byte_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    bytes_read: int = 0
+    byte_rate: int = DEFAULT_BYTE_RATE
+    error: Optional[str] = None
+
+    @property
+    def time_to_first_byte(self) -> Optional[float]:
+        return None if self.first_byte_at is None else self.first_byte_at - self.requested_at
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """
+        Bytes per second while streaming.
+        """
+        if self.first_byte_at is None:
+            return None
+        end = self.finished_at or time.perf_counter()
+        return self.bytes_read / max(end - self.first_byte_at, 1e-9)
+
+
+@dataclass
+class SimulatedEvent:
+    service: str
+    variables: Dict[str, Any]
+    timestamp: float = field(default_factory=time.time)
+
+
+class SimulatedSubscription:
+    """
+    Shaped like soco.events.Subscription: events arrive on `.events`.
+    """
+
+    def __init__(self, service: "SimulatedService") -> None:
+        self.service = service
+        self.events: queue.Queue = queue.Queue()
+        self.is_subscribed = True
+
+    def unsubscribe(self) -> None:
+        self.is_subscribed = False
+        self.service._drop(self)
+
+
+class SimulatedService:
+    def __init__(self, name: str) -> None:
+        self.service_type = name
+        self._subscriptions: List[SimulatedSubscription] = []
+        self._lock = Lock()
+
+    def subscribe(self, requested_timeout: Optional[int] = None, auto_renew: bool = False) -> SimulatedSubscription:
+        subscription = SimulatedSubscription(self)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _drop(self, subscription: SimulatedSubscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _emit(self, variables: Dict[str, Any]) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.events.put(SimulatedEvent(self.service_type, dict(variables)))
+
+
+class SimulatedSpeaker:
+    """
+    In-process stand-in for a soco.SoCo speaker. Implements the transport,
+    volume, queue, grouping and event calls the app uses, with injected
+    latency and failures. play_uri really fetches the URI over HTTP and reads
+    it at playback speed, so the stream server sees a realistic client.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, player_name: str, config: Optional[SimulatorConfig] = None) -> None:
+        self.player_name = player_name
+        self.config = config or SimulatorConfig()
+        number = next(self._ids)
+        self.uid = f"RINCON_SIM{number:012d}01400"
+        self.ip_address = "127.0.0.1"
+        self.avTransport = SimulatedService("AVTransport")
+        self.renderingControl = SimulatedService("RenderingControl")
+        self.fetches: List[FetchStats] = []
+        self._rng = random.Random(self.config.seed)
+        self._lock = Lock()
+        self._state = "STOPPED"
+        self._volume = 20
+        self._uri: Optional[str] = None
+        self._queue: List[str] = []
+        self._queue_position = 0
+        self._position = 0.0
+        self._duration: Optional[float] = None
+        self._fetch_stop: Optional[Event] = None
+        self._resume = Event()
+        self._resume.set()
+
+    def __repr__(self) -> str:
+        return f"SimulatedSpeaker({self.player_name!r})"
+
+    # --- SOAP plumbing ---
+    def _call(self, method: str) -> None:
+        cfg = self.config
+        delay = max(0.0, cfg.latency + self._rng.uniform(-cfg.jitter, cfg.jitter))
+        if delay:
+            time.sleep(delay)
+        if method in cfg.failing_methods or (cfg.failure_rate and self._rng.random() < cfg.failure_rate):
+            raise SoCoUPnPException(
+                message=f"UPnP Error 701 received: Transition not available from {self.player_name}",
+                error_code="701",
+                error_xml="",
+                error_description="Transition not available",
+            )
+
+    def _set_state(self, state: str) -> None:
+        with self._lock:
+            changed = state != self._state
+            self._state = state
+        if changed:
+            self.avTransport._emit({"transport_state": state, "current_track_uri": self._uri})
+
+    # --- transport ---
+    def play_uri(self, uri: str = "", meta: str = "", title: str = "", start: bool = True, force_radio: bool = False) -> bool:
+        self._call("play_uri")
+        self._start(uri, start)
+        return True
+
+    def play(self) -> None:
+        self._call("play")
+        with self._lock:
+            uri = self._uri
+            paused = self._state == "PAUSED_PLAYBACK"
+        if paused:
+            self._resume.set()
+            self._set_state("PLAYING")
+        elif uri:
+            self._start(uri, True)
+
+    def pause(self) -> None:
+        self._call("pause")
+        self._resume.clear()
+        self._set_state("PAUSED_PLAYBACK")
+
+    def stop(self) -> None:
+        self._call("stop")
+        self._cancel_fetch()
+        with self._lock:
+            self._position = 0.0
+        self._set_state("STOPPED")
+
+    def seek(self, position: str) -> None:
+        self._call("seek")
+        hours, minutes, seconds = (int(part) for part in position.split(":"))
+        with self._lock:
+            self._position = float(hours * 3600 + minutes * 60 + seconds)
+
+    def get_current_transport_info(self) -> Dict[str, str]:
+        self._call("get_current_transport_info")
+        with self._lock:
+            return {
+                "current_transport_state": self._state,
+                "current_transport_status": "OK",
+                "current_transport_speed": "1",
+            }
+
+    def get_current_track_info(self) -> Dict[str, str]:
+        self._call("get_current_track_info")
+        with self._lock:
+            return {
+                "title": os.path.basename(self._uri or ""),
+                "uri": self._uri or "",
+                "playlist_position": str(self._queue_position + 1 if self._queue else 0),
+                "position": _hms(self._position),
+                "duration": _hms(self._duration) if self._duration is not None else "NOT_IMPLEMENTED",
+            }
+
+    # --- queue ---
+    def add_uri_to_queue(self, uri: str, position: int = 0, as_next: bool = False) -> int:
+        self._call("add_uri_to_queue")
+        with self._lock:
+            if position <= 0 or position > len(self._queue):
+                self._queue.append(uri)
+                return len(self._queue)
+            self._queue.insert(position - 1, uri)
+            return position
+
+    def clear_queue(self) -> None:
+        self._call("clear_queue")
+        with self._lock:
+            self._queue.clear()
+            self._queue_position = 0
+
+    def get_queue(self, start: int = 0, max_items: int = 100) -> List[str]:
+        self._call("get_queue")
+        with self._lock:
+            return list(self._queue[start : start + max_items])
+
+    def play_from_queue(self, index: int, start: bool = True) -> None:
+        self._call("play_from_queue")
+        with self._lock:
+            uri = self._queue[index]
+            self._queue_position = index
+        self._start(uri, start)
+
+    def next(self) -> None:
+        self._call("next")
+        self._step_queue(1)
+
+    def previous(self) -> None:
+        self._call("previous")
+        self._step_queue(-1)
+
+    def _step_queue(self, step: int) -> None:
+        with self._lock:
+            if not self._queue:
+                raise SoCoUPnPException("UPnP Error 711: queue is empty", "711", "", "Illegal seek target")
+            self._queue_position = (self._queue_position + step) % len(self._queue)
+            uri = self._queue[self._queue_position]
+        self._start(uri, True)
+
+    # --- volume ---
+    @property
+    def volume(self) -> int:
+        self._call("volume")
+        with self._lock:
+            return self._volume
+
+    @volume.setter
+    def volume(self, value: int) -> None:
+        self._call("volume")
+        with self._lock:
+            self._volume = max(0, min(100, int(value)))
+            volume = self._volume
+        self.renderingControl._emit({"volume": {"Master": str(volume)}})
+
+    # --- grouping ---
+    def unjoin(self) -> None:
+        self._call("unjoin")
+
+    @property
+    def group(self) -> "SimulatedGroup":
+        return SimulatedGroup(self)
+
+    # --- playback ---
+    def _start(self, uri: str, start: bool) -> None:
+        self._cancel_fetch()
+        stop = Event()
+        with self._lock:
+            self._uri = uri
+            self._position = 0.0
+            self._duration = None
+            self._fetch_stop = stop
+        self._resume.set()
+        if not start:
+            self._set_state("STOPPED")
+            return
+        self._set_state("TRANSITIONING")
+        if self.config.fetch:
+            Thread(target=self._fetch, args=(uri, stop), name=f"sim-{self.player_name}", daemon=True).start()
+        else:
+            self._set_state("PLAYING")
+
+    def _cancel_fetch(self) -> None:
+        with self._lock:
+            stop, self._fetch_stop = self._fetch_stop, None
+        if stop:
+            stop.set()
+        self._resume.set()
+
+    def _fetch(self, uri: str, stop: Event) -> None:
+        stats = FetchStats(uri=uri, requested_at=time.perf_counter())
+        self.fetches.append(stats)
+        try:
+            with urllib.request.urlopen(uri, timeout=30) as response:
+                header = response.read(44)
+                stats.first_byte_at = time.perf_counter()
+                stats.bytes_read = len(header)
+                stats.byte_rate = _wav_byte_rate(header) or self.config.byte_rate
+                length = response.headers.get("Content-Length")
+                with self._lock:
+                    if length and int(length) < 0xFFFFFFFF:
+                        self._duration = int(length) / stats.byte_rate
+                if not stop.is_set():
+                    self._set_state("PLAYING")
+                self._consume(response, stats, stop)
+        except Exception as exc:
+            stats.error = str(exc)
+        finally:
+            stats.finished_at = time.perf_counter()
+        if not stop.is_set():
+            # Reached the end of the stream (or it failed): the speaker stops by itself.
+            with self._lock:
+                if self._fetch_stop is stop:
+                    self._fetch_stop = None
+            self._set_state("STOPPED")
+
+    def _consume(self, response, stats: FetchStats, stop: Event) -> None:
+        """
+        Read at playback speed: a chunk per interval, scaled by `speed`.
+        """
+        rate = stats.byte_rate * max(self.config.speed, 1e-3)
+        chunk = max(1, int(rate * _READ_INTERVAL))
+        started = time.perf_counter()
+        played = 0
+        while not stop.is_set():
+            if not self._resume.is_set():
+                paused_at = time.perf_counter()
+                self._resume.wait()
+                started += time.perf_counter() - paused_at
+                continue
+            data = response.read(chunk)
+            if not data:
+                return
+            played += len(data)
+            stats.bytes_read += len(data)
+            with self._lock:
+                self._position = played / stats.byte_rate
+            ahead = played / rate - (time.perf_counter() - started)
+            if ahead > 0:
+                stop.wait(ahead)
+
+
+class SimulatedGroup:
+    def __init__(self, speaker: SimulatedSpeaker) -> None:
+        self.coordinator = speaker
+        self.members = {speaker}
+
+
+def simulated_speakers(count: int = 2, config: Optional[SimulatorConfig] = None) -> List[SimulatedSpeaker]:
+    return [SimulatedSpeaker(f"Simulated Speaker {idx + 1}", config) for idx in range(count)]
+
+
+_discovered: Optional[List[SimulatedSpeaker]] = None
+_discovered_lock = Lock()
+
+
+def discover_simulated() -> List[SimulatedSpeaker]:
+    """
+    Speakers for SONOS_THING_SIMULATOR=<count>; the same objects are returned
+    on every discovery, like a real network.
+    """
+    global _discovered
+    with _discovered_lock:
+        if _discovered is None:
+            try:
+                wanted = int(os.environ.get(SIMULATOR_ENV, "0") or 0)
+            except ValueError:
+                wanted = 0
+            _discovered = simulated_speakers(max(wanted, 1))
+        return list(_discovered)
+
+
+def simulator_enabled() -> bool:
+    return bool(os.environ.get(SIMULATOR_ENV))
+
+
+def _wav_byte_rate(header: bytes) -> Optional[int]:
+    if len(header) < 32 or header[:4] != b"RIFF" or header[8:12] != b"WAVE" or header[12:16] != b"fmt ":
+        return None
+    (byte_rate,) = struct.unpack_from("<I", header, 28)
+    return byte_rate or None
+
+
+def _hms(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
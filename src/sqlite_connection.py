@@ -1,10 +1,19 @@
+import os
 import sqlite3
+import time
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+from src.audio.track_catalog import TrackCatalog
 from src.misc.pathing import ROOT_DIR
+from src.misc.tracing import span
 
-DB_PATH = ROOT_DIR / "app.db"
+DB_PATH = Path(os.environ.get("SONOS_THING_DB") or ROOT_DIR / "app.db")
+
+
+def _song_key(song_path: Path | str) -> str:
+    # Canonical path; the catalog resolves each spelling only once per process.
+    return TrackCatalog.instance().key(song_path)
 
 
 class SqliteConnection:
@@ -16,8 +25,12 @@ class SqliteConnection:
     def __init__(self, db_path: Path | str = DB_PATH) -> None:
         self.db_path = Path(db_path)
         self.conn: Optional[sqlite3.Connection] = None
+        self._span = None
 
     def __enter__(self) -> "SqliteConnection":
+        # One span per connection: connect, schema check, queries and commit.
+        self._span = span("sqlite.session", db=self.db_path.name)
+        self._span.__enter__()
         self.conn = sqlite3.connect(self.db_path)
         self.conn.execute("PRAGMA foreign_keys = ON;")
         self._ensure_schema()
@@ -26,12 +39,15 @@ class SqliteConnection:
     def __exit__(self, exc_type, exc, tb) -> None:
         if not self.conn:
             return
-        if exc_type is None:
-            self.conn.commit()
-        else:
-            self.conn.rollback()
-        self.conn.close()
-        self.conn = None
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+            self.conn.close()
+            self.conn = None
+        finally:
+            self._span.__exit__(exc_type, exc, tb)
 
     # --- schema & inserts ---
     def _ensure_schema(self) -> None:
@@ -55,24 +71,120 @@ class SqliteConnection:
                 id INTEGER PRIMARY KEY CHECK (id = 1),
                 name TEXT
             );
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS track_analysis (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                duration REAL NOT NULL,
+                sample_rate INTEGER NOT NULL,
+                channels INTEGER NOT NULL,
+                loudness_lufs REAL,
+                replaygain_db REAL,
+                peak REAL NOT NULL,
+                leading_silence REAL NOT NULL,
+                trailing_silence REAL NOT NULL,
+                waveform BLOB,
+                analyzed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS download_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL,
+                last_error TEXT,
+                result_path TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS download_jobs_status ON download_jobs(status);
+            CREATE TABLE IF NOT EXISTS metadata_cache (
+                url TEXT PRIMARY KEY,
+                extractor TEXT,
+                video_id TEXT,
+                info TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS metadata_cache_video ON metadata_cache(extractor, video_id);
+            CREATE TABLE IF NOT EXISTS content_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                audio_hash TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                hashed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS content_hashes_audio ON content_hashes(audio_hash);
+            CREATE TABLE IF NOT EXISTS device_stream_format (
+                device TEXT PRIMARY KEY,
+                quality TEXT NOT NULL,
+                capacity REAL,
+                stalls INTEGER NOT NULL DEFAULT 0,
+                held_until REAL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_queue (
+                position INTEGER NOT NULL,
+                path TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS session_queue_position ON session_queue(position);
+            CREATE TABLE IF NOT EXISTS session_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                current_index INTEGER NOT NULL,
+                shuffle INTEGER NOT NULL,
+                shuffle_order TEXT,
+                position_track TEXT,
+                position_seconds REAL,
+                was_playing INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
             """
         )
+        self._ensure_columns("download_jobs", {"priority": "INTEGER NOT NULL DEFAULT 10"})
+        self._ensure_columns(
+            "songs",
+            {
+                "added_at": "REAL",
+                "last_played": "REAL",
+                "size": "INTEGER",
+                "source_url": "TEXT",
+                "evicted_at": "REAL",
+            },
+        )
         self.conn.commit()
 
+    def _ensure_columns(self, table: str, columns: Dict[str, str]) -> None:
+        """
+        Add columns introduced after a table was first created.
+        """
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns.items():
+            if name not in existing:
+                try:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError as exc:
+                    # Another connection may have added it since the PRAGMA.
+                    if "duplicate column" not in str(exc):
+                        raise
+
     def add_playlist(self, playlist_name: str) -> None:
         self._require_conn()
         self.conn.execute("INSERT OR IGNORE INTO playlists (playlist_name) VALUES (?)", (playlist_name,))
 
     def add_song(self, song_path: Path | str) -> None:
         self._require_conn()
-        self.conn.execute("INSERT OR IGNORE INTO songs (path) VALUES (?)", (str(Path(song_path).resolve()),))
+        self.conn.execute("INSERT OR IGNORE INTO songs (path) VALUES (?)", (_song_key(song_path),))
 
     def add_song_to_playlist(self, playlist_name: str, song_path: Path | str) -> None:
         """
         Ensure playlist and song exist, then link them.
         """
         self._require_conn()
-        song_abs = str(Path(song_path).resolve())
+        song_abs = _song_key(song_path)
         self.add_playlist(playlist_name)
         self.add_song(song_abs)
         self.conn.execute(
@@ -93,13 +205,321 @@ class SqliteConnection:
         Returns count removed.
         """
         self._require_conn()
-        cur = self.conn.execute("SELECT path FROM songs")
+        # Evicted songs are missing on purpose; they can be fetched again.
+        cur = self.conn.execute("SELECT path FROM songs WHERE evicted_at IS NULL")
         paths = [Path(row[0]) for row in cur.fetchall()]
         missing = [p for p in paths if not p.exists()]
         for miss in missing:
             self.conn.execute("DELETE FROM songs WHERE path = ?", (str(miss),))
         return len(missing)
 
+    # --- song lifecycle (quota / eviction) ---
+    _SONG_COLUMNS = ("path", "added_at", "last_played", "size", "source_url", "evicted_at")
+
+    def record_song_download(self, song_path: Path | str, source_url: str, size: int) -> None:
+        self._require_conn()
+        song_abs = _song_key(song_path)
+        self.conn.execute(
+            """
+            INSERT INTO songs (path, added_at, size, source_url) VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                added_at=excluded.added_at, size=excluded.size,
+                source_url=excluded.source_url, evicted_at=NULL
+            """,
+            (song_abs, time.time(), size, source_url),
+        )
+
+    def mark_song_played(self, song_path: Path | str) -> None:
+        self._require_conn()
+        song_abs = _song_key(song_path)
+        self.conn.execute(
+            """
+            INSERT INTO songs (path, last_played) VALUES (?, ?)
+            ON CONFLICT(path) DO UPDATE SET last_played=excluded.last_played
+            """,
+            (song_abs, time.time()),
+        )
+
+    def mark_song_evicted(self, song_path: Path | str) -> None:
+        self._require_conn()
+        self.conn.execute(
+            "UPDATE songs SET evicted_at = ? WHERE path = ?",
+            (time.time(), _song_key(song_path)),
+        )
+
+    def mark_song_restored(self, song_path: Path | str, size: int) -> None:
+        self._require_conn()
+        self.conn.execute(
+            "UPDATE songs SET evicted_at = NULL, size = ? WHERE path = ?",
+            (size, _song_key(song_path)),
+        )
+
+    def get_song_record(self, song_path: Path | str) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._SONG_COLUMNS)} FROM songs WHERE path = ?",
+            (_song_key(song_path),),
+        )
+        row = cur.fetchone()
+        return dict(zip(self._SONG_COLUMNS, row)) if row else None
+
+    def get_song_records(self) -> List[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(f"SELECT {', '.join(self._SONG_COLUMNS)} FROM songs")
+        return [dict(zip(self._SONG_COLUMNS, row)) for row in cur.fetchall()]
+
+    def get_evicted_songs(self) -> List[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._SONG_COLUMNS)} FROM songs WHERE evicted_at IS NOT NULL ORDER BY path"
+        )
+        return [dict(zip(self._SONG_COLUMNS, row)) for row in cur.fetchall()]
+
+    def get_playlist_song_paths(self) -> Set[str]:
+        """
+        Paths referenced by any saved playlist.
+        """
+        self._require_conn()
+        cur = self.conn.execute("SELECT DISTINCT song_path FROM playlist_songs")
+        return {row[0] for row in cur.fetchall()}
+
+    # --- download journal ---
+    _JOB_COLUMNS = (
+        "id",
+        "url",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "result_path",
+        "created_at",
+        "updated_at",
+        "priority",
+    )
+
+    def create_download_job(self, url: str, priority: int = 10) -> int:
+        self._require_conn()
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT INTO download_jobs (url, status, priority, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+            (url, priority, now, now),
+        )
+        return int(cur.lastrowid)
+
+    def update_download_job(self, job_id: int, **fields: Any) -> None:
+        self._require_conn()
+        unknown = set(fields) - set(self._JOB_COLUMNS[2:])
+        if unknown:
+            raise ValueError(f"Unknown download job fields: {sorted(unknown)}")
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.conn.execute(
+            f"UPDATE download_jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id),
+        )
+
+    def get_download_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(f"SELECT {', '.join(self._JOB_COLUMNS)} FROM download_jobs WHERE id = ?", (job_id,))
+        row = cur.fetchone()
+        return dict(zip(self._JOB_COLUMNS, row)) if row else None
+
+    def get_unfinished_download_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Jobs that were queued, running or waiting to retry, by priority then age.
+        """
+        self._require_conn()
+        cur = self.conn.execute(
+            f"""
+            SELECT {', '.join(self._JOB_COLUMNS)} FROM download_jobs
+            WHERE status IN ('queued', 'running', 'retrying') ORDER BY priority, id
+            """
+        )
+        return [dict(zip(self._JOB_COLUMNS, row)) for row in cur.fetchall()]
+
+    # --- yt-dlp metadata cache ---
+    _METADATA_COLUMNS = ("url", "extractor", "video_id", "info", "fetched_at")
+
+    def save_metadata(
+        self, url: str, extractor: Optional[str], video_id: Optional[str], info: str, fetched_at: float
+    ) -> None:
+        self._require_conn()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO metadata_cache (url, extractor, video_id, info, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (url, extractor, video_id, info, fetched_at),
+        )
+
+    def get_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._METADATA_COLUMNS)} FROM metadata_cache WHERE url = ?", (url,)
+        )
+        row = cur.fetchone()
+        return dict(zip(self._METADATA_COLUMNS, row)) if row else None
+
+    def get_metadata_by_id(self, extractor: str, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Newest cached entry for a video, whichever URL it was fetched under.
+        """
+        self._require_conn()
+        cur = self.conn.execute(
+            f"""
+            SELECT {', '.join(self._METADATA_COLUMNS)} FROM metadata_cache
+            WHERE extractor = ? AND video_id = ? ORDER BY fetched_at DESC LIMIT 1
+            """,
+            (extractor, video_id),
+        )
+        row = cur.fetchone()
+        return dict(zip(self._METADATA_COLUMNS, row)) if row else None
+
+    def prune_metadata(self, older_than: float) -> int:
+        self._require_conn()
+        return self.conn.execute("DELETE FROM metadata_cache WHERE fetched_at < ?", (older_than,)).rowcount
+
+    def find_downloaded_song(self, extractor: Optional[str], video_id: Optional[str], url: str) -> Optional[str]:
+        """
+        Path of a library song downloaded from `url` or from any URL cached
+        for the same video, skipping evicted songs.
+        """
+        self._require_conn()
+        cur = self.conn.execute(
+            """
+            SELECT s.path FROM songs s
+            LEFT JOIN metadata_cache m ON m.url = s.source_url
+            WHERE s.evicted_at IS NULL
+              AND (s.source_url = ? OR (m.extractor = ? AND m.video_id = ?))
+            LIMIT 1
+            """,
+            (url, extractor, video_id),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def repoint_song(self, old_path: Path | str, new_path: Path | str) -> None:
+        """
+        Move playlist links from one song to another (e.g. a duplicate to its
+        canonical copy). The new song keeps its own record, taking the old
+        one's source URL if it has none.
+        """
+        self._require_conn()
+        old_abs, new_abs = _song_key(old_path), _song_key(new_path)
+        self.add_song(new_abs)
+        self.conn.execute(
+            """
+            UPDATE songs SET source_url = (SELECT source_url FROM songs WHERE path = ?)
+            WHERE path = ? AND source_url IS NULL
+            """,
+            (old_abs, new_abs),
+        )
+        # OR IGNORE: playlists holding both copies keep one link.
+        self.conn.execute(
+            "UPDATE OR IGNORE playlist_songs SET song_path = ? WHERE song_path = ?", (new_abs, old_abs)
+        )
+        self.conn.execute("DELETE FROM playlist_songs WHERE song_path = ?", (old_abs,))
+
+    def delete_song(self, song_path: Path | str) -> None:
+        self._require_conn()
+        self.conn.execute("DELETE FROM songs WHERE path = ?", (_song_key(song_path),))
+
+    # --- content hashes ---
+    _HASH_COLUMNS = ("path", "size", "mtime_ns", "audio_hash", "file_hash", "hashed_at")
+
+    def save_content_hash(self, entry: Dict[str, Any]) -> None:
+        self._require_conn()
+        columns = ", ".join(self._HASH_COLUMNS)
+        placeholders = ", ".join("?" for _ in self._HASH_COLUMNS)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO content_hashes ({columns}) VALUES ({placeholders})",
+            tuple(entry[col] for col in self._HASH_COLUMNS),
+        )
+
+    def get_content_hash(self, path: Path | str) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._HASH_COLUMNS)} FROM content_hashes WHERE path = ?", (str(path),)
+        )
+        row = cur.fetchone()
+        return dict(zip(self._HASH_COLUMNS, row)) if row else None
+
+    def get_content_hashes_by_audio(self, audio_hash: str) -> List[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._HASH_COLUMNS)} FROM content_hashes WHERE audio_hash = ?", (audio_hash,)
+        )
+        return [dict(zip(self._HASH_COLUMNS, row)) for row in cur.fetchall()]
+
+    def get_duplicate_content_hashes(self) -> List[Dict[str, Any]]:
+        """
+        Rows whose audio hash is shared with at least one other path.
+        """
+        self._require_conn()
+        cur = self.conn.execute(
+            f"""
+            SELECT {', '.join(self._HASH_COLUMNS)} FROM content_hashes WHERE audio_hash IN (
+                SELECT audio_hash FROM content_hashes GROUP BY audio_hash HAVING COUNT(*) > 1
+            ) ORDER BY audio_hash
+            """
+        )
+        return [dict(zip(self._HASH_COLUMNS, row)) for row in cur.fetchall()]
+
+    def delete_content_hash(self, path: Path | str) -> None:
+        self._require_conn()
+        self.conn.execute("DELETE FROM content_hashes WHERE path = ?", (str(path),))
+
+    # --- playback session journal ---
+    _SESSION_COLUMNS = (
+        "current_index",
+        "shuffle",
+        "shuffle_order",
+        "position_track",
+        "position_seconds",
+        "was_playing",
+        "updated_at",
+    )
+
+    def replace_session_queue(self, paths: Iterable[Path | str]) -> None:
+        self._require_conn()
+        self.conn.execute("DELETE FROM session_queue")
+        self.conn.executemany(
+            "INSERT INTO session_queue (position, path) VALUES (?, ?)",
+            ((idx, str(path)) for idx, path in enumerate(paths)),
+        )
+
+    def append_session_track(self, position: int, path: Path | str) -> None:
+        self._require_conn()
+        self.conn.execute("INSERT INTO session_queue (position, path) VALUES (?, ?)", (position, str(path)))
+
+    def remove_session_track(self, position: int) -> None:
+        """
+        Drop the queue entry at `position` and close the gap.
+        """
+        self._require_conn()
+        self.conn.execute("DELETE FROM session_queue WHERE position = ?", (position,))
+        self.conn.execute("UPDATE session_queue SET position = position - 1 WHERE position > ?", (position,))
+
+    def update_session_track(self, position: int, path: Path | str) -> None:
+        self._require_conn()
+        self.conn.execute("UPDATE session_queue SET path = ? WHERE position = ?", (str(path), position))
+
+    def get_session_queue(self) -> List[str]:
+        self._require_conn()
+        return [row[0] for row in self.conn.execute("SELECT path FROM session_queue ORDER BY position")]
+
+    def save_session_state(self, state: Dict[str, Any]) -> None:
+        self._require_conn()
+        columns = ", ".join(self._SESSION_COLUMNS)
+        placeholders = ", ".join("?" for _ in self._SESSION_COLUMNS)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO session_state (id, {columns}) VALUES (1, {placeholders})",
+            tuple(state.get(col) for col in self._SESSION_COLUMNS),
+        )
+
+    def get_session_state(self) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(f"SELECT {', '.join(self._SESSION_COLUMNS)} FROM session_state WHERE id = 1")
+        row = cur.fetchone()
+        return dict(zip(self._SESSION_COLUMNS, row)) if row else None
+
     # --- device persistence ---
     def set_default_device(self, name: str) -> None:
         self._require_conn()
@@ -117,6 +537,80 @@ class SqliteConnection:
         row = cur.fetchone()
         return row[0] if row and row[0] else None
 
+    _STREAM_FORMAT_COLUMNS = ("device", "quality", "capacity", "stalls", "held_until", "updated_at")
+
+    def set_device_stream_format(
+        self, device: str, quality: str, capacity: Optional[float], stalls: int, held_until: Optional[float]
+    ) -> None:
+        self._require_conn()
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO device_stream_format (device, quality, capacity, stalls, held_until, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (device, quality, capacity, stalls, held_until, time.time()),
+        )
+
+    def get_device_stream_format(self, device: str) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._STREAM_FORMAT_COLUMNS)} FROM device_stream_format WHERE device = ?", (device,)
+        )
+        row = cur.fetchone()
+        return dict(zip(self._STREAM_FORMAT_COLUMNS, row)) if row else None
+
+    # --- settings ---
+    def set_setting(self, key: str, value: Any) -> None:
+        self._require_conn()
+        self.conn.execute(
+            """
+            INSERT INTO settings (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            """,
+            (key, None if value is None else str(value)),
+        )
+
+    def get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        self._require_conn()
+        cur = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,))
+        row = cur.fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    # --- audio analysis ---
+    _ANALYSIS_COLUMNS = (
+        "path",
+        "size",
+        "mtime_ns",
+        "duration",
+        "sample_rate",
+        "channels",
+        "loudness_lufs",
+        "replaygain_db",
+        "peak",
+        "leading_silence",
+        "trailing_silence",
+        "waveform",
+        "analyzed_at",
+    )
+
+    def save_track_analysis(self, analysis: Dict[str, Any]) -> None:
+        self._require_conn()
+        columns = ", ".join(self._ANALYSIS_COLUMNS)
+        placeholders = ", ".join("?" for _ in self._ANALYSIS_COLUMNS)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO track_analysis ({columns}) VALUES ({placeholders})",
+            tuple(analysis[col] for col in self._ANALYSIS_COLUMNS),
+        )
+
+    def get_track_analysis(self, song_path: Path | str) -> Optional[Dict[str, Any]]:
+        self._require_conn()
+        cur = self.conn.execute(
+            f"SELECT {', '.join(self._ANALYSIS_COLUMNS)} FROM track_analysis WHERE path = ?",
+            (str(song_path),),
+        )
+        row = cur.fetchone()
+        return dict(zip(self._ANALYSIS_COLUMNS, row)) if row else None
+
     # --- helpers ---
     def _require_conn(self) -> None:
         if not self.conn:
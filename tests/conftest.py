@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Point the app at a throwaway database before any src module reads DB_PATH.
+_DB_DIR = Path(tempfile.mkdtemp(prefix="sonos-thing-tests-"))
+os.environ["SONOS_THING_DB"] = str(_DB_DIR / "app.db")
+atexit.register(shutil.rmtree, _DB_DIR, ignore_errors=True)
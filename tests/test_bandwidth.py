@@ -0,0 +1,61 @@
+from typing import List
+
+from src.misc import bandwidth
+from src.misc.bandwidth import UPLINK_HEADROOM, UPLINK_SETTING, BandwidthScheduler
+from src.sqlite_connection import SqliteConnection
+
+
+def _hook():
+    scheduler = BandwidthScheduler(uplink=1_000_000)
+    charged: List[int] = []
+    scheduler.consume = charged.append
+    return scheduler.download_hook(), charged
+
+
+def test_download_hook_charges_increments():
+    hook, charged = _hook()
+    for downloaded in (1000, 3000, 6000):
+        hook({"status": "downloading", "downloaded_bytes": downloaded})
+    assert charged == [2000, 3000]
+
+
+def test_download_hook_ignores_bytes_already_on_disk():
+    hook, charged = _hook()
+    # A resumed download starts counting at the partial file's size.
+    hook({"status": "downloading", "downloaded_bytes": 50_000_000})
+    hook({"status": "downloading", "downloaded_bytes": 50_010_000})
+    assert charged == [10_000]
+
+
+def test_download_hook_restarts_after_each_transfer():
+    hook, charged = _hook()
+    hook({"status": "downloading", "downloaded_bytes": 1000})
+    hook({"status": "downloading", "downloaded_bytes": 2000})
+    hook({"status": "finished", "downloaded_bytes": 2000})
+    # The next file (e.g. the audio after the video) starts from zero again.
+    hook({"status": "downloading", "downloaded_bytes": 500})
+    hook({"status": "downloading", "downloaded_bytes": 1500})
+    hook({"status": "downloading", "downloaded_bytes": 1200})
+    assert charged == [1000, 1000]
+
+
+def test_uplink_setting_is_read_at_construction(monkeypatch):
+    with SqliteConnection() as db:
+        db.set_setting(UPLINK_SETTING, "10000000")
+    try:
+        scheduler = BandwidthScheduler()
+    finally:
+        with SqliteConnection() as db:
+            db.set_setting(UPLINK_SETTING, "")
+
+    def no_database(*args, **kwargs):
+        raise AssertionError("SQLite opened while streaming")
+
+    # Opening a stream computes the ceiling with the lock held; no database access.
+    monkeypatch.setattr(bandwidth, "SqliteConnection", no_database)
+    meter = scheduler.open_stream(required_rate=1_000_000)
+    try:
+        assert scheduler.current_limit() == 10_000_000 * UPLINK_HEADROOM - 1_000_000
+    finally:
+        meter.close()
+    assert scheduler.current_limit() is None
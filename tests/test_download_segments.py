@@ -0,0 +1,40 @@
+from src.audio.download_segments import MAX_SEGMENTS, PROBE_EVERY, SegmentTuner, _HostTuning
+
+
+def _next(tuning: _HostTuning, used: int) -> int:
+    tuning.downloads += 1
+    tuning.segments = SegmentTuner._next_locked(tuning, used)
+    return tuning.segments
+
+
+def test_keeps_doubling_while_faster():
+    tuning = _HostTuning(segments=4, rates={4: 100.0})
+    assert _next(tuning, 4) == 8
+    tuning.rates[8] = 150.0
+    assert _next(tuning, 8) == 16
+
+
+def test_heads_back_to_the_best_count_when_slower():
+    tuning = _HostTuning(segments=8, rates={4: 100.0, 8: 80.0})
+    assert _next(tuning, 8) == 4
+    assert tuning.direction == -1
+    # Then tries the other neighbour.
+    assert _next(tuning, 4) == 2
+
+
+def test_settles_once_both_neighbours_are_known():
+    tuning = _HostTuning(segments=4, rates={2: 50.0, 4: 100.0, 8: 80.0}, direction=-1, downloads=1)
+    assert _next(tuning, 4) == 4
+
+
+def test_probes_a_neighbour_periodically():
+    tuning = _HostTuning(segments=4, rates={2: 50.0, 4: 100.0, 8: 80.0}, direction=-1)
+    tuning.downloads = PROBE_EVERY - 1
+    assert _next(tuning, 4) == 2
+
+
+def test_probe_stays_within_limits():
+    top = _HostTuning(segments=MAX_SEGMENTS, rates={MAX_SEGMENTS: 100.0}, downloads=1)
+    assert _next(top, MAX_SEGMENTS) == MAX_SEGMENTS
+    bottom = _HostTuning(segments=1, rates={1: 100.0}, direction=-1, downloads=1)
+    assert _next(bottom, 1) == 1
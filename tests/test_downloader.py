@@ -0,0 +1,118 @@
+import time
+from threading import Event, Lock
+
+from src.audio import downloader
+from src.audio.downloader import PRIORITY_HIGH, PRIORITY_NORMAL, AudioDownloadManager, _StageTimer
+from src.audio.metadata import MetadataCache
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_reprioritized_job_runs_once(monkeypatch, tmp_path):
+    gate = Event()
+    lock = Lock()
+    started = []
+
+    def fake_download(url, progress_hook=None, codec=None, output_dir=None):
+        with lock:
+            started.append(url)
+        if url.endswith("/blocker"):
+            gate.wait(5)
+        else:
+            # Long enough for the second worker to pop a duplicate entry, if any.
+            time.sleep(0.2)
+        return None
+
+    monkeypatch.setattr(downloader, "download_audio", fake_download)
+    monkeypatch.setattr(MetadataCache, "preflight_async", lambda self, *args, **kwargs: None)
+    manager = AudioDownloadManager(workers=2, codec=None, output_dir=tmp_path)
+    completed = []
+
+    def on_complete(url, path, error) -> None:
+        completed.append(url)
+
+    for i in range(2):
+        manager.enqueue(f"http://example.invalid/{i}/blocker", on_complete=on_complete)
+    assert _wait_for(lambda: len(started) == 2)
+
+    target = "http://example.invalid/target"
+    job_id = manager.enqueue(target, on_complete=on_complete)
+    # A -> B -> A leaves two heap entries with the job's current priority.
+    assert manager.reprioritize(job_id, PRIORITY_HIGH)
+    assert manager.reprioritize(job_id, PRIORITY_NORMAL)
+    gate.set()
+
+    assert _wait_for(lambda: len(completed) >= 3)
+    time.sleep(0.3)
+    assert started.count(target) == 1
+    assert completed.count(target) == 1
+    assert manager.queue_depth == 0
+
+
+def test_reprioritize_changes_queue_order(monkeypatch, tmp_path):
+    gate = Event()
+    started = []
+
+    def fake_download(url, progress_hook=None, codec=None, output_dir=None):
+        started.append(url)
+        if url.endswith("/blocker"):
+            gate.wait(5)
+        return None
+
+    monkeypatch.setattr(downloader, "download_audio", fake_download)
+    monkeypatch.setattr(MetadataCache, "preflight_async", lambda self, *args, **kwargs: None)
+    manager = AudioDownloadManager(workers=1, codec=None, output_dir=tmp_path)
+
+    manager.enqueue("http://example.invalid/blocker")
+    assert _wait_for(lambda: len(started) == 1)
+    first = manager.enqueue("http://example.invalid/first")
+    second = manager.enqueue("http://example.invalid/second")
+    assert manager.reprioritize(second, PRIORITY_HIGH)
+    assert manager.reprioritize(first, PRIORITY_HIGH)
+    assert manager.reprioritize(first, PRIORITY_NORMAL)
+    gate.set()
+
+    assert _wait_for(lambda: manager.queue_depth == 0)
+    assert started[1:] == ["http://example.invalid/second", "http://example.invalid/first"]
+
+
+def test_stage_timer_counts_transferred_bytes_only():
+    stages = _StageTimer()
+    stages.on_progress({"status": "downloading", "downloaded_bytes": 40_000, "total_bytes": 100_000})
+    stages.on_progress({"status": "downloading", "downloaded_bytes": 70_000, "total_bytes": 100_000})
+    stages.on_progress({"status": "finished", "downloaded_bytes": 100_000, "total_bytes": 100_000})
+    assert stages.download_bytes == 60_000
+    assert not stages.throttled
+
+
+def test_stage_timer_adds_up_transfers():
+    stages = _StageTimer()
+    for size in (1000, 3000):
+        stages.on_progress({"status": "downloading", "downloaded_bytes": 0})
+        stages.on_progress({"status": "finished", "total_bytes": size})
+    assert stages.download_bytes == 4000
+
+
+def test_stage_timer_notes_fragments():
+    stages = _StageTimer()
+    stages.on_progress({"status": "downloading", "downloaded_bytes": 0, "fragment_count": 12})
+    assert stages.fragmented
+
+
+def test_stage_timer_notes_a_bandwidth_limit():
+    limit = [None]
+    stages = _StageTimer(lambda: limit[0])
+    stages.on_progress({"status": "downloading", "downloaded_bytes": 0})
+    assert not stages.throttled
+    limit[0] = 500_000.0
+    stages.on_progress({"status": "downloading", "downloaded_bytes": 1000})
+    limit[0] = None
+    stages.on_progress({"status": "finished", "downloaded_bytes": 2000})
+    assert stages.throttled
@@ -0,0 +1,143 @@
+import struct
+from concurrent.futures import Future
+
+import pytest
+
+from src.audio.content_hash import ContentHash, hash_file
+from src.misc import http_server
+from src.misc.http_server import FileStatCache, _etag_matches, _parse_range, _Unsatisfiable
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("Bytes = 0-0", (0, 0)),
+    ],
+)
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "items=0-10",
+        "bytes=0-1,5-6",
+        "bytes=5",
+        "bytes=-",
+        "bytes=abc-",
+        "bytes=10-5",
+        "bytes=--5",
+        "bytes=+5-",
+        "bytes=-5-",
+    ],
+)
+def test_invalid_ranges_serve_the_whole_file(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize(
+    "header, size",
+    [
+        ("bytes=1000-", 1000),
+        ("bytes=1000-2000", 1000),
+        ("bytes=0-", 0),
+        ("bytes=-0", 1000),
+        ("bytes=-10", 0),
+    ],
+)
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(_Unsatisfiable):
+        _parse_range(header, size)
+
+
+def test_weak_etag_comparison():
+    assert _etag_matches('W/"1-2"', '"1-2"', weak=True)
+    assert _etag_matches('"a", W/"1-2"', 'W/"1-2"', weak=True)
+    assert not _etag_matches('"other"', 'W/"1-2"', weak=True)
+
+
+def test_strong_etag_comparison():
+    assert _etag_matches('"abc"', '"abc"', weak=False)
+    assert not _etag_matches('W/"abc"', '"abc"', weak=False)
+    # A weak tag never matches strongly, except through "*".
+    assert not _etag_matches('W/"1-2"', 'W/"1-2"', weak=False)
+    assert _etag_matches("*", 'W/"1-2"', weak=False)
+
+
+def _wav(path, frames: int = 1000) -> None:
+    data = bytes(frames * 4)
+    header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt "
+    header += struct.pack("<IHHIIHH", 16, 1, 2, 44_100, 44_100 * 4, 4, 16) + b"data" + struct.pack("<I", len(data))
+    path.write_bytes(header + data)
+
+
+def _translator(root):
+    def translate(request_path: str) -> str:
+        return str(root / request_path.lstrip("/"))
+
+    return translate
+
+
+def test_stat_cache_submits_the_hash_once(monkeypatch, tmp_path):
+    track = tmp_path / "a.wav"
+    _wav(track)
+    pending = Future()
+    calls = []
+
+    def content_hash(path):
+        calls.append(path)
+        return pending
+
+    monkeypatch.setattr(http_server, "_content_hash", content_hash)
+    cache = FileStatCache()
+    translate = _translator(tmp_path)
+
+    entry = cache.get("/a.wav", translate)
+    assert entry.etag == entry.stat_etag and not entry.hashed
+    assert cache.get("/a.wav", translate).etag == entry.stat_etag
+    assert len(calls) == 1
+
+    st = track.stat()
+    pending.set_result(ContentHash(str(track), st.st_size, st.st_mtime_ns, "audio", "abc"))
+    entry = cache.get("/a.wav", translate)
+    assert (entry.etag, entry.hashed, entry.hash_pending) == ('"abc"', True, None)
+    assert len(calls) == 1
+
+
+def test_stat_cache_ignores_a_stale_or_failed_hash(monkeypatch, tmp_path):
+    track = tmp_path / "a.wav"
+    _wav(track)
+    stale, failed = Future(), Future()
+    stale.set_result(ContentHash(str(track), 1, 1, "audio", "old"))
+    failed.set_exception(RuntimeError("changed while it was hashed"))
+    futures = [stale, failed]
+    monkeypatch.setattr(http_server, "_content_hash", lambda path: futures.pop(0))
+    translate = _translator(tmp_path)
+
+    for _ in range(2):
+        entry = FileStatCache().get("/a.wav", translate)
+        assert entry.etag == entry.stat_etag and entry.hash_pending is None
+
+
+def test_stat_cache_uses_the_content_hash(tmp_path):
+    track = tmp_path / "a.wav"
+    _wav(track)
+    cache = FileStatCache()
+    translate = _translator(tmp_path)
+    entry = cache.get("/a.wav", translate)
+    if entry.hash_pending is not None:
+        entry.hash_pending.result(timeout=10)
+    entry = cache.get("/a.wav", translate)
+    assert entry.hashed
+    assert entry.etag == f'"{hash_file(track)[1]}"'
+    # A non-WAV file keeps a strong size-mtime tag.
+    other = tmp_path / "b.mp3"
+    other.write_bytes(b"x" * 10)
+    entry = cache.get("/b.mp3", translate)
+    assert not entry.hashed and not entry.etag.startswith("W/") and entry.hash_pending is None
@@ -0,0 +1,28 @@
+import pytest
+
+from src.audio.library_quota import parse_size
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, 0),
+        ("", 0),
+        ("0", 0),
+        ("500000", 500_000),
+        ("512M", 512 * 1024**2),
+        ("20G", 20 * 1024**3),
+        ("1.5TB", int(1.5 * 1024**4)),
+        (" 2 gib ", 2 * 1024**3),
+        ("64kb", 64 * 1024),
+        (1024, 1024),
+    ],
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "-5", "12X", "1.2.3", "G"])
+def test_parse_size_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_size(value)
@@ -0,0 +1,106 @@
+import gc
+import math
+from threading import Thread
+
+import pytest
+
+from src.misc.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def _in_threads(fn, count: int = 8) -> None:
+    threads = [Thread(target=fn) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("test_total", "Test.", ["kind"])
+    child = counter.labels("a")
+
+    def work() -> None:
+        for _ in range(1000):
+            child.inc()
+        counter.labels("b").inc(2)
+
+    _in_threads(work)
+    assert counter.values() == {("a",): 8000.0, ("b",): 16.0}
+
+
+def test_finished_threads_are_folded_into_retired_totals():
+    counter = Counter("test_retired_total", "Test.")
+    _in_threads(lambda: counter.inc(3))
+    gc.collect()
+    assert counter._shards == []
+    assert counter.values() == {(): 24.0}
+    counter.inc()
+    assert counter.values() == {(): 25.0}
+
+
+def test_histogram_merges_shards():
+    histogram = Histogram("test_seconds", "Test.", buckets=(1.0, 5.0))
+    _in_threads(lambda: [histogram.observe(v) for v in (0.5, 2.0, 10.0)], count=4)
+    gc.collect()
+    histogram.observe(1.0)
+    assert histogram._merged() == {(): [5, 4, 4, 51.0]}
+
+
+def test_label_count_is_checked():
+    counter = Counter("test_labels_total", "Test.", ["a", "b"])
+    with pytest.raises(ValueError):
+        counter.labels("only-one")
+
+
+def test_gauge_set_plus_increments_and_function():
+    gauge = Gauge("test_gauge", "Test.")
+    gauge.set(10)
+    gauge.inc(2)
+    gauge.dec()
+    assert gauge.values() == {(): 11.0}
+    gauge.set_function(lambda: 42)
+    assert gauge.values() == {(): 42.0}
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("app_requests_total", "Requests.", ["path"])
+    counter.labels('/a"b\\c\nd').inc()
+    counter.labels("/").inc(2.5)
+    registry.gauge("app_up", "Up.").set(1)
+    histogram = registry.histogram("app_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3.0)
+
+    assert registry.render().splitlines() == [
+        "# HELP app_requests_total Requests.",
+        "# TYPE app_requests_total counter",
+        'app_requests_total{path="/"} 2.5',
+        'app_requests_total{path="/a\\"b\\\\c\\nd"} 1',
+        "# HELP app_up Up.",
+        "# TYPE app_up gauge",
+        "app_up 1",
+        "# HELP app_latency_seconds Latency.",
+        "# TYPE app_latency_seconds histogram",
+        'app_latency_seconds_bucket{le="0.1"} 1',
+        'app_latency_seconds_bucket{le="1"} 2',
+        'app_latency_seconds_bucket{le="+Inf"} 3',
+        "app_latency_seconds_sum 3.55",
+        "app_latency_seconds_count 3",
+    ]
+    assert registry.render().endswith("\n")
+
+
+def test_registry_returns_existing_metric():
+    registry = MetricsRegistry()
+    first = registry.counter("app_dup_total", "First.")
+    assert registry.counter("app_dup_total", "Second.") is first
+
+
+def test_histogram_buckets_include_their_upper_bound():
+    histogram = Histogram("test_bounds", "Test.", buckets=(1.0, 2.0))
+    for value in (1.0, 2.0, math.inf):
+        histogram.observe(value)
+    state = histogram._merged()[()]
+    assert state[:3] == [1, 1, 1]
@@ -0,0 +1,92 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.audio import playback_clock
+from src.audio.playback_clock import PlaybackClock
+
+A, B = Path("a.wav"), Path("b.wav")
+
+
+@pytest.fixture
+def now(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(playback_clock, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    return clock
+
+
+def test_interpolates_while_playing(now):
+    clock = PlaybackClock()
+    assert clock.position() is None
+    clock.start(A, duration=180.0, seconds=10.0)
+    now[0] += 5
+    position = clock.position()
+    assert (position.track, position.seconds, position.playing) == (A, 15.0, True)
+    assert position.remaining == 165.0
+
+
+def test_pause_freezes_position(now):
+    clock = PlaybackClock()
+    clock.start(A)
+    now[0] += 3
+    clock.pause()
+    now[0] += 100
+    position = clock.position()
+    assert (position.seconds, position.playing) == (3.0, False)
+
+
+def test_position_is_clamped_to_duration(now):
+    clock = PlaybackClock()
+    clock.start(A, duration=10.0)
+    assert not clock.near_end(2.0)
+    now[0] += 9
+    assert clock.near_end(2.0)
+    now[0] += 20
+    assert clock.position().seconds == 10.0
+    assert clock.position().remaining == 0.0
+
+
+def test_anchor_reports_drift_for_the_same_track(now):
+    clock = PlaybackClock()
+    clock.start(A, duration=60.0)
+    now[0] += 10
+    assert clock.anchor(A, 12.0, playing=True) == pytest.approx(2.0)
+    assert clock.position().seconds == 12.0
+    assert clock.position().duration == 60.0
+
+
+def test_anchor_on_another_track_starts_over(now):
+    clock = PlaybackClock()
+    clock.start(A, duration=60.0)
+    assert clock.anchor(B, 4.0, playing=False) is None
+    position = clock.position()
+    assert (position.track, position.seconds, position.duration, position.playing) == (B, 4.0, None, False)
+
+
+def test_resync_due_only_while_playing(now):
+    clock = PlaybackClock(resync_seconds=30.0)
+    clock.start(A)
+    now[0] += 29
+    assert not clock.resync_due()
+    now[0] += 1
+    assert clock.resync_due()
+    # Only speaker samples count as a resync, not app actions.
+    clock.anchor(A, 30.0, playing=True, source="seek")
+    assert clock.resync_due()
+    clock.anchor(A, 30.0, playing=True)
+    assert not clock.resync_due()
+    clock.pause()
+    now[0] += 100
+    assert not clock.resync_due()
+
+
+def test_stop_and_rename(now):
+    clock = PlaybackClock()
+    clock.start(A)
+    clock.rename(A, B)
+    assert clock.position().track == B
+    clock.rename(A, Path("c.wav"))
+    assert clock.position().track == B
+    clock.stop()
+    assert clock.position() is None
@@ -0,0 +1,120 @@
+import random
+
+from src.audio.shuffle_order import ShuffleOrder
+
+
+def _order(size: int, seed: int = 1, current=None) -> ShuffleOrder:
+    order = ShuffleOrder(rng=random.Random(seed))
+    order.reset(size, current=current)
+    return order
+
+
+def test_each_cycle_plays_every_track_once():
+    order = _order(6)
+    first = [order.advance() for _ in range(6)]
+    second = [order.advance() for _ in range(6)]
+    assert sorted(first) == list(range(6))
+    assert sorted(second) == list(range(6))
+
+
+def test_next_cycle_does_not_repeat_the_last_track():
+    for seed in range(50):
+        order = _order(3, seed)
+        last = [order.advance() for _ in range(3)][-1]
+        assert order.advance() != last
+
+
+def test_reset_with_current_track():
+    order = _order(5, current=3)
+    assert order.current() == 3
+    assert 3 not in [order.advance() for _ in range(4)]
+
+
+def test_empty_order():
+    order = _order(0)
+    assert order.peek_next() is None
+    assert order.advance() is None
+    assert order.current() is None
+
+
+def test_step_back_walks_history():
+    order = _order(5)
+    played = [order.advance() for _ in range(3)]
+    assert order.history() == played[:2]
+    assert order.step_back() == played[1]
+    assert order.step_back() == played[0]
+    # No history left: stays on the first track.
+    assert order.step_back() == played[0]
+    assert order.advance() == played[1]
+
+
+def test_peek_next_matches_advance():
+    order = _order(4)
+    for _ in range(10):
+        upcoming = order.peek_next()
+        assert order.advance() == upcoming
+
+
+def test_jump_to_keeps_upcoming_order():
+    order = _order(6)
+    order.advance()
+    upcoming = order.snapshot()["sequence"][1:6]
+    order.jump_to(upcoming[2])
+    assert order.current() == upcoming[2]
+    rest = [order.advance() for _ in range(4)]
+    assert sorted(rest) == sorted(set(upcoming) - {upcoming[2]})
+
+
+def test_add_places_track_in_the_unplayed_part():
+    for seed in range(20):
+        order = _order(4, seed)
+        played = [order.advance() for _ in range(2)]
+        order.add(4)
+        assert len(order) == 5
+        assert 4 not in order.history() + [order.current()]
+        rest = [order.advance() for _ in range(3)]
+        assert sorted(played + rest) == list(range(5))
+
+
+def test_remove_current_falls_back_to_previous():
+    order = ShuffleOrder()
+    assert order.restore({"sequence": [3, 1, 0, 2], "cursor": 1, "size": 4})
+    order.remove(1)
+    assert len(order) == 3
+    # 3 shifted down to 2; next() plays what was upcoming (0, then 2 -> 1).
+    assert order.current() == 2
+    assert order.advance() == 0
+    assert order.advance() == 1
+
+
+def test_remove_upcoming_shifts_later_indices():
+    order = ShuffleOrder()
+    assert order.restore({"sequence": [0, 3, 2, 1], "cursor": 0, "size": 4})
+    order.remove(2)
+    assert order.snapshot() == {"sequence": [0, 2, 1], "cursor": 0, "size": 3}
+
+
+def test_snapshot_restore_round_trip():
+    order = _order(5, seed=7)
+    for _ in range(3):
+        order.advance()
+    restored = ShuffleOrder()
+    assert restored.restore(order.snapshot())
+    assert restored.current() == order.current()
+    assert [restored.advance() for _ in range(2)] == [order.advance() for _ in range(2)]
+
+
+def test_restore_rejects_invalid_snapshots():
+    order = _order(3)
+    order.advance()
+    before = order.snapshot()
+    for state in (
+        {},
+        {"sequence": [0, 1], "cursor": 0},
+        {"sequence": [0, 5], "cursor": 0, "size": 3},
+        {"sequence": [0, 1], "cursor": 2, "size": 3},
+        {"sequence": ["a"], "cursor": 0, "size": 3},
+        {"sequence": None, "cursor": 0, "size": 3},
+    ):
+        assert not order.restore(state)
+        assert order.snapshot() == before
@@ -0,0 +1,56 @@
+import time
+
+from src.audio.stream_format import (
+    HEADROOM,
+    HIGH,
+    HOLD_SECONDS,
+    LOSSLESS,
+    LOW,
+    UPGRADE_HEADROOM,
+    VARIANT_BITRATES,
+    StreamFormatSelector,
+    _DeviceFormat,
+)
+
+_CD = 44_100 * 2 * 2
+_HIGH = VARIANT_BITRATES[HIGH] // 8
+_LOW = VARIANT_BITRATES[LOW] // 8
+
+
+def _decide(quality: str, capacity: float, stalled: bool = False, held_until=None):
+    state = _DeviceFormat(quality=quality, held_until=held_until)
+    return StreamFormatSelector._decide(state, capacity, stalled, _CD)
+
+
+def test_stall_steps_down_one_level_and_holds():
+    quality, held_until = _decide(LOSSLESS, capacity=10 * _CD, stalled=True)
+    assert quality == HIGH
+    assert held_until >= time.time() + HOLD_SECONDS - 5
+    assert _decide(LOW, capacity=10 * _CD, stalled=True)[0] == LOW
+
+
+def test_drops_to_the_best_quality_that_fits():
+    assert _decide(LOSSLESS, capacity=_CD * HEADROOM) == (LOSSLESS, None)
+    assert _decide(LOSSLESS, capacity=_CD * HEADROOM - 1)[0] == HIGH
+    assert _decide(LOSSLESS, capacity=_HIGH * HEADROOM - 1)[0] == LOW
+    assert _decide(HIGH, capacity=1)[0] == LOW
+
+
+def test_upgrades_only_with_extra_headroom():
+    assert _decide(HIGH, capacity=_CD * UPGRADE_HEADROOM - 1) == (HIGH, None)
+    assert _decide(HIGH, capacity=_CD * UPGRADE_HEADROOM) == (LOSSLESS, None)
+    assert _decide(LOW, capacity=_HIGH * UPGRADE_HEADROOM) == (HIGH, None)
+
+
+def test_upgrades_one_level_at_a_time():
+    assert _decide(LOW, capacity=100 * _CD)[0] == HIGH
+
+
+def test_no_upgrade_while_held():
+    held_until = time.time() + 60
+    assert _decide(HIGH, capacity=100 * _CD, held_until=held_until) == (HIGH, held_until)
+    assert _decide(HIGH, capacity=100 * _CD, held_until=time.time() - 1) == (LOSSLESS, None)
+
+
+def test_stays_on_lowest_quality():
+    assert _decide(LOW, capacity=_LOW) == (LOW, None)